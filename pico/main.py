@@ -73,11 +73,44 @@ class Servo(object):
         self.pwm.duty_ns(int(duty))
 
 
+class Trajectory(object):
+    """Multi-servo path, linearly interpolated between keyframes every Servo.REFRESH_INTERVAL"""
+    MAX_KEYFRAMES = 32
+
+    def __init__(self, servos, keyframes):
+        self.servos = servos
+        self.keyframes = keyframes  # [(time_ms, [position, ...]), ...]
+        self.start_ts = utime.ticks_ms()
+        self.previous_ts = None
+        self.segment = 0
+
+    def iterate(self):
+        """Move the servos along the path, return False once the last keyframe is reached"""
+        now = utime.ticks_ms()
+        if self.previous_ts is not None and utime.ticks_diff(now, self.previous_ts) < Servo.REFRESH_INTERVAL:
+            return True
+        self.previous_ts = now
+        elapsed = utime.ticks_diff(now, self.start_ts)
+        while self.segment < len(self.keyframes) - 1 and elapsed >= self.keyframes[self.segment + 1][0]:
+            self.segment += 1
+        if self.segment >= len(self.keyframes) - 1:
+            positions = self.keyframes[-1][1]
+        else:
+            t0, positions0 = self.keyframes[self.segment]
+            t1, positions1 = self.keyframes[self.segment + 1]
+            ratio = (elapsed - t0) / (t1 - t0) if t1 > t0 else 1.0
+            positions = [p0 + (p1 - p0) * ratio for p0, p1 in zip(positions0, positions1)]
+        for servo, position in zip(self.servos, positions):
+            servo._move(position)
+        return self.segment < len(self.keyframes) - 1
+
+
 class ServoHandler(object):
 
     def __init__(self, pins, enable_pin):
         self.servos = []
         self.started = False
+        self.trajectory = None
         for pin in pins:
             self.servos.append(Servo(pin))
 
@@ -86,25 +119,45 @@ class ServoHandler(object):
 
     def stop(self):
         self.started = False
+        self.trajectory = None
         self.enable.low()
 
     def start(self):
         self.started = True
         self.enable.high()
 
+    def _cancel_trajectory(self, servo):
+        if self.trajectory is not None and self.servos[servo - 1] in self.trajectory.servos:
+            self.trajectory = None
+
     def stop_servo(self, servo):
         if servo > 0 and servo <= len(self.servos):
+            self._cancel_trajectory(servo)
             self.servos[servo - 1].stop()
 
     def move(self, servo, position, speed):
         if servo > 0 and servo <= len(self.servos):
+            self._cancel_trajectory(servo)
             self.servos[servo - 1].move(position, speed)
 
+    def follow(self, servo_ids, keyframes):
+        servos = []
+        for servo in servo_ids:
+            if servo <= 0 or servo > len(self.servos):
+                return False
+            servos.append(self.servos[servo - 1])
+        for servo in servos:
+            servo.stop()
+        self.trajectory = Trajectory(servos, keyframes)
+        return True
+
     def configure(self, servo, min_ps, max_ps, max_speed):
         if servo > 0 and servo <= len(self.servos):
             self.servos[servo - 1].configure(min_ps, max_ps, max_speed)
 
     def iterate(self):
+        if self.trajectory is not None and not self.trajectory.iterate():
+            self.trajectory = None
         for servo in self.servos:
             servo.iterate()
 
@@ -137,6 +190,21 @@ class ServoHandler(object):
                 else:
                     max_speed = None
                 self.configure(servo, min_ps, max_ps, max_speed)
+            elif command == "T":
+                # S:T:<id>,<id>:<time_ms>:<position>,<position>:<time_ms>:<position>,<position>...
+                if not self.started:
+                    self.start()
+                servo_ids = [int(servo) for servo in args[1].split(",")]
+                keyframes = []
+                for i in range(2, len(args) - 1, 2):
+                    positions = [float(position) for position in args[i + 1].split(",")]
+                    if len(positions) != len(servo_ids):
+                        return False, f"[Servo] Invalid keyframe {args[i + 1]}"
+                    keyframes.append((int(args[i]), positions))
+                if len(keyframes) == 0 or len(keyframes) > Trajectory.MAX_KEYFRAMES:
+                    return False, f"[Servo] Invalid number of keyframes {len(keyframes)}"
+                if not self.follow(servo_ids, keyframes):
+                    return False, f"[Servo] Invalid servos {args[1]}"
             else:
                 return False, f"[Servo] Unknown command {command}"
         except Exception as e:
@@ -705,8 +773,11 @@ class StatusHandler(object):
     SLOW_BLINK_INTERVAL = 1.5
     ITO = 2
         
+    MIN_REFRESH_INTERVAL = 10  # ms
+
     class HandlerConfig(object):
-        def __init__(self, handler, refresh_interval, deadline):
+        def __init__(self, channel, handler, refresh_interval, deadline):
+            self.channel = channel
             self.handler = handler
             self.refresh_interval = refresh_interval
             self.deadline = deadline
@@ -740,8 +811,23 @@ class StatusHandler(object):
         elif self.state == RobotState.READY:
             self.led.on()
 
-    def add_handler(self, handler, refresh_interval):
-        self.handlers.append(self.HandlerConfig(handler, refresh_interval, utime.ticks_ms()))
+    def add_handler(self, channel, handler, refresh_interval):
+        self.handlers.append(self.HandlerConfig(channel, handler, refresh_interval, utime.ticks_ms()))
+
+    def set_refresh_interval(self, args):
+        # Telemetry subscription: T:<channel>:<interval_ms>
+        try:
+            channel = args[0]
+            refresh_interval = max(StatusHandler.MIN_REFRESH_INTERVAL, int(args[1]))
+        except Exception as e:
+            print(e)
+            return False, f"[Telemetry] Unable to decode arguments {args}"
+        for handler_config in self.handlers:
+            if handler_config.channel == channel:
+                handler_config.refresh_interval = refresh_interval
+                handler_config.deadline = utime.ticks_ms()
+                return True, "OK"
+        return False, f"[Telemetry] Unknown channel {channel}"
     
     def iterate(self):
         now = utime.ticks_ms()
@@ -749,8 +835,8 @@ class StatusHandler(object):
             if now > handler_config.deadline:
                 handler_config.deadline = utime.ticks_add(now, handler_config.refresh_interval)
                 status = handler_config.handler.get_status() + "\n"
+                # No flush, high rate telemetry must not stall the main loop
                 uart.write(status)
-                uart.flush()
 
         # Reach inactivity timeout?
         if now > self.last_message_ts + StatusHandler.ITO * 1000:
@@ -812,9 +898,30 @@ battery_handler = BatteryHandler(28)
 patroller_handler = PatrollerHandler(motor_handler, ultrasonic_handler)
 
 status_handler = StatusHandler()
-status_handler.add_handler(motor_handler, 200)
-status_handler.add_handler(battery_handler, 10000)
-status_handler.add_handler(servo_handler, 500)
+status_handler.add_handler("M", motor_handler, 200)
+status_handler.add_handler("B", battery_handler, 10000)
+status_handler.add_handler("S", servo_handler, 500)
+
+
+# Requests recently handled, a retried request (lost acknowledgement) is acknowledged again but not run twice
+MAX_RECENT_REQUESTS = 16
+recent_requests = {}
+recent_sequence_numbers = []
+
+
+def process_request(sequence_number, cmd):
+    recent_request = recent_requests.get(sequence_number)
+    if recent_request is not None and recent_request[0] == cmd:
+        _, sucess, data = recent_request
+    else:
+        _, sucess, data = process_command(cmd)
+        if sequence_number not in recent_requests:
+            recent_sequence_numbers.append(sequence_number)
+            if len(recent_sequence_numbers) > MAX_RECENT_REQUESTS:
+                del recent_requests[recent_sequence_numbers.pop(0)]
+        recent_requests[sequence_number] = (cmd, sucess, data)
+    uart.write(f"{'A' if sucess else 'N'}:{sequence_number}:{data}\n")
+    return sucess, data
 
 
 def process_command(cmd):
@@ -833,6 +940,11 @@ def process_command(cmd):
         sucess, data = ultrasonic_handler.process_command(args)
     elif sensor == "B":
         sucess, data = battery_handler.process_command(args)
+    elif sensor == "T":
+        sucess, data = status_handler.set_refresh_interval(args)
+    elif sensor == "Q" and len(args) > 1:
+        # Request: Q:<seq>:<command>, acknowledged with A:<seq>:<data> or N:<seq>:<error>
+        sucess, data = process_request(args[0], ":".join(args[1:]))
     else:
         sucess, data = False, "Unknown sensor"
     return sensor, sucess, data
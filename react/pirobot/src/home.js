@@ -115,6 +115,8 @@ class Home extends React.Component {
             var message = JSON.parse(evt.data);
             if (message.topic === "status") {
                 this.updateStatus(message.message)
+            } else if (message.topic === "arm") {
+                this.updateArmMotion(message.message)
             } else if (message.topic === "webrtc") {
                 if (this.videoStreamRef.current) {
                     this.videoStreamRef.current.handleWebRTCMessage(message);
@@ -150,6 +152,14 @@ class Home extends React.Component {
         document.title = status.robot_name
     }
 
+    updateArmMotion = (motion) => {
+        this.setState(state => ({robot_status: {...state.robot_status, arm: {
+            ...state.robot_status.arm,
+            position: motion.position,
+            moving: ["started", "moving"].includes(motion.state)
+        }}}));
+    }
+
     send_action = (type, action, args={}) => {
         this.send_json({topic: "robot", message: {type: type, action: action, args: args}});
     }
@@ -1,8 +1,10 @@
-import copy
+import asyncio
 import logging
-import math
-import time
+from arm_kinematics import ArmKinematics
+from arm_planning import ConfigurationSpace, PathPlanner
+from models import Config
 from servo.servo_handler import ServoHandler
+from telemetry import Telemetry
 from uart import UART, MessageOriginator, MessageType
 
 logger = logging.getLogger(__name__)
@@ -65,6 +67,15 @@ DEFAULT_EXCLUSION_ZONES = [
         SHOULDER: [35, 35]
     },
 ]
+# Limbs covered by the configuration space, the claw never collides
+PLANNED_LIMBS = [SHOULDER, FOREARM, WRIST]
+SERVO_ID_TO_LIMB = {servo_config["id"]: limb for limb, servo_config in SERVOS_CONFIG.items()}
+
+POSITION_TOLERANCE = 1  # deg
+FEEDBACK_TIMEOUT = 0.5  # sec, on top of the expected travel time
+MOTION_TELEMETRY_RATE = 20  # Hz, servo status rate while the arm is moving
+IDLE_TELEMETRY_RATE = 2  # Hz
+
 #EXCLUSION_ZONES = Config.get("exclusion_zones", DEFAULT_EXCLUSION_ZONES)
 EXCLUSION_ZONES = DEFAULT_EXCLUSION_ZONES
 
@@ -119,9 +130,65 @@ class Arm(object):
         FOREARM: 0,
         SHOULDER: 0,
     }
+    # Motions are queued and executed one after the other by motion_task
+    motion_queue = None
+    motion_task = None
+    # limb -> (target angle, future) resolved when the Pico reports the target position
+    position_waiters = {}
+    # limb -> angle commanded and not reached yet, moves are checked against it rather than the reported position
+    target = {}
+    configuration_space = None
+    path_planner = None
+    # Measured link geometry (arm_geometry config key), claw moves are disabled without it
+    geometry = None
+    kinematics = None
+
+    @staticmethod
+    def get_commanded_position():
+        """Position the arm is heading to: the reported position overridden by the moves in progress"""
+        return {**Arm.position, **Arm.target}
+
+    @staticmethod
+    def get_configuration_space():
+        if Arm.configuration_space is None:
+            Arm.configuration_space = ConfigurationSpace(
+                {limb: SERVOS_CONFIG[limb]["max_angle"] for limb in PLANNED_LIMBS},
+                EXCLUSION_ZONES,
+            )
+        return Arm.configuration_space
+
+    @staticmethod
+    def get_path_planner():
+        if Arm.path_planner is None:
+            Arm.path_planner = PathPlanner(Arm.get_configuration_space())
+        return Arm.path_planner
+
+    @staticmethod
+    def get_kinematics():
+        """Kinematics of the arm, None while its geometry is not calibrated"""
+        if Arm.kinematics is None and Arm.geometry is not None:
+            Arm.kinematics = ArmKinematics(Arm.geometry, Arm.get_configuration_space())
+        return Arm.kinematics
+
+    @staticmethod
+    def load_geometry():
+        # For each planned limb: length of the link it drives (mm), servo angle at which the link is
+        # aligned with the previous one (horizontal for the shoulder) and rotation direction (1 or -1)
+        geometry = Config.get("arm_geometry")
+        Arm.geometry = None
+        Arm.kinematics = None
+        if geometry is None:
+            logger.warning("Arm geometry is not calibrated, claw moves are disabled")
+        elif any(limb not in geometry for limb in PLANNED_LIMBS):
+            logger.error(f"Invalid arm geometry {geometry}, expecting {PLANNED_LIMBS}")
+        else:
+            Arm.geometry = {limb: geometry[limb] for limb in PLANNED_LIMBS}
 
     @staticmethod
     def setup():
+        Arm.get_path_planner()
+        Arm.load_geometry()
+        Arm.get_kinematics()
         for servo_config in SERVOS_CONFIG.values():
             ServoHandler.configure(
                 servo_id=servo_config["id"],
@@ -137,20 +204,19 @@ class Arm(object):
 
     @staticmethod
     def receive_uart_message(message, originator, message_type):
-        servo_id_to_limb = {s["id"]: limb for limb, s in SERVOS_CONFIG.items()}
-        servo_nb = 0
-        while len(message) > servo_nb * 3:
-            offset = servo_nb * 3
-            servo_id = int(message[offset])
-            is_initialized = message[offset + 1].lower() == "y"
-            position = message[offset + 2]
-            position = float(position) if position != 'null' else None
-            servo_nb += 1
-            if servo_id in servo_id_to_limb:
-                limb = servo_id_to_limb[servo_id]
+        for servo_id, is_initialized, position in message:
+            limb = SERVO_ID_TO_LIMB.get(servo_id)
+            if limb is not None:
                 servo_config = SERVOS_CONFIG[limb]
                 if position is not None:
                     Arm.position[limb] = position * servo_config["max_angle"] / 100.0
+                    if limb in Arm.target and abs(Arm.position[limb] - Arm.target[limb]) <= POSITION_TOLERANCE:
+                        del Arm.target[limb]
+                    waiter = Arm.position_waiters.get(limb)
+                    if waiter is not None:
+                        target_angle, future = waiter
+                        if abs(Arm.position[limb] - target_angle) <= POSITION_TOLERANCE and not future.done():
+                            future.set_result(Arm.position[limb])
                 if not is_initialized:
                     logger.info("Successfully re-initialized servo controller")
                     ServoHandler.configure(
@@ -163,38 +229,14 @@ class Arm(object):
     @staticmethod
     def _in_exclusion_zone(id, angle, position=None):
         if position is None:
-            position = Arm.position
-        for exclusion_zone in EXCLUSION_ZONES:
-            if id in exclusion_zone:
-                if angle < exclusion_zone.get(id)[0] or angle > exclusion_zone.get(id)[1]:
-                    continue
-                else:
-                    all_match = True
-                    for other_id in [i for i in exclusion_zone.keys() if i != id]:
-                        if position[other_id] < exclusion_zone[other_id][0] or position[other_id] > exclusion_zone[other_id][1]:
-                            all_match = False
-                    if all_match:
-                        return True
-        return False
+            position = Arm.get_commanded_position()
+        return not Arm.get_configuration_space().is_free({**position, id: angle})
 
     @staticmethod
     def _get_servo_range(id):
-        servo_config = SERVOS_CONFIG.get(id)
-        position = Arm.position
-        for exclusion_zone in EXCLUSION_ZONES:
-            if id in exclusion_zone:
-                all_match = True
-                for other_id in [i for i in exclusion_zone.keys() if i != id]:
-                    if position[other_id] < exclusion_zone[other_id][0] or position[other_id] > exclusion_zone[other_id][1]:
-                        all_match = False
-                if all_match:
-                    if position[id] < exclusion_zone[id][0]:
-                        return [0, exclusion_zone[id][0]]
-                    elif position[id] > exclusion_zone[id][1]:
-                        return [exclusion_zone[id][1], servo_config["max_angle"]]
-                    # In exclusion zone, no move possible
-                    return None
-        return [0, servo_config["max_angle"]]
+        if id not in PLANNED_LIMBS:
+            return [0, SERVOS_CONFIG[id]["max_angle"]]
+        return Arm.get_configuration_space().free_range(id, Arm.get_commanded_position())
 
     @staticmethod
     def get_ids():
@@ -206,6 +248,8 @@ class Arm(object):
 
     @staticmethod
     def stop():
+        Arm.cancel_motions()
+        Arm.target.clear()
         for servo_config in SERVOS_CONFIG.values():
             ServoHandler.stop_servo(servo_config.get("id"))
 
@@ -214,6 +258,7 @@ class Arm(object):
         servo_config = SERVOS_CONFIG.get(id)
         if servo_config is None:
             return False, f"Unknown servo ID: {id}"
+        Arm.target.pop(id, None)
         ServoHandler.stop_servo(servo_config.get("id"))
 
     @staticmethod
@@ -222,6 +267,9 @@ class Arm(object):
         if servo_config is None:
             return False, f"Unknown servo ID: {id}"
 
+        # Manual control takes over any motion in progress
+        Arm.cancel_motions()
+        Arm.target.pop(id, None)
         servo_range = Arm._get_servo_range(id)
         if servo_range is not None:
             target_position = servo_range[1] if speed > 0 else servo_range[0]
@@ -234,8 +282,7 @@ class Arm(object):
             return False, message
 
     @staticmethod
-    def move_servo_to_position(id, angle, wait=True, lock_wrist=False):
-        logger.info(f"Moving servo {dict(id=id, angle=angle, wait=wait, lock_wrist=lock_wrist)}")
+    def _check_move(id, angle):
         servo_config = SERVOS_CONFIG.get(id)
         if servo_config is None:
             return False, f"Unknown servo ID: {id}"
@@ -251,75 +298,298 @@ class Arm(object):
             logger.warning(message)
             return False, message
 
+        position = Arm.get_commanded_position()
+        if not Arm.get_configuration_space().is_path_free(position, {**position, id: angle}):
+            message = f"Moving through an exclusion zone for {id}"
+            logger.warning(message)
+            return False, message
+        return True, "Success"
+
+    @staticmethod
+    def _travel_time(id, angle, start_angle=None):
+        # Hobby servos give no feedback, the Pico reports the commanded position.
+        # The physical travel time is estimated from the servo speed.
+        if start_angle is None:
+            start_angle = Arm.position[id]
+        speed = SERVOS_CONFIG[id].get('speed')
+        return 1.5 * speed * abs(start_angle - angle) / 60
+
+    @staticmethod
+    def _send_move(id, angle):
+        servo_config = SERVOS_CONFIG.get(id)
+        ServoHandler.move(servo_config.get("id"), angle * 100 / servo_config.get("max_angle"))
+        Arm.target[id] = angle
+
+    @staticmethod
+    async def _wait_for_position(targets, travel_time):
+        """Wait until the Pico reports every limb at its target angle and the travel time has elapsed"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + travel_time
+        futures = []
+        for id, angle in targets.items():
+            future = loop.create_future()
+            Arm.position_waiters[id] = (angle, future)
+            futures.append(future)
+        try:
+            await asyncio.wait_for(asyncio.gather(*futures), travel_time + FEEDBACK_TIMEOUT)
+        except asyncio.TimeoutError:
+            message = f"No position feedback for {', '.join(targets.keys())}"
+            logger.warning(message)
+            return False, message
+        finally:
+            for id in targets.keys():
+                Arm.position_waiters.pop(id, None)
+        await asyncio.sleep(max(0.0, deadline - loop.time()))
+        return True, "Success"
+
+    @staticmethod
+    def _send_trajectory(ids, keyframes):
+        """Keyframes are (time in sec, [angle, ...]), the Pico interpolates between them"""
+        max_angles = [SERVOS_CONFIG[id].get("max_angle") for id in ids]
+        ServoHandler.follow(
+            [SERVOS_CONFIG[id].get("id") for id in ids],
+            [(ts, [angle * 100 / max_angle for angle, max_angle in zip(angles, max_angles)]) for ts, angles in keyframes]
+        )
+        Arm.target.update(zip(ids, keyframes[-1][1]))
+
+    @staticmethod
+    async def _move_servo(id, angle, wait=True, lock_wrist=False):
+        logger.info(f"Moving servo {dict(id=id, angle=angle, wait=wait, lock_wrist=lock_wrist)}")
+        success, message = Arm._check_move(id, angle)
+        if not success:
+            return False, message
+
         if id == FOREARM and lock_wrist:
-            forearm_angle = Arm.position[FOREARM]
-            wrist_angle = Arm.position[WRIST]
-            step = int(math.copysign(1, angle - forearm_angle))
-            for i in range(int(abs(angle - forearm_angle))):
-                Arm.move_servo_to_position(id=FOREARM, angle=forearm_angle + (i + 1) * step, wait=wait, lock_wrist=False)
-                Arm.move_servo_to_position(id=WRIST, angle=wrist_angle - (i + 1) * step, wait=wait, lock_wrist=False)
+            # Keep the claw orientation: the wrist moves opposite to the forearm, in a single trajectory
+            commanded = Arm.get_commanded_position()
+            wrist_target = commanded[WRIST] - (angle - commanded[FOREARM])
+            success, message = Arm._check_move(WRIST, wrist_target)
+            if not success:
+                return False, message
+            if not Arm.get_configuration_space().is_path_free(
+                    commanded, {**commanded, FOREARM: angle, WRIST: wrist_target}):
+                message = f"Moving through an exclusion zone for {id}"
+                logger.warning(message)
+                return False, message
+            travel_time = max(Arm._travel_time(FOREARM, angle), Arm._travel_time(WRIST, wrist_target))
+            Arm._send_trajectory([FOREARM, WRIST], [
+                (0.0, [Arm.position[FOREARM], Arm.position[WRIST]]),
+                (travel_time, [angle, wrist_target]),
+            ])
+            if wait:
+                return await Arm._wait_for_position({FOREARM: angle, WRIST: wrist_target}, travel_time)
         else:
-            ServoHandler.move(servo_config.get("id"), angle * 100 / max_angle)
-
+            travel_time = Arm._travel_time(id, angle)
+            Arm._send_move(id, angle)
             if wait:
-                speed = servo_config.get('speed')
-                time.sleep(1.5 * speed * abs(Arm.position[id] - angle) / 60)
-            Arm.position[id] = angle
-        return  True, "Success"
+                return await Arm._wait_for_position({id: angle}, travel_time)
+        return True, "Success"
+
+    @staticmethod
+    async def _follow_path(path, wait=True):
+        """Move the planned limbs through the waypoints with a single trajectory"""
+        logger.info(f"Following path {path}")
+        previous = {limb: Arm.position[limb] for limb in PLANNED_LIMBS}
+        keyframes = [(0.0, [previous[limb] for limb in PLANNED_LIMBS])]
+        ts = 0.0
+        for waypoint in path:
+            ts += max(Arm._travel_time(limb, waypoint[limb], previous[limb]) for limb in PLANNED_LIMBS)
+            keyframes.append((ts, [waypoint[limb] for limb in PLANNED_LIMBS]))
+            previous = waypoint
+        Arm._send_trajectory(PLANNED_LIMBS, keyframes)
+        if wait:
+            return await Arm._wait_for_position(path[-1], ts)
+        return True, "Success"
 
     @staticmethod
-    def move_to_position(position_id, lock_wrist=False):
+    async def _execute_step(step):
+        if "path" in step:
+            return await Arm._follow_path(**step)
+        return await Arm._move_servo(**step)
+
+    @staticmethod
+    async def _report(progress_callback, **progress):
+        if progress_callback is None:
+            return
+        progress["position"] = dict(Arm.position)
+        try:
+            await progress_callback(progress)
+        except Exception as e:
+            logger.warning(f"Unable to report arm motion progress: {e}")
+
+    @staticmethod
+    async def _execute_motion(name, plan, progress_callback):
+        success, message, moves = plan()
+        if not success:
+            await Arm._report(progress_callback, motion=name, state="failed", message=message)
+            return
+        await Arm._report(progress_callback, motion=name, state="started", step=0, nb_of_steps=len(moves))
+        try:
+            for i, move in enumerate(moves):
+                success, message = await Arm._execute_step(move)
+                if not success:
+                    await Arm._report(progress_callback, motion=name, state="failed", message=message,
+                                      step=i, nb_of_steps=len(moves))
+                    return
+                await Arm._report(progress_callback, motion=name, state="moving", step=i + 1, nb_of_steps=len(moves))
+        except asyncio.CancelledError:
+            await Arm._report(progress_callback, motion=name, state="cancelled")
+            raise
+        await Arm._report(progress_callback, motion=name, state="done", step=len(moves), nb_of_steps=len(moves))
+
+    @staticmethod
+    async def _execute_motions():
+        Telemetry.subscribe(MessageOriginator.servo, MOTION_TELEMETRY_RATE)
+        try:
+            while not Arm.motion_queue.empty():
+                name, plan, progress_callback = Arm.motion_queue.get_nowait()
+                try:
+                    await Arm._execute_motion(name, plan, progress_callback)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.error(f"Arm motion {name} failed", exc_info=True)
+        finally:
+            Telemetry.subscribe(MessageOriginator.servo, IDLE_TELEMETRY_RATE)
+
+    @staticmethod
+    def _schedule(name, plan, progress_callback=None):
+        # plan is evaluated when the motion starts, against the position reached by the previous motions
+        if Arm.motion_queue is None:
+            Arm.motion_queue = asyncio.Queue()
+        Arm.motion_queue.put_nowait((name, plan, progress_callback))
+        if Arm.motion_task is None or Arm.motion_task.done():
+            Arm.motion_task = asyncio.get_running_loop().create_task(Arm._execute_motions())
+        return True, "Scheduled"
+
+    @staticmethod
+    def cancel_motions():
+        if Arm.motion_queue is not None:
+            while not Arm.motion_queue.empty():
+                Arm.motion_queue.get_nowait()
+        if Arm.motion_task is not None and not Arm.motion_task.done():
+            Arm.motion_task.cancel()
+        Arm.motion_task = None
+
+    @staticmethod
+    def is_moving():
+        return Arm.motion_task is not None and not Arm.motion_task.done()
+
+    @staticmethod
+    def move_servo_to_position(id, angle, wait=True, lock_wrist=False, progress_callback=None):
+        if id not in SERVOS_CONFIG:
+            return False, f"Unknown servo ID: {id}"
+
+        def plan():
+            success, message = Arm._check_move(id, angle)
+            return success, message, [dict(id=id, angle=angle, wait=wait, lock_wrist=lock_wrist)]
+        return Arm._schedule(f"{id}:{angle}", plan, progress_callback)
+
+    @staticmethod
+    def _plan_position(position_id, lock_wrist=False):
         position = PRESET_POSITIONS.get(position_id)
         if position is None:
             message = f"Unknown position ID: {position_id}"
             logger.warning(message)
-            return False, message
+            return False, message, []
 
         # Lock wrist?
         move_by_id = {move.get('id'): move.get('angle') for move in position.get('moves')}
         if lock_wrist and WRIST in move_by_id and FOREARM in move_by_id:
             moves = []
-            wrist_angle = move_by_id.get(WRIST) + move_by_id.get(FOREARM) - Arm.position.get(FOREARM)
+            commanded = Arm.get_commanded_position()
+            wrist_angle = move_by_id.get(WRIST) + move_by_id.get(FOREARM) - commanded.get(FOREARM)
             # First adjust wrist
             moves.append(dict(id=WRIST, angle=wrist_angle))
             moves.append(dict(id=FOREARM, angle=move_by_id.get(FOREARM), lock_wrist=True))
             if SHOULDER in move_by_id:
                 moves.append(dict(id=SHOULDER, angle=move_by_id.get(SHOULDER)))
-        else:
-            moves = copy.deepcopy(position.get("moves"))
-
-        # Try to re-arrange moves to avoid exclusion zones
-        servo_position = copy.deepcopy(Arm.position)
-        sorted_moves = []
-        nb_of_moves = 0
-        while len(moves) > 0:
-            for i in range(len(moves)):
-                move = moves.pop(0)
-                if not Arm._in_exclusion_zone(move.get("id"), move.get("angle"), servo_position):
-                    servo_position[move.get('id')] = move.get('angle')
-                    sorted_moves.append(move)
-                else:
-                    moves.append(move)
-            # No new moves found?
-            if len(sorted_moves) == nb_of_moves:
+            # Try to re-arrange moves to avoid exclusion zones
+            sorted_moves = Arm.get_configuration_space().order_moves(commanded, moves)
+            if sorted_moves is None:
                 message = "Moving to an exclusion zone"
                 logger.warning(message)
-                return False, message
-            nb_of_moves = len(sorted_moves)
+                return False, message, []
+            return True, "Success", sorted_moves
 
-        for move in sorted_moves:
-            success, message = Arm.move_servo_to_position(id=move.get("id"), angle=move.get("angle"), lock_wrist=move.get('lock_wrist', False))
-            if not success:
+        success, message, path = Arm.plan_path({limb: angle for limb, angle in move_by_id.items() if limb in PLANNED_LIMBS})
+        if not success:
+            return False, message, []
+        steps = Arm._path_steps(path)
+        steps += [dict(id=limb, angle=angle) for limb, angle in move_by_id.items() if limb not in PLANNED_LIMBS]
+        return True, "Success", steps
+
+    @staticmethod
+    def _path_steps(path):
+        # Trajectories are limited in size on the Pico, long paths are split
+        chunk_size = ServoHandler.MAX_KEYFRAMES - 1
+        return [dict(path=path[i:i + chunk_size]) for i in range(0, len(path), chunk_size)]
+
+    @staticmethod
+    def plan_path(targets):
+        """Collision-free waypoints from the current position to the target angles, plans are cached"""
+        start = Arm.get_commanded_position()
+        goal = {limb: targets.get(limb, start[limb]) for limb in PLANNED_LIMBS}
+        for limb, angle in goal.items():
+            if angle < 0 or angle > SERVOS_CONFIG[limb]["max_angle"]:
+                message = f"Invalid angle: {angle} for {limb}"
                 logger.warning(message)
-                return False, message
+                return False, message, []
+        path = Arm.get_path_planner().plan(start, goal)
+        if path is None:
+            message = "No path avoiding the exclusion zones"
+            logger.warning(message)
+            return False, message, []
+        return True, "Success", path
+
+    @staticmethod
+    def move_to_position(position_id, lock_wrist=False, progress_callback=None):
+        if position_id not in PRESET_POSITIONS:
+            message = f"Unknown position ID: {position_id}"
+            logger.warning(message)
+            return False, message
+        return Arm._schedule(position_id, lambda: Arm._plan_position(position_id, lock_wrist), progress_callback)
+
+    @staticmethod
+    def get_claw_position():
+        """Claw position from the reported servo angles, None while the arm geometry is not calibrated"""
+        kinematics = Arm.get_kinematics()
+        if kinematics is None:
+            return None
+        x, z, pitch = kinematics.forward(Arm.position)
+        return dict(x=x, z=z, pitch=pitch)
+
+    @staticmethod
+    def _plan_claw_position(x, z, pitch):
+        angles = Arm.get_kinematics().solve(x, z, pitch, Arm.get_commanded_position())
+        if angles is None:
+            message = f"Unreachable claw position {dict(x=x, z=z, pitch=pitch)}"
+            logger.warning(message)
+            return False, message, []
+        success, message, path = Arm.plan_path(angles)
+        if not success:
+            return False, message, []
+        return True, "Success", Arm._path_steps(path)
 
-        return  True, "Success"
+    @staticmethod
+    def move_claw_to(x, z, pitch, progress_callback=None):
+        """Move the claw tip to (x, z) mm from the shoulder axis, with the given pitch in degrees"""
+        if Arm.get_kinematics() is None:
+            message = "Arm geometry is not calibrated, unable to move the claw"
+            logger.warning(message)
+            return False, message
+        return Arm._schedule(f"claw:{x}:{z}:{pitch}", lambda: Arm._plan_claw_position(x, z, pitch), progress_callback)
 
     @staticmethod
     def serialize():
-        return {
+        status = {
             "position": Arm.position,
+            "moving": Arm.is_moving(),
             "ids": Arm.get_ids(),
             "position_ids": Arm.get_position_ids(),
             "config": SERVOS_CONFIG
         }
+        claw = Arm.get_claw_position()
+        if claw is not None:
+            status["claw"] = claw
+        return status
@@ -0,0 +1,96 @@
+import logging
+import math
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ArmKinematics(object):
+    """Planar kinematics of the shoulder / forearm / wrist chain.
+
+    Positions are in mm in the vertical plane of the arm, x pointing forward and
+    z up from the shoulder axis. The pitch is the angle of the claw from the
+    horizontal, in degrees. The geometry gives, for each joint, the length of
+    the link it drives, the servo angle at which that link is aligned with the
+    previous one and the rotation direction.
+    """
+    POSITION_RESOLUTION = 5  # mm
+    PITCH_RESOLUTION = 1  # deg
+    MAX_CACHED_SOLUTIONS = 1024
+
+    def __init__(self, geometry, space):
+        self.limbs = list(geometry.keys())
+        self.lengths = np.array([geometry[limb]["length"] for limb in self.limbs], dtype=np.float64)
+        self.zeros = np.array([geometry[limb]["zero"] for limb in self.limbs], dtype=np.float64)
+        self.directions = np.array([geometry[limb]["direction"] for limb in self.limbs], dtype=np.float64)
+        self.max_angles = np.array([space.max_angles[space.axis[limb]] for limb in self.limbs], dtype=np.float64)
+        self.space = space
+        self.cache = {}
+
+    def forward(self, position):
+        """Claw (x, z, pitch) for the given servo angles"""
+        angles = np.array([position[limb] for limb in self.limbs], dtype=np.float64)
+        link_angles = np.cumsum(np.radians((angles - self.zeros) * self.directions))
+        x = float(np.sum(self.lengths * np.cos(link_angles)))
+        z = float(np.sum(self.lengths * np.sin(link_angles)))
+        return x, z, math.degrees(link_angles[-1])
+
+    def inverse(self, x, z, pitch):
+        """Servo angles for both elbow configurations, as an array of shape (..., 2, 3).
+
+        Targets can be arrays, unreachable solutions are NaN.
+        """
+        x, z, pitch = np.broadcast_arrays(*[np.asarray(v, dtype=np.float64) for v in (x, z, pitch)])
+        l1, l2, l3 = self.lengths
+        phi = np.radians(pitch)
+        # Wrist joint position
+        wx = x - l3 * np.cos(phi)
+        wz = z - l3 * np.sin(phi)
+        cos_elbow = (wx ** 2 + wz ** 2 - l1 ** 2 - l2 ** 2) / (2 * l1 * l2)
+        with np.errstate(invalid="ignore"):
+            elbow = np.arccos(cos_elbow)
+        elbows = np.stack([elbow, -elbow], axis=-1)
+        shoulders = np.arctan2(wz, wx)[..., np.newaxis] - np.arctan2(l2 * np.sin(elbows), l1 + l2 * np.cos(elbows))
+        wrists = phi[..., np.newaxis] - shoulders - elbows
+        # Relative angles are only known modulo 360, pick for each joint the turn
+        # landing in its servo range [0, max_angle] (servos can exceed 180 deg)
+        relative = np.degrees(np.stack([shoulders, elbows, wrists], axis=-1))
+        relative = (relative + 180) % 360 - 180
+        turns = np.array([0, -360, 360], dtype=np.float64)
+        candidates = self.zeros[:, np.newaxis] + (relative[..., np.newaxis] + turns) * self.directions[:, np.newaxis]
+        in_range = (candidates >= 0) & (candidates <= self.max_angles[:, np.newaxis])
+        # Keep the first turn when none fits, the solution is then rejected as out of range
+        turn = np.argmax(in_range, axis=-1)[..., np.newaxis]
+        return np.take_along_axis(candidates, turn, axis=-1)[..., 0]
+
+    def _solutions(self, x, z, pitch):
+        key = (
+            int(round(x / self.POSITION_RESOLUTION)),
+            int(round(z / self.POSITION_RESOLUTION)),
+            int(round(pitch / self.PITCH_RESOLUTION)),
+        )
+        if key not in self.cache:
+            candidates = self.inverse(
+                key[0] * self.POSITION_RESOLUTION,
+                key[1] * self.POSITION_RESOLUTION,
+                key[2] * self.PITCH_RESOLUTION,
+            )
+            solutions = []
+            for angles in candidates:
+                position = {limb: float(angle) for limb, angle in zip(self.limbs, angles)}
+                if not np.isnan(angles).any() and self.space.is_free(position):
+                    solutions.append(position)
+            if len(self.cache) >= self.MAX_CACHED_SOLUTIONS:
+                del self.cache[next(iter(self.cache))]
+            self.cache[key] = solutions
+        return self.cache[key]
+
+    def solve(self, x, z, pitch, current=None):
+        """Servo angles putting the claw at (x, z, pitch), closest to the current position, None if unreachable"""
+        solutions = self._solutions(x, z, pitch)
+        if len(solutions) == 0:
+            return None
+        if current is None:
+            return solutions[0]
+        return min(solutions, key=lambda position: sum(abs(position[limb] - current[limb]) for limb in self.limbs))
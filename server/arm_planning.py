@@ -0,0 +1,226 @@
+import itertools
+import logging
+import math
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigurationSpace(object):
+    """Joint-space occupancy grid of the arm at 1 degree resolution.
+
+    A cell is blocked when the configuration falls into one of the exclusion
+    zones. Limbs missing from a zone are unconstrained by it.
+    """
+
+    def __init__(self, max_angles, exclusion_zones):
+        self.limbs = list(max_angles.keys())
+        self.axis = {limb: i for i, limb in enumerate(self.limbs)}
+        self.max_angles = np.array([max_angles[limb] for limb in self.limbs], dtype=np.float64)
+        self.shape = tuple(int(max_angle) + 1 for max_angle in self.max_angles)
+        self.blocked = np.zeros(self.shape, dtype=bool)
+        for exclusion_zone in exclusion_zones:
+            index = []
+            for limb, size in zip(self.limbs, self.shape):
+                if limb in exclusion_zone:
+                    low, high = exclusion_zone[limb]
+                    index.append(slice(max(0, math.ceil(low)), min(size, math.floor(high) + 1)))
+                else:
+                    index.append(slice(None))
+            self.blocked[tuple(index)] = True
+        logger.info(f"Built arm configuration space {self.shape}, {self.blocked.mean() * 100:.1f}% blocked")
+
+    def vector(self, position):
+        return np.array([position[limb] for limb in self.limbs], dtype=np.float64)
+
+    def in_range(self, vector):
+        return bool(np.all(vector >= 0) and np.all(vector <= self.max_angles))
+
+    def is_free(self, position):
+        vector = self.vector(position)
+        if not self.in_range(vector):
+            return False
+        return not self.blocked[tuple(np.rint(vector).astype(int))]
+
+    @staticmethod
+    def _segment(start, end):
+        """Grid cells crossed by the straight joint-space line from start to end"""
+        nb_of_points = int(math.ceil(np.abs(end - start).max())) + 1
+        return np.rint(np.linspace(start, end, nb_of_points)).astype(int)
+
+    def is_path_free(self, start, end):
+        start, end = self.vector(start), self.vector(end)
+        if not self.in_range(start) or not self.in_range(end):
+            return False
+        return not self.blocked[tuple(self._segment(start, end).T)].any()
+
+    def free_range(self, limb, position):
+        """Widest [min, max] angle reachable by moving `limb` alone, None if the arm is in an exclusion zone"""
+        index = np.clip(np.rint(self.vector(position)).astype(int), 0, np.array(self.shape) - 1)
+        axis = self.axis[limb]
+        line_index = list(index)
+        line_index[axis] = slice(None)
+        line = self.blocked[tuple(line_index)]
+        current = int(index[axis])
+        if line[current]:
+            return None
+        below = np.flatnonzero(line[:current])
+        above = np.flatnonzero(line[current + 1:])
+        low = int(below[-1]) + 1 if len(below) > 0 else 0
+        high = current + int(above[0]) if len(above) > 0 else len(line) - 1
+        return [low, high]
+
+    def order_moves(self, position, moves):
+        """First ordering of single-joint moves whose sweeps all stay out of the exclusion zones.
+
+        Every ordering is expanded into the grid cells it sweeps through and
+        checked with a single lookup, the given order being preferred.
+        """
+        start = self.vector(position)
+        if not self.in_range(start):
+            return None
+        orders = list(itertools.permutations(range(len(moves))))
+        paths = []
+        for order in orders:
+            current = start
+            segments = [np.rint(current[np.newaxis]).astype(int)]
+            for i in order:
+                axis = self.axis.get(moves[i]["id"])
+                if axis is None:
+                    continue
+                target = current.copy()
+                target[axis] = moves[i]["angle"]
+                if not self.in_range(target):
+                    return None
+                segments.append(self._segment(current, target))
+                current = target
+            paths.append(np.concatenate(segments))
+        offsets = np.cumsum([0] + [len(path) for path in paths[:-1]])
+        blocked = self.blocked[tuple(np.concatenate(paths).T)]
+        free_orders = np.flatnonzero(~np.logical_or.reduceat(blocked, offsets))
+        if len(free_orders) == 0:
+            return None
+        return [moves[i] for i in orders[free_orders[0]]]
+
+
+class PathPlanner(object):
+    """Collision-free joint-space paths between arm positions.
+
+    The direct move and the single-joint move orders are tried first. Otherwise
+    a breadth-first wavefront is propagated with numpy over a coarser copy of
+    the configuration space, a cell being blocked if any of its 1 degree cells
+    is. The resulting path is shortened by skipping waypoints in line of sight.
+    """
+    RESOLUTION = 5  # deg
+    MAX_CACHED_PLANS = 64
+
+    def __init__(self, space, resolution=RESOLUTION):
+        self.space = space
+        self.resolution = resolution
+        padded_shape = [int(math.ceil(size / resolution)) * resolution for size in space.shape]
+        padded = np.zeros(padded_shape, dtype=bool)
+        padded[tuple(slice(0, size) for size in space.shape)] = space.blocked
+        pooled_shape = []
+        for size in padded_shape:
+            pooled_shape += [size // resolution, resolution]
+        self.blocked = padded.reshape(pooled_shape).any(axis=tuple(range(1, 2 * len(padded_shape), 2)))
+        self.cache = {}
+
+    def _cell(self, vector):
+        return tuple(np.minimum(vector // self.resolution, np.array(self.blocked.shape) - 1).astype(int))
+
+    def _center(self, cell):
+        return np.minimum((np.array(cell) + 0.5) * self.resolution, self.space.max_angles)
+
+    @staticmethod
+    def _dilate(mask):
+        dilated = mask.copy()
+        for axis in range(mask.ndim):
+            lower = [slice(None)] * mask.ndim
+            upper = [slice(None)] * mask.ndim
+            lower[axis] = slice(0, -1)
+            upper[axis] = slice(1, None)
+            dilated[tuple(lower)] |= mask[tuple(upper)]
+            dilated[tuple(upper)] |= mask[tuple(lower)]
+        return dilated
+
+    def _search(self, start, goal):
+        """Cell centers from start to goal, None if the goal can't be reached"""
+        start_cell, goal_cell = self._cell(start), self._cell(goal)
+        free = ~self.blocked
+        free[start_cell] = free[goal_cell] = True
+        # Distance to the goal, propagated as a wavefront
+        distance = np.full(self.blocked.shape, -1, dtype=np.int32)
+        distance[goal_cell] = 0
+        frontier = np.zeros(self.blocked.shape, dtype=bool)
+        frontier[goal_cell] = True
+        step = 0
+        while distance[start_cell] < 0:
+            frontier = self._dilate(frontier) & free & (distance < 0)
+            if not frontier.any():
+                return None
+            step += 1
+            distance[frontier] = step
+        # Walk down the distance field back to the goal
+        cells = [start_cell]
+        offsets = [tuple(int(i == axis) * sign for i in range(self.blocked.ndim))
+                   for axis in range(self.blocked.ndim) for sign in (-1, 1)]
+        while cells[-1] != goal_cell:
+            current = cells[-1]
+            for offset in offsets:
+                cell = tuple(c + o for c, o in zip(current, offset))
+                if all(0 <= c < size for c, size in zip(cell, self.blocked.shape)) \
+                        and distance[cell] == distance[current] - 1:
+                    cells.append(cell)
+                    break
+        return [self._center(cell) for cell in cells[1:-1]]
+
+    def _shorten(self, points):
+        path = [points[0]]
+        i = 0
+        while i < len(points) - 1:
+            j = len(points) - 1
+            while j > i + 1 and not self.space.is_path_free(self._position(points[i]), self._position(points[j])):
+                j -= 1
+            if not self.space.is_path_free(self._position(points[i]), self._position(points[j])):
+                return None
+            path.append(points[j])
+            i = j
+        return path[1:]
+
+    def _position(self, vector):
+        return {limb: float(angle) for limb, angle in zip(self.space.limbs, vector)}
+
+    def plan(self, start, goal):
+        """Waypoints (excluding start, ending with goal) leading from start to goal, None if unreachable"""
+        start_vector, goal_vector = self.space.vector(start), self.space.vector(goal)
+        if not self.space.in_range(start_vector) or not self.space.is_free(goal):
+            return None
+        key = (tuple(np.rint(start_vector).astype(int)), tuple(np.rint(goal_vector).astype(int)))
+        if key in self.cache:
+            return self.cache[key]
+
+        if self.space.is_path_free(start, goal):
+            waypoints = [self._position(goal_vector)]
+        else:
+            moves = [dict(id=limb, angle=goal[limb]) for limb in self.space.limbs if goal[limb] != start[limb]]
+            sorted_moves = self.space.order_moves(start, moves)
+            if sorted_moves is not None:
+                waypoints = []
+                position = self._position(start_vector)
+                for move in sorted_moves:
+                    position = dict(position, **{move["id"]: float(move["angle"])})
+                    waypoints.append(position)
+            else:
+                centers = self._search(start_vector, goal_vector)
+                if centers is None:
+                    waypoints = None
+                else:
+                    points = self._shorten([start_vector] + centers + [goal_vector])
+                    waypoints = None if points is None else [self._position(point) for point in points]
+
+        if len(self.cache) >= self.MAX_CACHED_PLANS:
+            del self.cache[next(iter(self.cache))]
+        self.cache[key] = waypoints
+        return waypoints
@@ -0,0 +1,75 @@
+"""Benchmark the LCD frame conversion against the previous list based path.
+
+Converts full 320x240 frames to big-endian RGB565 and hands them to a null
+SPI device the way LCD_2inch.ShowImage does, then reports the frame rate the
+panel could reach at the configured SPI clock.
+
+    python benchmarks/lcd_rgb565.py [--frames 100] [--spi-freq 40000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from lcd import rgb565
+
+
+class NullSPI(object):
+
+    def __init__(self):
+        self.nb_of_bytes = 0
+
+    def writebytes(self, data):
+        self.nb_of_bytes += len(data)
+
+    def writebytes2(self, data):
+        self.nb_of_bytes += len(data)
+
+
+def legacy_show_image(image, spi):
+    image = image.rotate(180)
+    img = np.asarray(image)
+    pix = np.zeros((img.shape[0], img.shape[1], 2), dtype=np.uint8)
+    pix[..., [0]] = np.add(np.bitwise_and(img[..., [0]], 0xF8), np.right_shift(img[..., [1]], 5))
+    pix[..., [1]] = np.add(np.bitwise_and(np.left_shift(img[..., [1]], 3), 0xE0), np.right_shift(img[..., [2]], 3))
+    pix = pix.flatten().tolist()
+    for i in range(0, len(pix), 4096):
+        spi.writebytes(pix[i:i + 4096])
+
+
+def make_show_image():
+    buffer = rgb565.new_buffer(320, 240)
+
+    def show_image(image, spi):
+        rgb565.to_rgb565(image, out=buffer, rotate=True)
+        spi.writebytes2(rgb565.as_bytes(buffer))
+    return show_image
+
+
+def run(name, show_image, frames, spi_freq):
+    spi = NullSPI()
+    t0 = time.perf_counter()
+    for frame in frames:
+        show_image(frame, spi)
+    elapsed = (time.perf_counter() - t0) / len(frames)
+    transfer = spi.nb_of_bytes / len(frames) * 8 / spi_freq
+    print(f"{name:>9}: {elapsed * 1000:.2f} ms/frame CPU, "
+          f"{1 / (elapsed + transfer):.1f} fps to the panel at {spi_freq / 1e6:.0f} MHz "
+          f"(SPI transfer {transfer * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LCD RGB565 conversion benchmark")
+    parser.add_argument("--frames", type=int, default=100, help="Number of frames")
+    parser.add_argument("--spi-freq", type=int, default=40000000, help="SPI clock in Hz")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [Image.fromarray(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8)) for _ in range(args.frames)]
+    run("legacy", legacy_show_image, frames, args.spi_freq)
+    run("numpy", make_show_image(), frames, args.spi_freq)
@@ -0,0 +1,83 @@
+"""Benchmark the UART line reader against the previous string based buffer.
+
+Feeds a synthetic stream of Pico traffic, built from the motor, servo,
+battery status and keepalive messages at their default rates, through both
+readers. A reader callback gets whatever arrived since the previous one, up
+to SerialTransport.READ_SIZE bytes: a few bytes on an idle loop, full reads
+when the loop is busy. Each chunk size is timed separately, best of
+--repeat runs.
+
+    python benchmarks/uart_reader.py [--seconds 60] [--motor-rate 50] [--chunk-size 16 64 1024]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from uart import LineReader
+
+
+def synthetic_traffic(seconds, motor_rate):
+    lines = []
+    for tick in range(int(seconds * 1000)):
+        if tick % int(1000 / motor_rate) == 0:
+            lines.append(f"M:S:42:61:40:60:{tick / 1000:.4f}:{tick / 1000:.4f}:0.0125:null:0.8234:null:True:False")
+        if tick % 500 == 0:
+            lines.append("S:S:1:Y:75.0:2:Y:12.96296:3:Y:16.66667:4:Y:91.66666:5:Y:100.0")
+        if tick % 1000 == 0:
+            lines.append("K:OK")
+        if tick % 10000 == 0:
+            lines.append("B:S:12.4321")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def legacy_reader(chunks):
+    read_buffer = ""
+    nb_of_lines = 0
+    for chunk in chunks:
+        read_buffer += chunk.decode()
+        while len(read_buffer) > 0:
+            i = read_buffer.find("\n")
+            if i >= 0:
+                line = read_buffer[:i + 1]
+                read_buffer = read_buffer[i + 1:]
+                nb_of_lines += len(line[:-1]) > 0
+            else:
+                break
+    return nb_of_lines
+
+
+def line_reader(chunks):
+    reader = LineReader()
+    nb_of_lines = 0
+    for chunk in chunks:
+        nb_of_lines += len(reader.feed(chunk))
+    return nb_of_lines
+
+
+def run(name, reader, chunks, nb_of_bytes, repeat):
+    elapsed = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        nb_of_lines = reader(chunks)
+        elapsed = min(time.perf_counter() - t0, elapsed or float("inf"))
+    print(f"{name:>9}: {nb_of_lines} lines in {elapsed * 1000:.1f} ms "
+          f"({nb_of_lines / elapsed:,.0f} lines/s, {nb_of_bytes / elapsed / 1e6:.1f} MB/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="UART reader benchmark")
+    parser.add_argument("--seconds", type=int, default=60, help="Seconds of traffic")
+    parser.add_argument("--motor-rate", type=int, default=50, help="Motor telemetry rate in Hz")
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[16, 64, 1024], help="Bytes per serial read")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per reader, the best one is reported")
+    args = parser.parse_args()
+
+    traffic = synthetic_traffic(args.seconds, args.motor_rate)
+    for chunk_size in args.chunk_size:
+        chunks = [traffic[i:i + chunk_size] for i in range(0, len(traffic), chunk_size)]
+        print(f"{len(traffic)} bytes of traffic in {len(chunks)} chunks of {chunk_size} bytes")
+        run("legacy", legacy_reader, chunks, len(traffic), args.repeat)
+        run("bytearray", line_reader, chunks, len(traffic), args.repeat)
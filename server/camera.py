@@ -10,6 +10,9 @@ from handlers.base import BaseHandler
 from models import Config
 from motor.motor import Motor
 from servo.servo_handler import ServoHandler
+from vision.calibration import CameraCalibration
+from vision.floor import FloorProjection, HomographyProjection
+from vision.frame import FrameCache
 
 if platform.machine() == "aarch":  # Raspberry 32 bits
     try:
@@ -41,6 +44,17 @@ poly_coefficients = np.polyfit(reference['y_pos'], alpha, 3)
 max_y_pos = 42
 
 
+def ground_distance(y):
+    """Distance (m) to the floor points seen at `y` % from the top of the frame, y being a scalar or an array"""
+    a = np.polyval(poly_coefficients, np.minimum(max_y_pos, 100 - np.asarray(y, dtype=np.float64)))
+    return H * np.tan(a)
+
+
+def lateral_scale(distance):
+    """Floor width (m) covered by half of the frame at `distance`"""
+    return (MAX_DISTANCE / (MAX_DISTANCE - np.minimum(distance, MAX_DISTANCE - 0.1))) * ROBOT_WIDTH / 2
+
+
 def _open_usb_capture(index):
     if platform.system() == "Linux":
         cap = cv2.VideoCapture(index, cv2.CAP_V4L2)
@@ -222,6 +236,11 @@ class Camera(object):
     servo_position = 0
     new_streaming_frame_callbacks = {}
     available_device = None
+    lense_coeff_x_pos = 1.0
+    calibration = None
+    floor_projections = {}
+    # Resolution of the lookup table used for positions given in % of the frame
+    PERCENT_RESOLUTION = 1000
 
 
     @staticmethod
@@ -239,6 +258,9 @@ class Camera(object):
         Camera.servo_id = Config.get("camera_servo_id")
         Camera.center_position()
         Camera.frame_rate = Config.get("capturing_framerate")
+        Camera.lense_coeff_x_pos = Config.get("lense_coeff_x_pos")
+        calibration = Config.get("camera_calibration")
+        Camera.set_calibration(None if calibration is None else CameraCalibration.from_dict(calibration))
         if Config.get('front_capturing_device') == "usb" or Config.get('back_capturing_device') == "usb":
             if not Camera.capturing:
                 Camera.available_device = get_camera_index()
@@ -305,14 +327,18 @@ class Camera(object):
                     if Camera.back_capture_device is None or Camera.selected_camera == "front":
                         frame = await asyncio.to_thread(Camera.front_capture_device.retrieve)
                         BaseHandler.emit_event(
-                            topic="camera", event_type="new_front_camera_frame", data=dict(frame=frame),
+                            topic="camera",
+                            event_type="new_front_camera_frame",
+                            data=dict(frame=frame, cache=FrameCache(frame)),
                         )
                         Camera.front_capture_device.add_navigation_lines(frame)
                         Camera.front_capture_device.add_radar(frame, [50, 0], [25, 25])
                     else:
                         frame = await asyncio.to_thread(Camera.back_capture_device.retrieve)
                         BaseHandler.emit_event(
-                            topic="camera", event_type="new_back_camera_frame", data=dict(frame=frame),
+                            topic="camera",
+                            event_type="new_back_camera_frame",
+                            data=dict(frame=frame, cache=FrameCache(frame)),
                         )
 
                     if Camera.back_capture_device is not None and Camera.overlay:
@@ -321,7 +347,7 @@ class Camera(object):
                             BaseHandler.emit_event(
                                 topic="camera",
                                 event_type="new_back_camera_frame",
-                                data=dict(frame=overlay_frame, overlay=True),
+                                data=dict(frame=overlay_frame, cache=FrameCache(overlay_frame), overlay=True),
                             )
                             Camera.front_capture_device.add_overlay(frame, overlay_frame, [75, 0], [25, 25])
                         else:
@@ -329,7 +355,7 @@ class Camera(object):
                             BaseHandler.emit_event(
                                 topic="camera",
                                 event_type="new_front_camera_frame",
-                                data=dict(frame=overlay_frame, overlay=True),
+                                data=dict(frame=overlay_frame, cache=FrameCache(overlay_frame), overlay=True),
                             )
                             Camera.back_capture_device.add_overlay(frame, overlay_frame, [75, 0], [25, 25])
 
@@ -393,20 +419,43 @@ class Camera(object):
         Camera.overlay = overlay
 
     @staticmethod
-    def get_target_position(x, y):
-        # Distance on y axis
-        a = 0
-        for n, p in enumerate(reversed(poly_coefficients)):
-            a += p * math.pow(min(max_y_pos, (100 - y)), n)
-        y_pos = H * math.tan(a)
+    def set_calibration(calibration):
+        Camera.calibration = calibration
+        Camera.floor_projections = {}
 
-        x_pos = (MAX_DISTANCE / (MAX_DISTANCE - min(y_pos, MAX_DISTANCE - 0.1))) * ((x - 50) / 50) * ROBOT_WIDTH/2
-        return x_pos * Config.get("lense_coeff_x_pos"), y_pos
+    @staticmethod
+    def get_floor_projection(width, height):
+        """Floor projection for frames of the given resolution, built once.
+
+        The calibrated ground homography is used when available, the
+        measured polynomial model otherwise.
+        """
+        projection = Camera.floor_projections.get((width, height))
+        if projection is None:
+            if Camera.calibration is not None:
+                projection = HomographyProjection(Camera.calibration, width, height)
+            else:
+                projection = FloorProjection(
+                    width,
+                    height,
+                    ground_distance,
+                    lambda distance: lateral_scale(distance) * Camera.lense_coeff_x_pos
+                )
+            Camera.floor_projections[(width, height)] = projection
+        return projection
+
+    @staticmethod
+    def get_target_position(x, y):
+        """Floor position (m) of the point at (x, y), in % of the frame"""
+        projection = Camera.get_floor_projection(Camera.PERCENT_RESOLUTION, Camera.PERCENT_RESOLUTION)
+        x_pos, y_pos = projection.project(x * Camera.PERCENT_RESOLUTION / 100, y * Camera.PERCENT_RESOLUTION / 100)
+        return float(x_pos), float(y_pos)
 
     @staticmethod
     def serialize():
         return {
             'status': Camera.status,
+            'calibrated': Camera.calibration is not None,
             'streaming': Camera.streaming,
             'overlay': Camera.overlay,
             'selected_camera': Camera.selected_camera,
@@ -2,10 +2,12 @@ __all__ = [
     "arm",
     "base",
     "battery",
+    "calibration",
     "camera",
     "configuration",
     "drive",
     "face_detection",
+    "fiducial",
     "lcd",
     "light",
     "qr_code",
@@ -12,6 +12,9 @@ class DriveHandler(BaseHandler):
         self.register_for_message("arm")
 
     async def process(self, message, protocol):
+        async def send_progress(progress):
+            await protocol.send_message("arm", progress)
+
         if message["action"] == "move":
             Arm.move(**message["args"])
             await self.server.send_status(protocol)
@@ -22,8 +25,13 @@ class DriveHandler(BaseHandler):
             Arm.stop()
             await self.server.send_status(protocol)
         elif message["action"] == "move_servo_to_position":
-            Arm.move_servo_to_position(**message["args"])
+            Arm.move_servo_to_position(**message["args"], progress_callback=send_progress)
             await self.server.send_status(protocol)
         elif message["action"] == "move_to_position":
-            Arm.move_to_position(**message["args"])
+            Arm.move_to_position(**message["args"], progress_callback=send_progress)
+            await self.server.send_status(protocol)
+        elif message["action"] == "move_claw_to":
+            success, result = Arm.move_claw_to(**message["args"], progress_callback=send_progress)
+            if not success:
+                await send_progress(dict(motion="claw", state="failed", message=result))
             await self.server.send_status(protocol)
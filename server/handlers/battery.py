@@ -2,7 +2,7 @@ import cv2
 
 from handlers.base import BaseHandler, register_handler
 from models import Config
-from uart import UART, MessageOriginator, MessageType
+from uart import UART, MessageOriginator, MessagePriority, MessageType
 
 
 @register_handler("battery", needs=["battery_tester"])
@@ -13,7 +13,8 @@ class BatteryHandler(BaseHandler):
         self.battery_level = None
         self.min_battery_volt = 11.5
         self.max_battery_volt = 13.0
-        self.register_for_event("camera", "new_front_camera_frame")
+        # Drawn on the streamed frame, once the detectors are done with the camera frame
+        self.register_for_event("camera", "new_streaming_frame")
         UART.register_consumer("battery_handler", self, MessageOriginator.battery, MessageType.status)
 
     def setup(self, server):
@@ -24,7 +25,7 @@ class BatteryHandler(BaseHandler):
         self.max_battery_volt = Config.get("battery_max_volt")
         # Configure tester and et up to date battery level
         UART.write(f"B:C:{r1}:{r2}")
-        UART.write("B:S")
+        UART.write("B:S", priority=MessagePriority.low)
 
     def add_battery_level(self, frame):
         # Add REC indicator
@@ -44,7 +45,7 @@ class BatteryHandler(BaseHandler):
         )
 
     def receive_uart_message(self, message, originator, message_type):
-        battery_volt = float(message[0])
+        battery_volt = message[0]
         self.battery_level = int(
             100 * (battery_volt - self.min_battery_volt) / (self.max_battery_volt - self.min_battery_volt)
         )
@@ -53,5 +54,5 @@ class BatteryHandler(BaseHandler):
     def receive_event(self, topic, event_type, data):
         if self.battery_level is None:
             self.battery_level = 0
-        if topic == "camera" and event_type == "new_front_camera_frame" and len(data["frame"]) > 0 and not data.get("overlay", False):
+        if topic == "camera" and event_type == "new_streaming_frame" and len(data["frame"]) > 0:
             self.add_battery_level(data["frame"])
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import logging
+
+from camera import Camera
+from handlers.base import BaseHandler, register_handler
+from models import Config
+from vision.calibration import Calibrator
+from vision.frame import FrameCache
+
+logger = logging.getLogger(__name__)
+
+
+@register_handler("calibration")
+class CalibrationHandler(BaseHandler):
+    """Calibrates the front camera with a printed checkerboard.
+
+    `capture_view` keeps views of the board held in various positions for
+    the intrinsics (optional), `calibrate_ground` fits the ground homography
+    from the board lying flat on the floor and saves the result in the robot
+    configuration. Results and progress are sent on the `calibration` topic.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.register_for_message("calibration")
+        self.register_for_event("camera", "new_front_camera_frame")
+        self.running = False
+        self.calibrator = None
+        self.gray = None
+
+    async def process(self, message, protocol):
+        if message["action"] == "start":
+            self.start()
+            await self.send_progress(protocol)
+        elif message["action"] == "stop":
+            self.stop()
+        elif message["action"] == "capture_view":
+            await self.capture_view(protocol)
+        elif message["action"] == "calibrate_ground":
+            await self.calibrate_ground(protocol, **message["args"])
+        elif message["action"] == "reset":
+            Config.delete("camera_calibration")
+            Camera.set_calibration(None)
+            await self.server.send_status(protocol)
+
+    def start(self):
+        columns, rows = (int(n) for n in Config.get("calibration_pattern").split("x"))
+        self.calibrator = Calibrator((columns, rows), Config.get("calibration_square_size"))
+        self.gray = None
+        self.running = True
+        Camera.center_position()
+
+    def stop(self):
+        self.running = False
+        self.calibrator = None
+        self.gray = None
+
+    def receive_event(self, topic, event_type, data):
+        if self.running and topic == "camera" and event_type == "new_front_camera_frame" and len(data["frame"]) > 0:
+            # Derived images are never modified, the latest one can be kept as is
+            self.gray = (data.get("cache") or FrameCache(data["frame"])).gray()
+
+    async def send_progress(self, protocol, **progress):
+        await protocol.send_message("calibration", dict(views=len(self.calibrator.views), **progress))
+
+    async def capture_view(self, protocol):
+        if not self.running or self.gray is None:
+            await protocol.send_message("calibration", dict(success=False, message="No camera frame"))
+            return
+        found = await asyncio.to_thread(self.calibrator.add_view, self.gray)
+        await self.send_progress(protocol, success=found, message="Success" if found else "Checkerboard not found")
+
+    def _calibrate_ground(self, gray, distance, offset):
+        rms = None
+        if len(self.calibrator.views) >= Calibrator.MIN_VIEWS:
+            rms = self.calibrator.calibrate_intrinsics()
+            logger.info(f"Camera intrinsics calibrated, RMS error {rms:.2f} px")
+        return rms, self.calibrator.fit_ground(gray, distance, offset)
+
+    async def calibrate_ground(self, protocol, distance, offset=0.0):
+        """`distance` (m) from the robot to the nearest row of inner corners, board centered `offset` m right"""
+        if not self.running or self.gray is None:
+            await protocol.send_message("calibration", dict(success=False, message="No camera frame"))
+            return
+        try:
+            rms, calibration = await asyncio.to_thread(self._calibrate_ground, self.gray, float(distance), float(offset))
+        except Exception as e:
+            logger.warning("Camera calibration failed", exc_info=True)
+            await self.send_progress(protocol, success=False, message=f"Calibration failed: {e}")
+            return
+        if calibration is None:
+            await self.send_progress(protocol, success=False, message="Checkerboard not found")
+            return
+        Config.save("camera_calibration", json.dumps(calibration.serialize()))
+        Camera.set_calibration(calibration)
+        await self.send_progress(protocol, success=True, message="Success", rms=rms)
+        await self.server.send_status(protocol)
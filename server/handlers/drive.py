@@ -19,3 +19,6 @@ class DriveHandler(BaseHandler):
         elif message["action"] == "patrol" and BaseHandler.state is None:
             BaseHandler.set_state("patrolling")
             Motor.patrol()
+        elif message["action"] == "get_telemetry":
+            # Motor telemetry history, e.g. to plot the wheel speeds
+            await protocol.send_message("motor_telemetry", Motor.get_telemetry(**message.get("args", {})))
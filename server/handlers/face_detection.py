@@ -1,16 +1,28 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 
 from camera import Camera
 from handlers.base import BaseHandler, register_handler
 from models import Config
 from motor.motor import Motor
+from vision.face import create_face_detector
+from vision.frame import FrameCache
+from vision.tracker import OpticalFlowTracker
 
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+logger = logging.getLogger(__name__)
 
 
 @register_handler("face_detection")
 class FaceDetectionHandler(BaseHandler):
+    """Follows a face, the detector runs in a worker thread on a downscaled copy of the frame.
+
+    Between two detections the face box is propagated by an optical flow
+    tracker, so the robot is steered on every frame without ever waiting
+    for the detector.
+    """
+    DETECTION_WIDTH = 320  # px, frames are downscaled to this width before detection / tracking
 
     def __init__(self):
         super().__init__()
@@ -20,6 +32,11 @@ class FaceDetectionHandler(BaseHandler):
         self.face_position = None
         self.running = False
         self.frame_counter = 0
+        self.detector = None
+        self.tracker = OpticalFlowTracker()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="face-detection")
+        self._detection = None
+        self._last_detection_frame = None
 
     async def process(self, message, protocol):
         if message["action"] == "toggle":
@@ -34,6 +51,9 @@ class FaceDetectionHandler(BaseHandler):
             BaseHandler.set_state("face_detection")
             self.running = True
             self.follow_face_speed = Config.get("follow_face_speed")
+            backend = Config.get("face_detector")
+            if self.detector is None or self.detector.name != backend:
+                self.detector = create_face_detector(backend)
             Camera.set_position(100)
 
     def stop(self):
@@ -41,6 +61,10 @@ class FaceDetectionHandler(BaseHandler):
             BaseHandler.reset_state()
         self.running = False
         self.face_position = None
+        self.tracker.reset()
+        # A detection still running is ignored
+        self._detection = None
+        self._last_detection_frame = None
         Camera.center_position()
 
     def toggle(self):
@@ -51,40 +75,56 @@ class FaceDetectionHandler(BaseHandler):
 
     def receive_event(self, topic, event_type, data):
         if self.running and topic == "camera" and event_type == "new_front_camera_frame" and len(data["frame"]) > 0:
-            self.detect_face(frame=data["frame"])
+            self.detect_face(frame=data["frame"], cache=data.get("cache"))
             self.frame_counter += 1
 
-    def detect_face(self, frame):
-        res_y = len(frame)
-        res_x = len(frame[0])
-        # Run face detection every second
-        if self.frame_counter % Camera.frame_rate == 0:
+    def _select_face(self, faces, width):
+        for (x, y, w, h, score) in faces:
+            size_percent = 100 * w / width
+            if 5 <= size_percent <= 40:
+                return x, y, w, h
+        return None
+
+    def detect_face(self, frame, cache=None):
+        if cache is None:
+            cache = FrameCache(frame)
+        res_y, res_x = frame.shape[:2]
+        scale = cache.scale_for_width(self.DETECTION_WIDTH)
+        small = cache.resized(scale)
+        gray = cache.gray(scale)
+
+        if self._detection is not None and self._detection.done():
+            detection, self._detection = self._detection, None
+            try:
+                face = self._select_face(detection.result(), small.shape[1])
+            except Exception:
+                logger.warning("Face detection failed", exc_info=True)
+                face = None
+            if face is None or not self.tracker.init(gray, face):
+                self.tracker.reset()
+            box = self.tracker.box
+        else:
+            box = self.tracker.update(gray)
+
+        # Detect once per second to correct the tracker drift, or as often as possible while no face is tracked
+        if self._detection is None and (
+                self.tracker.box is None
+                or self._last_detection_frame is None
+                or self.frame_counter - self._last_detection_frame >= Camera.frame_rate):
+            # The frame itself is drawn on afterwards, the worker needs its own copy
+            self._detection = self.executor.submit(self.detector.detect, small.copy() if small is frame else small)
+            self._last_detection_frame = self.frame_counter
+
+        if box is None:
             self.face_position = None
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = face_cascade.detectMultiScale(gray, 1.1, 4)
-            # Look for faces with 2 eyes or more
-            for (x, y, w, h) in faces:
-                size_percent = 100 * w / res_x
-                if size_percent < 5 or size_percent > 40:
-                    continue
-                if self.face_position is None:
-                    self.face_position = (x, y, w, h)
-                roi_gray = gray[y:y + h, x:x + w]
-                eyes = eye_cascade.detectMultiScale(roi_gray)
-                if len(eyes) >= 2:  # At least 2 eyes :-) Third one could be the mouth
-                    self.face_position = (x, y, w, h)
-                    break
-
-            if self.face_position is not None:
-                x, y, w, h = self.face_position
-                timeout = 3
-                x_pos = (x + w//2) * 100 / res_x
-                y_pos = (y + h // 2) * 100 / res_y
-                Camera.set_position(y)
-                x_pos, y_pos = Camera.get_target_position(x_pos, y_pos)
-                Motor.move_to_target(x_pos, y_pos, self.follow_face_speed, timeout)
+        else:
+            x, y, w, h = (int(v / scale) for v in box)
+            self.face_position = (x, y, w, h)
+            timeout = 3
+            Camera.set_position(y)
+            x_pos, y_pos = Camera.get_floor_projection(res_x, res_y).project(x + w // 2, y + h // 2)
+            Motor.move_to_target(float(x_pos), float(y_pos), self.follow_face_speed, timeout)
 
         if self.running and self.face_position is not None:
             x, y, w, h = self.face_position
             cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 255, 255), 2)
-
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from camera import Camera
+from handlers.base import BaseHandler, register_handler
+from models import Config
+from motor.motor import Motor
+from vision.fiducial import FiducialDetector
+from vision.frame import FrameCache
+from vision.tracker import OpticalFlowTracker
+
+logger = logging.getLogger(__name__)
+
+
+@register_handler("fiducial")
+class FiducialHandler(BaseHandler):
+    """Drives toward an ArUco marker or a QR code lying on the floor.
+
+    Markers are detected in a worker thread, between two detections the
+    marker box is propagated by an optical flow tracker, so the floor
+    position of its bottom edge (ground plane model of the camera) and the
+    motor command are updated on every frame. The robot stops when the
+    marker is reached. When it is lost for more than LOST_TIMEOUT the robot
+    stops once, reports a "lost" status and waits for the marker to be seen
+    again. Without a target, the first marker seen becomes the target.
+
+    `approach` stops APPROACH_DISTANCE away from the marker, `dock` slows
+    down when getting close and stops DOCK_DISTANCE away.
+    """
+    APPROACH_DISTANCE = 0.3  # m
+    DOCK_DISTANCE = 0.1  # m
+    SLOWDOWN_DISTANCE = 0.5  # m, docking speed decreases below that distance
+    MIN_DOCK_SPEED_RATIO = 0.3
+    LOST_TIMEOUT = 1.0  # s
+    MOVE_TIMEOUT = 1  # s, motors stop by themselves if no correction is sent
+
+    def __init__(self):
+        super().__init__()
+        self.register_for_message("fiducial")
+        self.register_for_event("camera", "new_front_camera_frame")
+        self.running = False
+        self.target = None
+        self.mode = "approach"
+        self.speed = 40
+        self.protocol = None
+        self.detector = None
+        self.tracker = OpticalFlowTracker()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fiducial")
+        self.marker = None
+        self.position = None
+        self._detection = None
+        self._last_seen = None
+        self._lost = False
+
+    async def process(self, message, protocol):
+        if message["action"] == "start":
+            self.start(protocol=protocol, **message.get("args", {}))
+        elif message["action"] == "stop":
+            self.stop()
+
+    def start(self, target=None, mode="approach", protocol=None):
+        """Start navigating toward the `target` marker (e.g. aruco:7 or qr:dock), the first one seen if None"""
+        if BaseHandler.state is None:
+            BaseHandler.set_state("fiducial")
+            self.running = True
+            self.target = target
+            self.mode = mode
+            self.protocol = protocol
+            self.speed = Config.get("fiducial_navigation_speed")
+            dictionary = Config.get("fiducial_dictionary")
+            if self.detector is None or self.detector.dictionary != dictionary:
+                self.detector = FiducialDetector(dictionary)
+            self._last_seen = time.monotonic()
+            self._lost = False
+            Camera.center_position()
+
+    def stop(self, status="stopped"):
+        if BaseHandler.state == "fiducial":
+            BaseHandler.reset_state()
+        if self.running:
+            Motor.stop()
+            self.report(status)
+        self.running = False
+        self.marker = None
+        self.position = None
+        self.tracker.reset()
+        self._lost = False
+        # A detection still running is ignored
+        self._detection = None
+
+    def report(self, status):
+        message = dict(status=status, target=self.marker or self.target, position=self.position)
+        BaseHandler.emit_event(topic="fiducial", event_type=status, data=message)
+        if self.protocol is not None:
+            asyncio.ensure_future(self.send_status(self.protocol, message))
+
+    async def send_status(self, protocol, message):
+        try:
+            await protocol.send_message("fiducial", message)
+        except Exception:
+            logger.warning("Unable to send fiducial navigation status", exc_info=True)
+
+    def receive_event(self, topic, event_type, data):
+        if self.running and topic == "camera" and event_type == "new_front_camera_frame" and len(data["frame"]) > 0:
+            self.navigate(data["frame"], data.get("cache"))
+
+    def _select_marker(self, markers):
+        for name, corners in markers:
+            if self.target is None or name == self.target:
+                # Lock on the first marker seen, not whichever is detected first in the next frames
+                self.target = name
+                return name, corners
+        return None
+
+    def navigate(self, frame, cache=None):
+        if cache is None:
+            cache = FrameCache(frame)
+        res_y, res_x = frame.shape[:2]
+        scale = cache.scale_for_width(FiducialDetector.DETECTION_WIDTH)
+        small = cache.gray(scale)
+        now = time.monotonic()
+
+        box = None
+        if self._detection is not None and self._detection.done():
+            detection, self._detection = self._detection, None
+            try:
+                marker = self._select_marker(detection.result())
+            except Exception:
+                logger.warning("Fiducial detection failed", exc_info=True)
+                marker = None
+            if marker is not None:
+                self.marker, corners = marker
+                x, y, w, h = cv2.boundingRect(np.round(corners * scale).astype(np.int32))
+                if self.tracker.init(small, (x, y, w, h)):
+                    box = self.tracker.box
+        if box is None:
+            box = self.tracker.update(small)
+
+        if self._detection is None:
+            qr_codes = self.target is None or self.target.startswith("qr:")
+            self._detection = self.executor.submit(self.detector.detect, cache.gray(), small, scale, qr_codes)
+
+        if box is None:
+            self.position = None
+            if not self._lost and now - self._last_seen > self.LOST_TIMEOUT:
+                self._lost = True
+                Motor.stop()
+                self.report("lost")
+            return
+        self._last_seen = now
+        self._lost = False
+
+        x, y, w, h = (v / scale for v in box)
+        cv2.rectangle(frame, (int(x), int(y)), (int(x + w), int(y + h)), (255, 255, 255), 2)
+        # Bottom edge of the marker is on the floor
+        x_pos, y_pos = Camera.get_floor_projection(res_x, res_y).project(x + w / 2, y + h)
+        x_pos, y_pos = float(x_pos), float(y_pos)
+        self.position = (x_pos, y_pos)
+
+        stop_distance = self.DOCK_DISTANCE if self.mode == "dock" else self.APPROACH_DISTANCE
+        remaining = y_pos - stop_distance
+        if remaining <= 0:
+            self.stop(status="reached")
+            return
+        speed = self.speed
+        if self.mode == "dock":
+            speed *= max(self.MIN_DOCK_SPEED_RATIO, min(1.0, remaining / self.SLOWDOWN_DISTANCE))
+        Motor.move_to_target(x_pos, remaining, speed, self.MOVE_TIMEOUT)
@@ -1,8 +1,12 @@
+import asyncio
 import logging
 import os
-from PIL import Image
+import threading
 
 from handlers.base import BaseHandler, register_handler
+from lcd.animation import AnimationPlayer
+from lcd.assets import PictureCache
+from models import Config
 
 logger = logging.getLogger(__name__)
 
@@ -16,25 +20,57 @@ class LcdHandler(BaseHandler):
         self.pics_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets/Pics'))
         if not os.path.isdir(self.pics_path):
             self.pics_path = "/etc/pirobot/assets/Pics"
+        self.animations_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets/Animations'))
+        if not os.path.isdir(self.animations_path):
+            self.animations_path = "/etc/pirobot/assets/Animations"
+        self.pictures = None
+        self.animations = None
+
+    def setup(self, server):
+        super().setup(server)
+        if self.eligible:
+            # Decode all the pictures in the background, showing one is then a straight blit
+            threading.Thread(target=self.get_pictures().preload, name="lcd-pictures", daemon=True).start()
+
+    def get_pictures(self):
+        if self.pictures is None:
+            cache_dir = None
+            if Config.get("lcd_picture_disk_cache"):
+                cache_dir = os.path.join(os.environ["HOME"], ".cache/pirobot/Pics")
+            self.pictures = PictureCache(self.pics_path, self.server.lcd.height, self.server.lcd.width, cache_dir)
+        return self.pictures
+
+    def get_animations(self):
+        if self.animations is None:
+            self.animations = AnimationPlayer(self.server.lcd, self.animations_path)
+        return self.animations
+
+    def stop_animation(self):
+        if self.animations is not None:
+            self.animations.stop()
 
     async def process(self, message, protocol):
         if message["action"] == "display_picture":
             self.set_lcd_picture(message["args"]["name"])
+        elif message["action"] == "play_animation":
+            # Loading an animation decodes all its frames, keep it off the event loop
+            success, result = await asyncio.to_thread(self.get_animations().play, **message["args"])
+            await protocol.send_message("lcd", dict(action="play_animation", success=success, message=result))
+        elif message["action"] == "stop_animation":
+            await asyncio.to_thread(self.stop_animation)
 
     def set_lcd_picture(self, name):
-        file_path = os.path.join(self.pics_path, f"{name}.png")
-        if os.path.isfile(file_path):
-            image = Image.open(file_path)
-            image = image.resize((self.server.lcd.height, self.server.lcd.width)).convert('RGB')
-            self.server.lcd.ShowImage(image)
+        self.stop_animation()
+        buffer = self.get_pictures().get(name)
+        if buffer is not None:
+            self.server.lcd.ShowBuffer(buffer)
         else:
             logger.info(f"Picture not found {name}")
 
-    def display_frame(self, frame):
-        from PIL import Image as PILImage
-        img = PILImage.fromarray(frame, 'RGB')
-        img = img.resize((self.server.lcd.height, self.server.lcd.width))
-        self.server.lcd.ShowImage(img)
+    def display_buffer(self, buffer):
+        """Display a frame already in the panel layout (rotated, big-endian RGB565)"""
+        self.stop_animation()
+        self.server.lcd.ShowBuffer(buffer)
 
     def stop_video(self):
         from PIL import Image as PILImage
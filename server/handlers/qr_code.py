@@ -1,11 +1,28 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
+import numpy as np
 
-from camera import Camera
 from handlers.base import BaseHandler, register_handler
+from vision.frame import FrameCache
+from vision.qr import QRScanner
+
+logger = logging.getLogger(__name__)
 
 
 @register_handler("qr_code")
 class QRCodeHandler(BaseHandler):
+    """Continuous QR code scanner, frames are scanned in a worker thread.
+
+    A code is reported once, as a `qr_code` / `new_qr_code` event and a
+    websocket message, and not again until it has been out of sight for
+    DEDUP_TIMEOUT seconds.
+    """
+    MAX_SCAN_RATE = 5  # scans per second
+    DEDUP_TIMEOUT = 3  # s
 
     def __init__(self):
         super().__init__()
@@ -13,21 +30,80 @@ class QRCodeHandler(BaseHandler):
         self.running = False
         self.register_for_message("qr_code")
         self.register_for_event("camera", "new_front_camera_frame")
-        self.detector = cv2.QRCodeDetector()
+        self.scanner = QRScanner()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qr-code")
+        self.protocol = None
+        self.codes = []
+        self.last_seen = dict()
+        self._scan = None
+        self._last_scan_time = 0
 
     async def process(self, message, protocol):
         if message["action"] == "toggle":
-            self.running = not self.running
+            if self.running:
+                self.stop()
+            else:
+                self.start(protocol)
         elif message["action"] == "start":
-            self.running = True
+            self.start(protocol)
         elif message["action"] == "stop":
-            self.running = False
+            self.stop()
+
+    def start(self, protocol=None):
+        self.running = True
+        self.protocol = protocol
+
+    def stop(self):
+        self.running = False
+        self.protocol = None
+        self.codes = []
+        self.last_seen = dict()
+        # A scan still running is ignored
+        self._scan = None
 
     def receive_event(self, topic, event_type, data):
         if self.running and topic == "camera" and event_type == "new_front_camera_frame" and len(data["frame"]) > 0:
-            if self.frame_counter % Camera.frame_rate == 0:
-                decoded_info, points, _ = self.detector.detectAndDecode(data["frame"])
-                if points is not None:
-                    print(decoded_info)
+            self.scan(data["frame"], data.get("cache"))
             self.frame_counter += 1
 
+    def scan(self, frame, cache=None):
+        if cache is None:
+            cache = FrameCache(frame)
+        if self._scan is not None and self._scan.done():
+            scan, self._scan = self._scan, None
+            try:
+                self.codes = scan.result()
+            except Exception:
+                logger.warning("QR code scan failed", exc_info=True)
+                self.codes = []
+            self.report(self.codes)
+
+        now = time.monotonic()
+        if self._scan is None and now - self._last_scan_time >= 1 / self.MAX_SCAN_RATE:
+            scale = cache.scale_for_width(QRScanner.DETECTION_WIDTH)
+            # Derived images are never modified, no copy needed for the worker
+            self._scan = self.executor.submit(self.scanner.scan, cache.gray(), cache.gray(scale), scale)
+            self._last_scan_time = now
+
+        for _, points in self.codes:
+            cv2.polylines(frame, [points.astype(np.int32)], True, (255, 255, 255), 2)
+
+    def report(self, codes):
+        now = time.monotonic()
+        for data, points in codes:
+            last_seen = self.last_seen.get(data)
+            self.last_seen[data] = now
+            if last_seen is not None and now - last_seen < self.DEDUP_TIMEOUT:
+                continue
+            logger.info(f"QR code detected: {data}")
+            message = dict(data=data, points=points.tolist())
+            BaseHandler.emit_event(topic="qr_code", event_type="new_qr_code", data=message)
+            if self.protocol is not None:
+                asyncio.ensure_future(self.send_code(self.protocol, message))
+        self.last_seen = {data: seen for data, seen in self.last_seen.items() if now - seen < self.DEDUP_TIMEOUT}
+
+    async def send_code(self, protocol, message):
+        try:
+            await protocol.send_message("qr_code", message)
+        except Exception:
+            logger.warning("Unable to send QR code", exc_info=True)
@@ -10,6 +10,16 @@ $UV sync
 
 $UV run pyinstaller manage.py $(ls handlers/* | grep -v __init__.py | grep -v base.py | grep -v __pycache__ | grep -v .pyc | sed -e 's/handlers\/\(\w\+\).py/ --hidden-import  handlers.\1/g') --collect-all cv2 --hidden-import picamera2 --hidden-import libcamera -F -n $DAEMON_NAME
 
+# Face detection model (YuNet), face detection falls back to the Haar cascades without it
+YUNET_MODEL=assets/Models/face_detection_yunet_2023mar.onnx
+YUNET_URL=https://github.com/opencv/opencv_zoo/raw/main/models/face_detection_yunet/face_detection_yunet_2023mar.onnx
+if [ ! -f $YUNET_MODEL ]; then
+    echo "Downloading face detection model..."
+    mkdir -p assets/Models
+    curl -fsSL -o $YUNET_MODEL.tmp $YUNET_URL && mv $YUNET_MODEL.tmp $YUNET_MODEL \
+        || { rm -f $YUNET_MODEL.tmp; echo "  WARNING: unable to download $YUNET_URL, face detection will use Haar cascades"; }
+fi
+
 sudo systemctl stop pirobot 2>/dev/null || true
 sudo cp dist/$DAEMON_NAME /usr/local/bin/
 sudo mkdir -p /etc/$APP_NAME
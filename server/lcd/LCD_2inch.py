@@ -1,6 +1,6 @@
 
 import time
-from lcd import lcdconfig
+from lcd import lcdconfig, rgb565
 
 
 class LCD_2inch(lcdconfig.RaspberryPi):
@@ -8,6 +8,18 @@ class LCD_2inch(lcdconfig.RaspberryPi):
     width = 240
     height = 320
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Preallocated RGB565 frame buffers, reused for every frame. The front buffer
+        # holds what is on the panel, only the regions changed in the back buffer are sent.
+        self.frame_buffers = {
+            0x70: [rgb565.new_buffer(self.height, self.width), rgb565.new_buffer(self.height, self.width)],
+            0x00: [rgb565.new_buffer(self.width, self.height), rgb565.new_buffer(self.width, self.height)],
+        }
+        self.clear_buffer = self.np.full(self.width * self.height * 2, 0xFF, dtype=self.np.uint8)
+        # Memory access control of the frame on the panel, None when unknown
+        self.madctl = None
+
     def command(self, cmd):
         self.digital_write(self.DC_PIN, self.GPIO.LOW)
         self.spi_writebyte([cmd])
@@ -118,6 +130,7 @@ class LCD_2inch(lcdconfig.RaspberryPi):
         self.command(0x11)
 
         self.command(0x29)
+        self.madctl = None
 
   
     def SetWindows(self, Xstart, Ystart, Xend, Yend):
@@ -125,14 +138,14 @@ class LCD_2inch(lcdconfig.RaspberryPi):
         self.command(0x2A)
         self.data(Xstart>>8)          # Set the horizontal starting point to the high octet
         self.data(Xstart & 0xff)      # Set the horizontal starting point to the low octet
-        self.data(Xend>>8)            # Set the horizontal end to the high octet
+        self.data((Xend - 1)>>8)      # Set the horizontal end to the high octet
         self.data((Xend - 1) & 0xff)  # Set the horizontal end to the low octet
 
         # Set the Y coordinates
         self.command(0x2B)
         self.data(Ystart>>8)
         self.data((Ystart & 0xff))
-        self.data(Yend>>8)
+        self.data((Yend - 1)>>8)
         self.data((Yend - 1) & 0xff )
 
         self.command(0x2C)    
@@ -140,45 +153,52 @@ class LCD_2inch(lcdconfig.RaspberryPi):
     def ShowImage(self, Image):
         """Set buffer to value of Python Imaging Library image."""
         """Write display buffer to physical display"""
-        Image = Image.rotate(180)
+        if Image.mode != "RGB":
+            Image = Image.convert("RGB")
         imwidth, imheight = Image.size
         if imwidth == self.height and imheight ==  self.width:
-            img = self.np.asarray(Image)
-            pix = self.np.zeros((self.width, self.height,2), dtype = self.np.uint8)
-
-            # RGB888 >> RGB565
-            pix[...,[0]] = self.np.add(self.np.bitwise_and(img[...,[0]],0xF8),self.np.right_shift(img[...,[1]],5))
-            pix[...,[1]] = self.np.add(self.np.bitwise_and(self.np.left_shift(img[...,[1]],3),0xE0), self.np.right_shift(img[...,[2]],3))
-            pix = pix.flatten().tolist()
-            
-            self.command(0x36)
-            self.data(0x70) 
-            self.SetWindows ( 0, 0, self.height,self.width)
-            self.digital_write(self.DC_PIN,self.GPIO.HIGH)
-            for i in range(0,len(pix),4096):
-                self.spi_writebyte(pix[i:i+4096])
-            
+            madctl = 0x70
+        elif imwidth == self.width and imheight == self.height:
+            madctl = 0x00
         else :
-            img = self.np.asarray(Image)
-            pix = self.np.zeros((imheight,imwidth , 2), dtype = self.np.uint8)
-            
-            pix[...,[0]] = self.np.add(self.np.bitwise_and(img[...,[0]],0xF8),self.np.right_shift(img[...,[1]],5))
-            pix[...,[1]] = self.np.add(self.np.bitwise_and(self.np.left_shift(img[...,[1]],3),0xE0), self.np.right_shift(img[...,[2]],3))
-
-            pix = pix.flatten().tolist()
-            
+            pix = rgb565.to_rgb565(Image, rotate=True)
             self.command(0x36)
-            self.data(0x00) 
+            self.data(0x00)
+            self.madctl = None
             self.SetWindows ( 0, 0, self.width, self.height)
             self.digital_write(self.DC_PIN,self.GPIO.HIGH)
-            for i in range(0,len(pix),4096):
-                self.spi_writebyte(pix[i:i+4096])		
-                
+            self.spi_writebuffer(rgb565.as_bytes(pix))
+            return
+
+        rgb565.to_rgb565(Image, out=self.frame_buffers[madctl][1], rotate=True)
+        self._flush(madctl)
+
+    def ShowBuffer(self, buffer):
+        """Display an RGB565 buffer already in the panel layout (rotated by 180 degrees, big-endian)"""
+        madctl = 0x70 if buffer.shape == (self.width, self.height) else 0x00
+        self.np.copyto(self.frame_buffers[madctl][1], buffer)
+        self._flush(madctl)
+
+    def _flush(self, madctl):
+        """Send the back buffer regions that differ from the panel content"""
+        front, back = self.frame_buffers[madctl]
+        if self.madctl != madctl:
+            self.command(0x36)
+            self.data(madctl)
+            self.madctl = madctl
+            regions = [(0, 0, back.shape[1], back.shape[0])]
+        else:
+            regions = rgb565.dirty_regions(front, back)
+        for x_start, y_start, x_end, y_end in regions:
+            self.SetWindows(x_start, y_start, x_end, y_end)
+            self.digital_write(self.DC_PIN,self.GPIO.HIGH)
+            self.spi_writebuffer(rgb565.as_bytes(back[y_start:y_end, x_start:x_end]))
+        self.frame_buffers[madctl] = [back, front]
+
     def clear(self):
         """Clear contents of image buffer"""
-        _buffer = [0xff]*(self.width * self.height * 2)
         self.SetWindows ( 0, 0, self.width, self.height)
         self.digital_write(self.DC_PIN,self.GPIO.HIGH)
-        for i in range(0,len(_buffer),4096):
-            self.spi_writebyte(_buffer[i:i+4096])	
+        self.spi_writebuffer(self.clear_buffer)
+        self.madctl = None
         
@@ -1,3 +1,6 @@
+from PIL import Image
+
+from lcd import rgb565
 from models import Config
 
 
@@ -18,6 +21,10 @@ class LCD_2inch(object):
         if Config.get("show_mock_screen"):
             image.show()
 
+    def ShowBuffer(self, buffer):
+        if Config.get("show_mock_screen"):
+            Image.fromarray(rgb565.to_rgb(buffer, rotate=True)).show()
+
     def bl_DutyCycle(self, dc):
         print(f"Set back light duty cycle to {dc}")
 
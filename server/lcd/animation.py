@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from lcd import rgb565
+
+logger = logging.getLogger(__name__)
+
+
+class Animation(object):
+    """Frames of an animation, pre-converted to the panel layout (rotated, big-endian RGB565)"""
+    MAX_FRAMES = 200
+    DEFAULT_DURATION = 100  # ms
+
+    def __init__(self, frames, durations, loop=0):
+        self.frames = frames
+        self.durations = np.array(durations, dtype=np.float64) / 1000
+        self.loop = loop  # Number of plays, 0 for infinite
+        self._ends = np.cumsum(self.durations)
+        self.duration = float(self._ends[-1])
+
+    @staticmethod
+    def _convert(image, width, height):
+        image = image.convert("RGB").resize((width, height))
+        return rgb565.to_rgb565(image, rotate=True)
+
+    @staticmethod
+    def load(file_path, width, height):
+        """Load a GIF / APNG, or a PNG sprite sheet described by a JSON file with the same name.
+
+        The sprite sheet description gives the frame size, the number of
+        frames (read left to right, top to bottom) and their duration:
+        {"frame_width": 64, "frame_height": 48, "nb_of_frames": 8, "duration": 80}
+        """
+        image = Image.open(file_path)
+        sheet_path = os.path.splitext(file_path)[0] + ".json"
+        frames, durations = [], []
+        if os.path.isfile(sheet_path):
+            with open(sheet_path) as f:
+                sheet = json.load(f)
+            frame_width, frame_height = sheet["frame_width"], sheet["frame_height"]
+            columns = image.width // frame_width
+            for i in range(min(sheet["nb_of_frames"], Animation.MAX_FRAMES)):
+                x, y = (i % columns) * frame_width, (i // columns) * frame_height
+                frame = image.crop((x, y, x + frame_width, y + frame_height))
+                frames.append(Animation._convert(frame, width, height))
+                durations.append(sheet.get("duration", Animation.DEFAULT_DURATION))
+            return Animation(frames, durations, sheet.get("loop", 0))
+
+        for frame in ImageSequence.Iterator(image):
+            frames.append(Animation._convert(frame, width, height))
+            durations.append(frame.info.get("duration") or Animation.DEFAULT_DURATION)
+            if len(frames) >= Animation.MAX_FRAMES:
+                break
+        # No loop entry means the animation is played once
+        loop = image.info.get("loop")
+        return Animation(frames, durations, 1 if loop is None else loop)
+
+    def frame_at(self, elapsed, loop=None):
+        """Index of the frame to display `elapsed` seconds after the start, None once finished"""
+        loop = self.loop if loop is None else loop
+        if loop > 0 and elapsed >= loop * self.duration:
+            return None
+        return min(int(np.searchsorted(self._ends, elapsed % self.duration, side="right")), len(self.frames) - 1)
+
+    def time_to_next_frame(self, elapsed):
+        position = elapsed % self.duration
+        index = min(int(np.searchsorted(self._ends, position, side="right")), len(self.frames) - 1)
+        return float(self._ends[index] - position)
+
+    def with_fps(self, fps):
+        return Animation(self.frames, [1000 / fps] * len(self.frames), self.loop)
+
+
+class AnimationPlayer(object):
+    """Plays animations on the LCD compositor from its own thread.
+
+    Each frame is handed to the compositor and the player waits until it is
+    shown or dropped before picking the next one. The frame shown is picked
+    from the time elapsed since the start, so frames are skipped rather than
+    delayed when the LCD can't keep up. Skipped frames count both the frames
+    dropped by the compositor and the ones never sent while it was busy.
+    """
+    FRAME_TIMEOUT = 1.0  # s, longest wait for the compositor to show a frame
+
+    def __init__(self, lcd, animations_path):
+        self._lcd = lcd
+        self.animations_path = animations_path
+        self._animations = {}
+        self._thread = None
+        self._stop_event = None
+        self.nb_of_frames = 0
+        self.nb_of_skipped_frames = 0
+
+    def get_names(self):
+        if not os.path.isdir(self.animations_path):
+            return []
+        names = set()
+        for filename in os.listdir(self.animations_path):
+            name, extension = os.path.splitext(filename)
+            if extension in (".gif", ".png", ".apng", ".webp"):
+                names.add(name)
+        return sorted(names)
+
+    def get(self, name):
+        animation = self._animations.get(name)
+        if animation is None:
+            for extension in (".gif", ".png", ".apng", ".webp"):
+                file_path = os.path.join(self.animations_path, f"{name}{extension}")
+                if os.path.isfile(file_path):
+                    animation = Animation.load(file_path, self._lcd.height, self._lcd.width)
+                    self._animations[name] = animation
+                    break
+        return animation
+
+    def is_playing(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def play(self, name, fps=None, loop=None):
+        try:
+            animation = self.get(name)
+        except Exception:
+            logger.warning(f"Unable to load animation {name}", exc_info=True)
+            return False, f"Unable to load animation {name}"
+        if animation is None:
+            message = f"Animation not found {name}"
+            logger.info(message)
+            return False, message
+        if fps is not None:
+            animation = animation.with_fps(fps)
+        self.stop()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(animation, loop, self._stop_event), name="lcd-animation", daemon=True
+        )
+        self._thread.start()
+        return True, "Success"
+
+    def stop(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _run(self, animation, loop, stop_event):
+        start = time.monotonic()
+        previous_index = None
+        while not stop_event.is_set():
+            elapsed = time.monotonic() - start
+            index = animation.frame_at(elapsed, loop)
+            if index is None:
+                if previous_index is not None:
+                    # Ended while the last frames were still due
+                    self.nb_of_skipped_frames += len(animation.frames) - 1 - previous_index
+                break
+            if index != previous_index:
+                if previous_index is not None:
+                    self.nb_of_skipped_frames += (index - previous_index - 1) % len(animation.frames)
+                sequence = self._lcd.ShowBuffer(animation.frames[index])
+                if self._lcd.wait_for_frame(sequence, self.FRAME_TIMEOUT):
+                    self.nb_of_frames += 1
+                else:
+                    self.nb_of_skipped_frames += 1
+                previous_index = index
+            stop_event.wait(animation.time_to_next_frame(time.monotonic() - start))
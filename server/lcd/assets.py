@@ -0,0 +1,86 @@
+import logging
+import os
+import re
+
+import numpy as np
+from PIL import Image
+
+from lcd import rgb565
+
+logger = logging.getLogger(__name__)
+
+
+class PictureCache(object):
+    """LCD pictures decoded once to the panel layout (rotated, big-endian RGB565).
+
+    Converted pictures are kept in memory and, when a cache directory is
+    given, saved as `.raw` files keyed by the source file mtime so they are
+    not decoded again on the next start.
+    """
+
+    def __init__(self, pics_path, width, height, cache_dir=None):
+        self.pics_path = pics_path
+        self.width = width
+        self.height = height
+        self.cache_dir = cache_dir
+        self._pictures = {}
+
+    def _raw_path(self, name, mtime_ns):
+        return os.path.join(self.cache_dir, f"{name}-{mtime_ns}-{self.width}x{self.height}.raw")
+
+    def _load_raw(self, raw_path):
+        try:
+            buffer = np.fromfile(raw_path, dtype=rgb565.RGB565)
+            return buffer.reshape((self.height, self.width))
+        except (OSError, ValueError):
+            logger.warning(f"Unable to read cached picture {raw_path}", exc_info=True)
+            return None
+
+    def _save_raw(self, name, raw_path, buffer):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Older versions of this picture only, not "smile-face" when saving "smile"
+            stale_raw = re.compile(rf"{re.escape(name)}-\d+-\d+x\d+\.raw")
+            for filename in os.listdir(self.cache_dir):
+                if stale_raw.fullmatch(filename):
+                    os.remove(os.path.join(self.cache_dir, filename))
+            buffer.tofile(raw_path)
+        except OSError:
+            logger.warning(f"Unable to cache picture {name}", exc_info=True)
+
+    def _decode(self, file_path):
+        image = Image.open(file_path).resize((self.width, self.height)).convert("RGB")
+        return rgb565.to_rgb565(image, rotate=True)
+
+    def get(self, name):
+        """RGB565 buffer of the picture, None if it doesn't exist"""
+        file_path = os.path.join(self.pics_path, f"{name}.png")
+        if not os.path.isfile(file_path):
+            return None
+        mtime_ns = os.stat(file_path).st_mtime_ns
+        cached = self._pictures.get(name)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+
+        buffer = None
+        raw_path = None
+        if self.cache_dir is not None:
+            raw_path = self._raw_path(name, mtime_ns)
+            if os.path.isfile(raw_path):
+                buffer = self._load_raw(raw_path)
+        if buffer is None:
+            buffer = self._decode(file_path)
+            if raw_path is not None:
+                self._save_raw(name, raw_path, buffer)
+        self._pictures[name] = (mtime_ns, buffer)
+        return buffer
+
+    def preload(self):
+        for filename in sorted(os.listdir(self.pics_path)):
+            name, extension = os.path.splitext(filename)
+            if extension == ".png":
+                try:
+                    self.get(name)
+                except Exception:
+                    logger.warning(f"Unable to load picture {filename}", exc_info=True)
+        logger.info(f"Preloaded {len(self._pictures)} LCD pictures")
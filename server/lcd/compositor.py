@@ -0,0 +1,142 @@
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LcdCompositor(object):
+    """Single owner of the LCD, frames are pushed to the panel from a dedicated thread.
+
+    `ShowImage` (PIL image) and `ShowBuffer` (RGB565 buffer in the panel layout)
+    only drop the frame in a latest-wins mailbox and return, a frame replaced
+    before being displayed is counted as dropped. They return the frame
+    sequence number, `wait_for_frame` tells whether that frame made it to the
+    panel. Other LCD calls (clear, backlight) are queued and run in order on
+    the same thread, so SPI transactions from concurrent callers never
+    interleave.
+    """
+    FPS_WINDOW = 30  # frames
+
+    def __init__(self, lcd):
+        self._lcd = lcd
+        self.width = lcd.width
+        self.height = lcd.height
+        self._condition = threading.Condition()
+        self._frame = None
+        self._sequence = 0
+        # Latest frame shown on the panel, latest frame shown or dropped
+        self._last_shown = 0
+        self._last_handled = 0
+        self._commands = collections.deque()
+        self._thread = None
+        self._running = False
+        self._timestamps = collections.deque(maxlen=self.FPS_WINDOW)
+        self.nb_of_frames = 0
+        self.nb_of_dropped_frames = 0
+
+    def Init(self):
+        self._lcd.Init()
+        self.start()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="lcd-compositor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _submit_command(self, method, *args):
+        with self._condition:
+            self._commands.append((method, args))
+            self._condition.notify_all()
+
+    def _drop_pending_frame(self):
+        if self._frame is not None:
+            self._last_handled = self._frame[0]
+            self._frame = None
+            self._condition.notify_all()
+
+    def _submit_frame(self, show, frame):
+        with self._condition:
+            if self._frame is not None:
+                self.nb_of_dropped_frames += 1
+                self._drop_pending_frame()
+            self._sequence += 1
+            self._frame = (self._sequence, show, frame)
+            self._condition.notify_all()
+            return self._sequence
+
+    def ShowImage(self, image):
+        return self._submit_frame(self._lcd.ShowImage, image)
+
+    def ShowBuffer(self, buffer):
+        return self._submit_frame(self._lcd.ShowBuffer, buffer)
+
+    def wait_for_frame(self, sequence, timeout=None):
+        """Wait until the frame is shown or dropped, True if it was shown"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._last_handled >= sequence or not self._running, timeout)
+            return self._last_shown == sequence
+
+    def clear(self):
+        with self._condition:
+            # Pending frame would be hidden by the clear anyway
+            self._drop_pending_frame()
+        self._submit_command(self._lcd.clear)
+
+    def bl_DutyCycle(self, duty):
+        self._submit_command(self._lcd.bl_DutyCycle, duty)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and self._frame is None and len(self._commands) == 0:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                commands = list(self._commands)
+                self._commands.clear()
+                frame, self._frame = self._frame, None
+            for method, args in commands:
+                try:
+                    method(*args)
+                except Exception:
+                    logger.error(f"LCD command {method.__name__} failed", exc_info=True)
+            if frame is not None:
+                sequence, show, frame = frame
+                try:
+                    show(frame)
+                    shown = True
+                except Exception:
+                    logger.error("Unable to display frame on the LCD", exc_info=True)
+                    shown = False
+                with self._condition:
+                    if shown:
+                        self._last_shown = sequence
+                        self.nb_of_frames += 1
+                        self._timestamps.append(time.monotonic())
+                    self._last_handled = sequence
+                    self._condition.notify_all()
+
+    def get_fps(self):
+        timestamps = list(self._timestamps)
+        if len(timestamps) < 2 or time.monotonic() - timestamps[-1] > 1.0:
+            return 0.0
+        return (len(timestamps) - 1) / (timestamps[-1] - timestamps[0])
+
+    def serialize(self):
+        return {
+            "fps": round(self.get_fps(), 1),
+            "frames": self.nb_of_frames,
+            "dropped_frames": self.nb_of_dropped_frames,
+        }
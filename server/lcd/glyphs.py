@@ -0,0 +1,46 @@
+import numpy as np
+from PIL import Image, ImageColor, ImageDraw
+
+from lcd import rgb565
+
+
+class GlyphAtlas(object):
+    """Printable ASCII characters of a monospace font, rasterized once to RGB565 cells.
+
+    A line of text is rendered by gathering its cells from the atlas, with no
+    font rasterization after the atlas is built.
+    """
+    FIRST_CHAR = 32
+    LAST_CHAR = 126
+    REPLACEMENT_CHAR = "?"
+
+    def __init__(self, font, line_height, color, background):
+        self.advance = int(round(font.getlength("M")))
+        self.height = line_height
+        self.background = rgb565.to_rgb565(np.array([[ImageColor.getrgb(background)]], dtype=np.uint8))[0, 0]
+        # (nb_of_chars, height, advance) cells
+        self.cells = np.empty((self.LAST_CHAR - self.FIRST_CHAR + 1, self.height, self.advance), dtype=rgb565.RGB565)
+        for i in range(len(self.cells)):
+            cell = Image.new("RGB", (self.advance, self.height), background)
+            ImageDraw.Draw(cell).text((0, 0), chr(self.FIRST_CHAR + i), fill=color, font=font)
+            rgb565.to_rgb565(cell, out=self.cells[i])
+
+    def columns(self, width):
+        return width // self.advance
+
+    def wrap(self, text, columns):
+        if len(text) == 0:
+            return [""]
+        return [text[i:i + columns] for i in range(0, len(text), columns)]
+
+    def render(self, text, out):
+        """Draw a line of text into `out`, an RGB565 array of shape (height, width)"""
+        out[...] = self.background
+        if len(text) == 0:
+            return
+        indices = np.fromiter(map(ord, text), dtype=np.int32, count=len(text)) - self.FIRST_CHAR
+        indices[(indices < 0) | (indices > self.LAST_CHAR - self.FIRST_CHAR)] = ord(self.REPLACEMENT_CHAR) - self.FIRST_CHAR
+        nb_of_chars = min(len(indices), out.shape[1] // self.advance)
+        height = min(self.height, out.shape[0])
+        glyphs = self.cells[indices[:nb_of_chars], :height]
+        out[:height, :nb_of_chars * self.advance] = glyphs.transpose(1, 0, 2).reshape(height, nb_of_chars * self.advance)
@@ -73,6 +73,11 @@ class RaspberryPi:
         if self.SPI is not None:
             self.SPI.writebytes(data)
 
+    def spi_writebuffer(self, data):
+        """Write a bytes-like buffer, writebytes2 splits it into SPI transfers without a Python list"""
+        if self.SPI is not None:
+            self.SPI.writebytes2(data)
+
     def bl_DutyCycle(self, duty):
         self._pwm.ChangeDutyCycle(duty)
         
@@ -0,0 +1,61 @@
+import numpy as np
+
+# Big-endian 16 bit pixels, the byte order expected by the ST7789 panel
+RGB565 = np.dtype(">u2")
+
+
+def new_buffer(width, height):
+    return np.empty((height, width), dtype=RGB565)
+
+
+def to_rgb565(image, out=None, rotate=False):
+    """Convert an RGB image (PIL image or HxWx3 array) to big-endian RGB565.
+
+    The result is written into `out` when given, so the same buffer can be
+    reused frame after frame. `rotate` turns the image by 180 degrees.
+    """
+    rgb = np.asarray(image)
+    if rotate:
+        rgb = rgb[::-1, ::-1]
+    if out is None:
+        out = new_buffer(rgb.shape[1], rgb.shape[0])
+    red, green, blue = rgb[..., 0].astype(np.uint16), rgb[..., 1].astype(np.uint16), rgb[..., 2] >> 3
+    out[...] = ((red & 0xF8) << 8) | ((green & 0xFC) << 3) | blue
+    return out
+
+
+def to_rgb(buffer, rotate=False):
+    """Back to an HxWx3 RGB array, the low bits lost by the conversion being zero"""
+    if rotate:
+        buffer = buffer[::-1, ::-1]
+    value = buffer.astype(np.uint16)
+    rgb = np.empty(buffer.shape + (3,), dtype=np.uint8)
+    rgb[..., 0] = (value >> 8) & 0xF8
+    rgb[..., 1] = (value >> 3) & 0xFC
+    rgb[..., 2] = (value << 3) & 0xF8
+    return rgb
+
+
+def as_bytes(buffer):
+    """Flat byte view of an RGB565 buffer, only copied when not contiguous (e.g. a sub-rectangle)"""
+    return memoryview(np.ascontiguousarray(buffer).view(np.uint8).reshape(-1))
+
+
+def dirty_regions(previous, current, max_gap=8):
+    """Rectangles (x_start, y_start, x_end, y_end), ends excluded, covering the pixels that changed.
+
+    Changed rows are grouped into bands, rows closer than `max_gap` being merged
+    to save window setups, each band being narrowed to its changed columns.
+    """
+    changed = previous != current
+    rows = np.flatnonzero(changed.any(axis=1))
+    if len(rows) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(rows) > max_gap)
+    starts = np.concatenate([rows[:1], rows[breaks + 1]])
+    ends = np.concatenate([rows[breaks], rows[-1:]]) + 1
+    regions = []
+    for start, end in zip(starts, ends):
+        columns = np.flatnonzero(changed[start:end].any(axis=0))
+        regions.append((int(columns[0]), int(start), int(columns[-1]) + 1, int(end)))
+    return regions
@@ -50,8 +50,8 @@ class Config(Base):
                 return value.lower() in ('y', 'true')
             else:
                 return bool(value)
-        elif config_type == json:
-            return json.loads(value)
+        elif config_type == "json":
+            return json.loads(value) if type(value) == str else value
         else:
             return value
 
@@ -81,6 +81,10 @@ class Motor(object):
     def patrol():
         Motor._controller.patrol()
 
+    @staticmethod
+    def get_telemetry(duration=None, step=1):
+        return Motor._controller.get_telemetry(duration=duration, step=step)
+
     @staticmethod
     def serialize():
         left_status, right_status = Motor._controller.get_motor_status()
@@ -216,3 +216,7 @@ class DFRobotMotor(object):
     @staticmethod
     def get_distance():
         return DFRobotMotor.distance, DFRobotMotor.abs_distance
+
+    @staticmethod
+    def get_telemetry(duration=None, step=1):
+        return dict(ts=[])  # No telemetry history
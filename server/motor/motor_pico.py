@@ -1,33 +1,43 @@
+import asyncio
 import logging
 import math
 import time
 
 from models import Config
-from uart import UART, MessageOriginator, MessageType
+from telemetry import Telemetry, TelemetryBuffer
+from uart import UART, MessageOriginator, MessagePriority, MessageType
 
 logger = logging.getLogger(__name__)
 
 
+TELEMETRY_FIELDS = [
+    "left_duty",
+    "left_speed",
+    "right_duty",
+    "right_speed",
+    "distance",
+    "abs_distance",
+    "rotation",
+    "left_us_distance",
+    "front_us_distance",
+    "right_us_distance",
+]
+
+
 class PicoMotor(object):
     INIT_REFRESH_INTERVAL = 2.0  # Interval at which we check the initialization status
+    INIT_RETRY_DELAY = 0.1  # Delay before retrying a failed initialization, doubled after each failure
+    INIT_MAX_RETRY_DELAY = 5.0
+    TELEMETRY_HISTORY = 10  # Seconds of telemetry kept in the ring buffer
+    SMOOTHING_WINDOW = 0.1  # Seconds of telemetry averaged for speed & duty
 
     status = "UK"
 
-    distance = 0.0
-    abs_distance = 0.0
-    rotation = 0.0
+    telemetry = TelemetryBuffer(TELEMETRY_FIELDS, capacity=200)
     original_rotation = None
-    left_us_distance = None
-    front_us_distance = None
-    right_us_distance = None
     pos_x = 0
     pos_y = 0
 
-    left_speed = 0
-    left_duty = 0
-    right_speed = 0
-    right_duty = 0
-
     target_distance = None
     target_rotation = None
 
@@ -38,68 +48,97 @@ class PicoMotor(object):
     obstacles = []
 
     last_init_ts = 0.0
+    init_task = None
+    init_commands = []
 
     @staticmethod
     def setup():
         # Motor Initialization
-        PicoMotor.last_init_ts = time.time()
         PicoMotor.max_rpm = Config.get("motor_max_rpm")
         PicoMotor.wheel_d = Config.get("wheel_d")
         PicoMotor.robot_width = Config.get("robot_width")
-        PicoMotor.status = "OK"
+        telemetry_rate = Config.get("motor_telemetry_rate")
+        capacity = max(1, int(telemetry_rate * PicoMotor.TELEMETRY_HISTORY))
+        if PicoMotor.telemetry.capacity != capacity:
+            PicoMotor.telemetry = TelemetryBuffer(TELEMETRY_FIELDS, capacity=capacity)
         steps_per_rotation = Config.get("motor_steps_per_rotation")
         min_distance = Config.get("motor_min_distance")
         max_rpm = Config.get("motor_max_rpm")
         kp = Config.get("motor_kp")
         ki = Config.get("motor_ki")
         kd = Config.get("motor_kd")
-        success = False
-        for i in range(20):
-            if UART.ready():
-                success = True
-                # Config ultrasonic sensors
-                robot_us_sensor = Config.get("robot_us_sensors")
-                if robot_us_sensor == "front":
-                    UART.write("U:C:N:Y:N")
-                elif robot_us_sensor == "front_and_side":
-                    UART.write("U:C:Y:Y:Y")
-                else:
-                    UART.write("U:C:N:N:N")
-                # Configure Motor Handler
-                dead_zone = Config.get("motor_dead_zone")
-                cmd = f"M:C:{steps_per_rotation}:{min_distance}:{max_rpm}:{kp}:{ki}:{kd}"
-                if dead_zone is not None:
-                    cmd += f":{int(dead_zone)}"
-                UART.write(cmd)
-                break
-            time.sleep(0.1)
-        if success:
-            logger.info("Successfully initialized motor controller")
+        init_commands = []
+        # Config ultrasonic sensors
+        robot_us_sensor = Config.get("robot_us_sensors")
+        if robot_us_sensor == "front":
+            init_commands.append("U:C:N:Y:N")
+        elif robot_us_sensor == "front_and_side":
+            init_commands.append("U:C:Y:Y:Y")
         else:
-            logger.error("Unable to initialized motor controller")
+            init_commands.append("U:C:N:N:N")
+        # Configure Motor Handler
+        dead_zone = Config.get("motor_dead_zone")
+        cmd = f"M:C:{steps_per_rotation}:{min_distance}:{max_rpm}:{kp}:{ki}:{kd}"
+        if dead_zone is not None:
+            cmd += f":{int(dead_zone)}"
+        init_commands.append(cmd)
+        # Stream motor status at the configured rate
+        init_commands.append(Telemetry.subscription_command(MessageOriginator.motor, telemetry_rate))
+        PicoMotor.init_commands = init_commands
         UART.register_consumer("motor_controller", PicoMotor, MessageOriginator.motor, MessageType.status)
+        PicoMotor.start_initialization()
+
+    @staticmethod
+    def start_initialization():
+        PicoMotor.last_init_ts = time.time()
+        if PicoMotor.init_task is None or PicoMotor.init_task.done():
+            PicoMotor.status = "INIT"
+            PicoMotor.init_task = asyncio.get_running_loop().create_task(PicoMotor.initialize())
+
+    @staticmethod
+    async def initialize():
+        # Send the configuration until the Pico acknowledges all of it, backing off exponentially
+        retry_delay = PicoMotor.INIT_RETRY_DELAY
+        while True:
+            for command in PicoMotor.init_commands:
+                success, message, _ = await UART.request(command)
+                if not success:
+                    break
+            else:
+                PicoMotor.status = "OK"
+                logger.info("Successfully initialized motor controller")
+                return
+            if PicoMotor.status != "KO":
+                logger.error(f"Unable to initialize motor controller ({message}), retrying...")
+                PicoMotor.status = "KO"
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(2 * retry_delay, PicoMotor.INIT_MAX_RETRY_DELAY)
 
     @staticmethod
     def receive_uart_message(message, originator, message_type):
-        PicoMotor.left_duty = int(message[0])
-        PicoMotor.left_speed = int(message[1])
-        PicoMotor.right_duty = int(message[2])
-        PicoMotor.right_speed = int(message[3])
-        PicoMotor.distance = float(message[4]) * math.pi * PicoMotor.wheel_d / 1000
-        PicoMotor.abs_distance = float(message[5]) * math.pi * PicoMotor.wheel_d
-        PicoMotor.rotation = float(message[6]) * 180 * PicoMotor.wheel_d / PicoMotor.robot_width
-        PicoMotor.left_us_distance = float(message[7]) if message[7] != "null" else None
-        PicoMotor.front_us_distance = float(message[8]) if message[8] != "null" else None
-        PicoMotor.right_us_distance = float(message[9]) if message[9] != "null" else None
-        is_controller_initialized = message[10].lower() in ("y", "true")
+        (left_duty, left_speed, right_duty, right_speed, nb_of_revolutions, abs_nb_of_revolutions,
+         differential_nb_of_revolutions, left_us_distance, front_us_distance, right_us_distance,
+         is_controller_initialized) = message
+        PicoMotor.telemetry.append([
+            left_duty,
+            left_speed,
+            right_duty,
+            right_speed,
+            nb_of_revolutions * math.pi * PicoMotor.wheel_d / 1000,
+            abs_nb_of_revolutions * math.pi * PicoMotor.wheel_d,
+            differential_nb_of_revolutions * 180 * PicoMotor.wheel_d / PicoMotor.robot_width,
+            math.nan if left_us_distance is None else left_us_distance,
+            math.nan if front_us_distance is None else front_us_distance,
+            math.nan if right_us_distance is None else right_us_distance,
+        ])
         if not is_controller_initialized and time.time() > PicoMotor.last_init_ts + PicoMotor.INIT_REFRESH_INTERVAL:
-            PicoMotor.setup()
+            PicoMotor.start_initialization()
 
     @staticmethod
     def stop():
-        UART.write("M:S")
+        UART.write("M:S", priority=MessagePriority.urgent, key=("motor",))
         # Stop patroller
-        UART.write("P:0")
+        UART.write("P:0", priority=MessagePriority.urgent)
 
     @staticmethod
     def move(left_orientation, left_speed, right_orientation, right_speed, duration, distance, rotation, auto_stop):
@@ -110,24 +149,42 @@ class PicoMotor(object):
         if rotation is not None:
             differential_nb_of_revolutions = rotation * PicoMotor.robot_width / (180.0 * PicoMotor.wheel_d)
         UART.write(
-            f"M:M:{left_orientation}:{int(left_speed)}:{right_orientation}:{int(right_speed)}:{nb_of_revolutions:.2f}:{differential_nb_of_revolutions:.2f}:{duration}:{auto_stop}"
+            f"M:M:{left_orientation}:{int(left_speed)}:{right_orientation}:{int(right_speed)}:{nb_of_revolutions:.2f}:{differential_nb_of_revolutions:.2f}:{duration}:{auto_stop}",
+            key=("motor",),
         )
 
+    @staticmethod
+    def _smoothed(field):
+        value = PicoMotor.telemetry.mean(field, PicoMotor.SMOOTHING_WINDOW)
+        return 0 if value is None else int(round(value))
+
+    @staticmethod
+    def _latest(field, default=None):
+        value = PicoMotor.telemetry.latest(field)
+        return default if value is None else value
+
     @staticmethod
     def get_motor_status():
-        return {"speed_rpm": PicoMotor.left_speed, "duty": PicoMotor.left_duty}, {"speed_rpm": PicoMotor.right_speed, "duty": PicoMotor.right_duty}
+        return (
+            {"speed_rpm": PicoMotor._smoothed("left_speed"), "duty": PicoMotor._smoothed("left_duty")},
+            {"speed_rpm": PicoMotor._smoothed("right_speed"), "duty": PicoMotor._smoothed("right_duty")},
+        )
 
     @staticmethod
     def get_distance():
-        return PicoMotor.distance, PicoMotor.abs_distance
+        return PicoMotor._latest("distance", 0.0), PicoMotor._latest("abs_distance", 0.0)
 
     @staticmethod
     def get_us_distances():
-        return PicoMotor.left_us_distance, PicoMotor.front_us_distance, PicoMotor.right_us_distance
+        return PicoMotor._latest("left_us_distance"), PicoMotor._latest("front_us_distance"), PicoMotor._latest("right_us_distance")
 
     @staticmethod
     def get_position():
-        return PicoMotor.pos_x, PicoMotor.pos_y, PicoMotor.rotation
+        return PicoMotor.pos_x, PicoMotor.pos_y, PicoMotor._latest("rotation", 0.0)
+
+    @staticmethod
+    def get_telemetry(duration=None, step=1):
+        return PicoMotor.telemetry.serialize(duration=duration, step=step)
 
     @staticmethod
     def get_obstacles():
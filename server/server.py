@@ -3,6 +3,7 @@ from camera import Camera
 from handlers.base import BaseHandler
 # noinspection PyUnresolvedReferences
 from handlers import *
+from lcd.compositor import LcdCompositor
 from light import Light
 from models import Config
 from motor.motor import Motor
@@ -56,7 +57,7 @@ class Server(object):
             DC = 25
             BL = 23
             if self.lcd is None:
-                self.lcd = LCD_2inch(rst=RST, dc=DC, bl=BL)
+                self.lcd = LcdCompositor(LCD_2inch(rst=RST, dc=DC, bl=BL))
                 self.lcd.Init()
                 self.lcd.clear()
             self.terminal = Terminal("Courier", self.lcd)
@@ -114,5 +115,7 @@ class Server(object):
             status["status"]["arm"] = Arm.serialize()
         if self.robot_has_light:
             status["status"]["light"] = Light.serialize()
+        if self.lcd is not None:
+            status["status"]["lcd"] = self.lcd.serialize()
         await protocol.send_message("status", status)
 
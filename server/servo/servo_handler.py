@@ -1,23 +1,36 @@
-from uart import UART
+from uart import UART, MessagePriority
 
 
 class ServoHandler:
+    MAX_KEYFRAMES = 32  # Trajectory size limit on the Pico
 
     @staticmethod
     def move(servo_id, position, speed=None):
         position = float(max(0, min(100, position)))
         if speed is None:
-            UART.write(f"S:M:{servo_id}:{position}")
+            UART.write(f"S:M:{servo_id}:{position}", key=("servo", servo_id))
         else:
-            UART.write(f"S:M:{servo_id}:{position}:{speed}")
+            UART.write(f"S:M:{servo_id}:{position}:{speed}", key=("servo", servo_id))
+
+    @staticmethod
+    def follow(servo_ids, keyframes):
+        """Upload a multi-servo path, keyframes being (time in sec, [position, ...]) interpolated by the Pico"""
+        command = "S:T:" + ",".join(str(servo_id) for servo_id in servo_ids)
+        for ts, positions in keyframes:
+            positions = [float(max(0, min(100, position))) for position in positions]
+            command += f":{int(ts * 1000)}:" + ",".join(f"{position:.2f}" for position in positions)
+        UART.write(command, key=("servo", "trajectory"))
 
     @staticmethod
     def stop_servo(servo_id):
-        UART.write(f"S:SS:{servo_id}")
+        # A trajectory not sent yet would move the servo again after the stop
+        UART.discard(("servo", "trajectory"))
+        UART.write(f"S:SS:{servo_id}", priority=MessagePriority.urgent, key=("servo", servo_id))
 
     @staticmethod
     def stop():
-        UART.write("S:S")
+        # Discards the pending moves and trajectories too, their keys all start with ("servo",)
+        UART.write("S:S", priority=MessagePriority.urgent, key=("servo",))
 
     @staticmethod
     def configure(servo_id, min_pulse_us, max_pulse_us, max_speed=None):
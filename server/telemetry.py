@@ -0,0 +1,98 @@
+import logging
+import time
+
+import numpy as np
+
+from uart import UART
+
+logger = logging.getLogger(__name__)
+
+
+class TelemetryBuffer(object):
+    """Fixed-size ring buffer of timestamped telemetry samples.
+
+    Samples are stored in a preallocated numpy array, the oldest sample being
+    overwritten once the buffer is full. Missing values are stored as NaN.
+    """
+
+    def __init__(self, fields, capacity):
+        self.fields = list(fields)
+        self.capacity = capacity
+        self._index = {field: i for i, field in enumerate(self.fields)}
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._samples = np.full((capacity, len(self.fields)), np.nan, dtype=np.float64)
+        self._head = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        self._samples.fill(np.nan)
+        self._head = 0
+        self._count = 0
+
+    def append(self, values, ts=None):
+        self._timestamps[self._head] = time.monotonic() if ts is None else ts
+        self._samples[self._head] = values
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def _ordered_indices(self, n=None):
+        n = self._count if n is None else min(n, self._count)
+        return (self._head - n + np.arange(n)) % self.capacity
+
+    def latest(self, field=None):
+        if self._count == 0:
+            return None
+        sample = self._samples[(self._head - 1) % self.capacity]
+        if field is None:
+            return sample
+        value = sample[self._index[field]]
+        return None if np.isnan(value) else float(value)
+
+    def window(self, duration=None):
+        """Return (timestamps, samples) in chronological order, optionally limited to the last `duration` seconds"""
+        indices = self._ordered_indices()
+        timestamps = self._timestamps[indices]
+        samples = self._samples[indices]
+        if duration is not None and len(timestamps) > 0:
+            start = np.searchsorted(timestamps, timestamps[-1] - duration)
+            timestamps, samples = timestamps[start:], samples[start:]
+        return timestamps, samples
+
+    def mean(self, field, duration):
+        """Average of a field over the last `duration` seconds, used to decimate the stream down to the HUD rate"""
+        _, samples = self.window(duration)
+        if len(samples) == 0:
+            return None
+        values = samples[:, self._index[field]]
+        values = values[~np.isnan(values)]
+        return float(values.mean()) if len(values) > 0 else None
+
+    def serialize(self, duration=None, step=1):
+        timestamps, samples = self.window(duration)
+        timestamps, samples = timestamps[::step], samples[::step]
+        data = dict(ts=timestamps.tolist())
+        for field, i in self._index.items():
+            data[field] = [None if np.isnan(v) else v for v in samples[:, i].tolist()]
+        return data
+
+
+class Telemetry(object):
+    """Per-channel telemetry subscriptions on the Pico.
+
+    The Pico streams the status of each channel (motor, servo, battery) at the
+    interval requested with `T:<channel>:<interval_ms>`.
+    """
+    MIN_INTERVAL = 10  # ms, Pico main loop servo refresh interval
+
+    @staticmethod
+    def subscription_command(originator, rate):
+        interval = max(Telemetry.MIN_INTERVAL, int(1000 / rate))
+        return f"T:{originator.value}:{interval}"
+
+    @staticmethod
+    def subscribe(originator, rate):
+        UART.write(Telemetry.subscription_command(originator, rate))
+        logger.info(f"Subscribed to {originator.name} telemetry at {rate} Hz")
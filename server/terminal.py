@@ -1,8 +1,13 @@
 import os
-from PIL import Image, ImageFont, ImageDraw
+import numpy as np
+from PIL import ImageFont
+
+from lcd import rgb565
+from lcd.glyphs import GlyphAtlas
 
 
 class Terminal(object):
+    MARGIN = 5
 
     def __init__(self, font, lcd, background="BLACK", color=(0, 255, 0), font_size=30, interline=6):
         assets_dir = os.path.join(os.path.dirname(__file__), "assets/Fonts")
@@ -11,43 +16,39 @@ class Terminal(object):
         font_filepath = os.path.join(assets_dir, f"{font}.ttf")
         self._lcd = lcd
         if not os.path.isfile(font_filepath):
-            font_filepath = os.path.join(asset_dir, "Courier.ttf")
+            font_filepath = os.path.join(assets_dir, "Courier.ttf")
         self._font = ImageFont.truetype(font_filepath, font_size)
         _, _, _, font_h = self._font.getbbox("A")
         self._line_h = font_h + interline
         self._nb_line = (self._lcd.width // self._line_h) - 1
-        self._background = background
-        self._color = color
         self._header = ""
         self._buffer = []
+        self._glyphs = GlyphAtlas(self._font, self._line_h, color, background)
+        self._columns = self._glyphs.columns(self._lcd.height - self.MARGIN)
+        # RGB565 screen kept between updates, only the rows whose text changed are rendered
+        self._frame = np.full((self._lcd.width, self._lcd.height), self._glyphs.background, dtype=rgb565.RGB565)
+        self._rows = [None] * (self._nb_line + 1)
 
     def header(self, text, stdout=False):
-        self._header = text
+        self._header = text[:self._columns]
         if stdout:
             self.stdout()
 
     def text(self, text, stdout=True):
-        w = self._font.getlength(text)
-        overflow = ""
-        while w > self._lcd.height:
-            overflow = text[-1] + overflow
-            text = text[:-1]
-            w, _ = self._font.getsize(text)
-        self._buffer.append(text)
-        if len(overflow) > 0:
-            self.text(overflow, stdout=False)
-        while len(self._buffer) > self._nb_line:
-            self._buffer.pop(0)
+        self._buffer += self._glyphs.wrap(text, self._columns)
+        del self._buffer[:-self._nb_line]
         if stdout:
             self.stdout()
 
     def stdout(self):
-        image = Image.new("RGB", (self._lcd.height, self._lcd.width), self._background)
-        draw = ImageDraw.Draw(image)
-        draw.text((5, 5), self._header, fill=self._color, font=self._font)
-        for i, line in enumerate(self._buffer):
-            draw.text((5, 5 + self._line_h + i * self._line_h), line, fill=self._color, font=self._font)
-        self._lcd.ShowImage(image)
+        lines = [self._header] + self._buffer + [""] * (self._nb_line - len(self._buffer))
+        for i, line in enumerate(lines):
+            if self._rows[i] != line:
+                y = self.MARGIN + i * self._line_h
+                self._glyphs.render(line, self._frame[y:y + self._line_h, self.MARGIN:])
+                self._rows[i] = line
+        # Panel layout is rotated by 180 degrees, the copy also leaves the frame free to be updated
+        self._lcd.ShowBuffer(self._frame[::-1, ::-1].copy())
 
     def reset(self):
         self._buffer = []
@@ -0,0 +1,182 @@
+import asyncio
+import sys
+import unittest
+from unittest.mock import AsyncMock, patch
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+from arm import Arm, FOREARM, SHOULDER, WRIST, SERVOS_CONFIG
+from servo.servo_handler import ServoHandler
+
+
+def servo_status(limb, angle):
+    servo_config = SERVOS_CONFIG[limb]
+    return [(servo_config["id"], True, angle * 100.0 / servo_config["max_angle"])]
+
+
+class TestArmMotionExecutor(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        Arm.position.update({WRIST: 60, FOREARM: 60, SHOULDER: 35})
+        Arm.motion_queue = None
+        Arm.motion_task = None
+        Arm.position_waiters = {}
+        Arm.target = {}
+        self.patches = [
+            patch("arm.ServoHandler.move"),
+            patch("arm.ServoHandler.stop_servo"),
+            patch("arm.Telemetry.subscribe"),
+        ]
+        self.servo_move, self.stop_servo, _ = [p.start() for p in self.patches]
+
+    def tearDown(self):
+        Arm.cancel_motions()
+        for p in self.patches:
+            p.stop()
+
+    async def test_move_does_not_block_and_completes_on_feedback(self):
+        progress = AsyncMock()
+        success, _ = Arm.move_servo_to_position(WRIST, 90, progress_callback=progress)
+        self.assertTrue(success)
+        self.assertTrue(Arm.is_moving())
+        await asyncio.sleep(0)
+        self.servo_move.assert_called_once_with(SERVOS_CONFIG[WRIST]["id"], 50.0)
+
+        Arm.receive_uart_message(servo_status(WRIST, 90), None, None)
+        await asyncio.wait_for(Arm.motion_task, 1)
+        self.assertEqual(progress.call_args_list[-1].args[0]["state"], "done")
+        self.assertEqual(Arm.position[WRIST], 90)
+
+    async def test_move_fails_without_feedback(self):
+        progress = AsyncMock()
+        with patch("arm.FEEDBACK_TIMEOUT", 0.01), patch.object(Arm, "_travel_time", return_value=0.0):
+            Arm.move_servo_to_position(WRIST, 90, progress_callback=progress)
+            await asyncio.wait_for(Arm.motion_task, 1)
+        self.assertEqual(progress.call_args_list[-1].args[0]["state"], "failed")
+
+    async def test_motions_are_queued(self):
+        Arm.move_servo_to_position(WRIST, 90)
+        Arm.move_servo_to_position(FOREARM, 40)
+        await asyncio.sleep(0)
+        self.assertEqual(self.servo_move.call_count, 1)
+
+        Arm.receive_uart_message(servo_status(WRIST, 90), None, None)
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+            if self.servo_move.call_count == 2:
+                break
+        self.servo_move.assert_called_with(SERVOS_CONFIG[FOREARM]["id"], 40 * 100 / 180)
+
+    async def test_moves_without_wait_are_checked_against_commanded_angle(self):
+        Arm.move_servo_to_position(WRIST, 90, wait=False)
+        await asyncio.wait_for(Arm.motion_task, 1)
+        # No feedback yet, the wrist is still reported at 60
+        self.assertEqual(Arm.position[WRIST], 60)
+        self.assertEqual(Arm.get_commanded_position()[WRIST], 90)
+        with patch.object(Arm.get_configuration_space(), "is_path_free", return_value=True) as is_path_free:
+            Arm._check_move(FOREARM, 40)
+        self.assertEqual(is_path_free.call_args.args[0][WRIST], 90)
+
+        Arm.receive_uart_message(servo_status(WRIST, 90), None, None)
+        self.assertEqual(Arm.target, {})
+
+    async def test_stop_cancels_motion(self):
+        progress = AsyncMock()
+        Arm.move_to_position("backup_camera", progress_callback=progress)
+        await asyncio.sleep(0)
+        task = Arm.motion_task
+        Arm.stop()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertFalse(Arm.is_moving())
+        self.assertEqual(progress.call_args_list[-1].args[0]["state"], "cancelled")
+        self.assertEqual(self.stop_servo.call_count, len(SERVOS_CONFIG))
+
+    async def test_unreachable_position_is_reported(self):
+        progress = AsyncMock()
+        Arm.position.update({FOREARM: 150, SHOULDER: 100})
+        Arm.move_servo_to_position(FOREARM, 160, progress_callback=progress)
+        await asyncio.wait_for(Arm.motion_task, 1)
+        self.assertEqual(progress.call_args_list[-1].args[0]["state"], "failed")
+        self.servo_move.assert_not_called()
+
+
+class TestArmTrajectory(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        Arm.position.update({WRIST: 100, FOREARM: 60, SHOULDER: 35})
+        Arm.motion_queue = None
+        Arm.motion_task = None
+        Arm.position_waiters = {}
+
+    def tearDown(self):
+        Arm.cancel_motions()
+
+    def test_trajectory_command(self):
+        with patch("servo.servo_handler.UART.write") as write:
+            ServoHandler.follow([3, 4], [(0.0, [50, 20.5]), (0.25, [60, 10])])
+        write.assert_called_once_with("S:T:3,4:0:50.00,20.50:250:60.00,10.00", key=("servo", "trajectory"))
+
+    async def test_lock_wrist_sends_a_single_trajectory(self):
+        with patch("arm.ServoHandler.follow") as follow, patch("arm.ServoHandler.move") as move, \
+                patch("arm.Telemetry.subscribe"):
+            Arm.move_servo_to_position(FOREARM, 90, lock_wrist=True)
+            await asyncio.sleep(0)
+            move.assert_not_called()
+            follow.assert_called_once()
+            servo_ids, keyframes = follow.call_args.args
+            self.assertEqual(servo_ids, [SERVOS_CONFIG[FOREARM]["id"], SERVOS_CONFIG[WRIST]["id"]])
+            self.assertEqual(len(keyframes), 2)
+            self.assertAlmostEqual(keyframes[1][1][0], 50.0)  # forearm 90 deg
+            self.assertAlmostEqual(keyframes[1][1][1], 70 * 100 / 180)  # wrist 100 - 30 deg
+
+            Arm.receive_uart_message(servo_status(FOREARM, 90) + servo_status(WRIST, 70), None, None)
+            await asyncio.wait_for(Arm.motion_task, 1)
+        self.assertAlmostEqual(Arm.position[WRIST], 70)
+
+    async def test_preset_is_sent_as_one_trajectory(self):
+        Arm.position.update({WRIST: 25, FOREARM: 170, SHOULDER: 35})
+        with patch("arm.ServoHandler.follow") as follow, patch("arm.Telemetry.subscribe"):
+            Arm.move_to_position("drop")
+            await asyncio.sleep(0)
+            follow.assert_called_once()
+            servo_ids, keyframes = follow.call_args.args
+            self.assertEqual(servo_ids, [SERVOS_CONFIG[limb]["id"] for limb in (SHOULDER, FOREARM, WRIST)])
+            self.assertAlmostEqual(keyframes[-1][1][0], 215 * 100 / 270)
+
+
+class TestArmGeometry(unittest.TestCase):
+    GEOMETRY = {
+        SHOULDER: {"length": 105, "zero": 35, "direction": 1},
+        FOREARM: {"length": 100, "zero": 90, "direction": 1},
+        WRIST: {"length": 90, "zero": 90, "direction": 1},
+    }
+
+    def tearDown(self):
+        Arm.geometry = None
+        Arm.kinematics = None
+
+    def load_geometry(self, geometry):
+        with patch("arm.Config.get", return_value=geometry):
+            Arm.load_geometry()
+
+    def test_claw_moves_are_refused_without_geometry(self):
+        self.load_geometry(None)
+        success, _ = Arm.move_claw_to(200, 0, 0)
+        self.assertFalse(success)
+        self.assertNotIn("claw", Arm.serialize())
+
+    def test_claw_position_from_configured_geometry(self):
+        self.load_geometry(self.GEOMETRY)
+        with patch.dict(Arm.position, {SHOULDER: 35, FOREARM: 90, WRIST: 90}):
+            claw = Arm.serialize()["claw"]
+        self.assertAlmostEqual(claw["x"], 295)
+        self.assertAlmostEqual(claw["z"], 0)
+
+    def test_incomplete_geometry_is_ignored(self):
+        self.load_geometry({SHOULDER: self.GEOMETRY[SHOULDER]})
+        self.assertIsNone(Arm.get_kinematics())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+from arm_kinematics import ArmKinematics
+from arm_planning import ConfigurationSpace
+
+GEOMETRY = {
+    "shoulder": {"length": 105, "zero": 35, "direction": 1},
+    "forearm": {"length": 100, "zero": 90, "direction": 1},
+    "wrist": {"length": 90, "zero": 90, "direction": 1},
+}
+MAX_ANGLES = {"shoulder": 270, "forearm": 180, "wrist": 180}
+
+
+class TestArmKinematics(unittest.TestCase):
+
+    def setUp(self):
+        self.kinematics = ArmKinematics(GEOMETRY, ConfigurationSpace(MAX_ANGLES, []))
+
+    def test_forward(self):
+        x, z, pitch = self.kinematics.forward(dict(shoulder=35, forearm=90, wrist=90))
+        self.assertAlmostEqual(x, 295)
+        self.assertAlmostEqual(z, 0)
+        self.assertAlmostEqual(pitch, 0)
+
+    def test_inverse_round_trip(self):
+        position = dict(shoulder=80, forearm=60, wrist=120)
+        x, z, pitch = self.kinematics.forward(position)
+        solutions = self.kinematics.inverse(x, z, pitch)
+        self.assertEqual(solutions.shape, (2, 3))
+        self.assertTrue(any(np.allclose(solution, [80, 60, 120]) for solution in solutions))
+
+    def test_solve_reaches_shoulder_angles_beyond_180(self):
+        position = dict(shoulder=230, forearm=90, wrist=90)
+        x, z, pitch = self.kinematics.forward(position)
+        solution = self.kinematics.solve(x, z, pitch, position)
+        self.assertIsNotNone(solution)
+        self.assertAlmostEqual(solution["shoulder"], 230, delta=5)
+        # Fully extended arm, the solution is checked in claw space
+        for actual, expected in zip(self.kinematics.forward(solution), (x, z, pitch)):
+            self.assertAlmostEqual(actual, expected, delta=5)
+
+    def test_inverse_is_vectorized(self):
+        solutions = self.kinematics.inverse([150, 200, 1000], [50, 0, 0], [0, -30, 0])
+        self.assertEqual(solutions.shape, (3, 2, 3))
+        self.assertTrue(np.isnan(solutions[2]).all())
+
+    def test_solve_picks_closest_solution_and_caches(self):
+        position = dict(shoulder=80, forearm=60, wrist=120)
+        x, z, pitch = self.kinematics.forward(position)
+        solution = self.kinematics.solve(x, z, pitch, position)
+        self.assertEqual(len(self.kinematics.cache), 1)
+        for limb, angle in position.items():
+            self.assertAlmostEqual(solution[limb], angle, delta=5)
+        self.kinematics.solve(x + 1, z, pitch, position)
+        self.assertEqual(len(self.kinematics.cache), 1)
+
+    def test_solve_rejects_exclusion_zones(self):
+        kinematics = ArmKinematics(GEOMETRY, ConfigurationSpace(MAX_ANGLES, [{"shoulder": [0, 270]}]))
+        self.assertIsNone(kinematics.solve(150, 50, 0))
+        self.assertIsNone(self.kinematics.solve(1000, 0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
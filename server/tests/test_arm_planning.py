@@ -0,0 +1,83 @@
+import sys
+import unittest
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+from arm_planning import ConfigurationSpace, PathPlanner
+
+MAX_ANGLES = {"shoulder": 270, "forearm": 180, "wrist": 180}
+EXCLUSION_ZONES = [
+    {"forearm": [100, 180], "shoulder": [127, 270]},
+    {"forearm": [145, 180], "shoulder": [0, 34]},
+]
+
+
+class TestConfigurationSpace(unittest.TestCase):
+
+    def setUp(self):
+        self.space = ConfigurationSpace(MAX_ANGLES, EXCLUSION_ZONES)
+
+    def test_grid_matches_exclusion_zones(self):
+        self.assertEqual(self.space.blocked.shape, (271, 181, 181))
+        self.assertFalse(self.space.is_free(dict(shoulder=200, forearm=120, wrist=0)))
+        self.assertTrue(self.space.is_free(dict(shoulder=200, forearm=90, wrist=0)))
+        self.assertTrue(self.space.is_free(dict(shoulder=35, forearm=170, wrist=90)))
+        self.assertFalse(self.space.is_free(dict(shoulder=35, forearm=190, wrist=90)))
+
+    def test_free_range(self):
+        self.assertEqual(self.space.free_range("forearm", dict(shoulder=200, forearm=30, wrist=0)), [0, 99])
+        self.assertEqual(self.space.free_range("shoulder", dict(shoulder=60, forearm=150, wrist=0)), [35, 126])
+        self.assertIsNone(self.space.free_range("shoulder", dict(shoulder=200, forearm=150, wrist=0)))
+
+    def test_path_through_exclusion_zone(self):
+        start = dict(shoulder=60, forearm=150, wrist=0)
+        self.assertFalse(self.space.is_path_free(start, dict(start, shoulder=200)))
+        self.assertTrue(self.space.is_path_free(start, dict(start, shoulder=100)))
+
+    def test_order_moves(self):
+        position = dict(shoulder=35, forearm=170, wrist=25)
+        moves = [dict(id="shoulder", angle=215), dict(id="forearm", angle=30), dict(id="claw", angle=90)]
+        self.assertEqual([move["id"] for move in self.space.order_moves(position, moves)], ["forearm", "shoulder", "claw"])
+        self.assertIsNone(self.space.order_moves(position, [dict(id="shoulder", angle=351)]))
+
+
+class TestPathPlanner(unittest.TestCase):
+
+    def setUp(self):
+        # A wall across the shoulder range, only passable with the wrist above 90 deg
+        self.space = ConfigurationSpace(MAX_ANGLES, EXCLUSION_ZONES + [
+            {"forearm": [60, 180], "shoulder": [100, 150]},
+            {"forearm": [0, 59], "shoulder": [100, 150], "wrist": [0, 90]},
+        ])
+        self.planner = PathPlanner(self.space)
+
+    def assert_path_is_free(self, start, path):
+        for waypoint in path:
+            self.assertTrue(self.space.is_path_free(start, waypoint))
+            start = waypoint
+
+    def test_direct_path(self):
+        start = dict(shoulder=35, forearm=30, wrist=45)
+        goal = dict(shoulder=90, forearm=60, wrist=100)
+        self.assertEqual(self.planner.plan(start, goal), [goal])
+
+    def test_path_around_exclusion_zones(self):
+        start = dict(shoulder=35, forearm=30, wrist=45)
+        goal = dict(shoulder=215, forearm=30, wrist=45)
+        path = self.planner.plan(start, goal)
+        self.assertGreater(len(path), 1)
+        self.assertEqual(path[-1], goal)
+        self.assertTrue(any(waypoint["wrist"] > 90 for waypoint in path))
+        self.assert_path_is_free(start, path)
+
+    def test_plans_are_cached(self):
+        start = dict(shoulder=35, forearm=30, wrist=45)
+        goal = dict(shoulder=215, forearm=30, wrist=45)
+        self.assertIs(self.planner.plan(start, goal), self.planner.plan(dict(start, wrist=45.2), goal))
+
+    def test_unreachable_goal(self):
+        self.assertIsNone(self.planner.plan(dict(shoulder=35, forearm=30, wrist=45), dict(shoulder=200, forearm=120, wrist=45)))
+
+
+if __name__ == "__main__":
+    unittest.main()
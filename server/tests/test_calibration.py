@@ -0,0 +1,87 @@
+import json
+import sys
+import unittest
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+from camera import Camera
+from models import Config
+from vision.calibration import CameraCalibration, Calibrator
+from vision.floor import HomographyProjection
+
+SQUARE = 40  # px, size of the squares on the board texture
+SQUARE_SIZE = 0.025  # m
+DISTANCE = 0.3  # m, nearest row of inner corners
+# Floor (m) to 1280x720 image
+FLOOR_TO_IMAGE = cv2.getPerspectiveTransform(
+    np.float32([[-0.3, 0.2], [0.3, 0.2], [0.3, 1.0], [-0.3, 1.0]]),
+    np.float32([[100, 700], [1180, 700], [800, 300], [480, 300]]),
+)
+
+
+def _floor_board_frame():
+    # 9x6 inner corners board, with a one square white margin
+    texture = np.full((9 * SQUARE, 12 * SQUARE), 255, dtype=np.uint8)
+    for row in range(7):
+        for column in range(10):
+            if (row + column) % 2 == 0:
+                y, x = (row + 1) * SQUARE, (column + 1) * SQUARE
+                texture[y:y + SQUARE, x:x + SQUARE] = 0
+    # Texture pixels to floor, board centered, bottom row of inner corners at DISTANCE
+    scale = SQUARE_SIZE / SQUARE
+    texture_to_floor = np.array([
+        [scale, 0, -6 * SQUARE * scale],
+        [0, -scale, DISTANCE + 7 * SQUARE * scale],
+        [0, 0, 1],
+    ])
+    return cv2.warpPerspective(texture, FLOOR_TO_IMAGE @ texture_to_floor, (1280, 720), borderValue=160)
+
+
+class TestCalibrator(unittest.TestCase):
+
+    def test_fit_ground(self):
+        calibration = Calibrator((9, 6), SQUARE_SIZE).fit_ground(_floor_board_frame(), DISTANCE)
+        self.assertEqual(calibration.resolution, (1280, 720))
+        floor = np.float32([[0.0, 0.35], [0.1, 0.5], [-0.2, 0.8]])
+        pixels = cv2.perspectiveTransform(floor.reshape(-1, 1, 2), FLOOR_TO_IMAGE).reshape(-1, 2)
+        floor_x, floor_y = HomographyProjection(calibration, 1280, 720).project(pixels[:, 0], pixels[:, 1])
+        np.testing.assert_allclose(floor_x, floor[:, 0], atol=0.01)
+        np.testing.assert_allclose(floor_y, floor[:, 1], atol=0.01)
+
+    def test_board_not_found(self):
+        self.assertIsNone(Calibrator().fit_ground(np.zeros((720, 1280), dtype=np.uint8), DISTANCE))
+
+    def test_intrinsics_need_views(self):
+        with self.assertRaises(ValueError):
+            Calibrator().calibrate_intrinsics()
+
+
+class TestCameraCalibration(unittest.TestCase):
+
+    def tearDown(self):
+        Camera.set_calibration(None)
+
+    def test_saved_as_config_json(self):
+        calibration = CameraCalibration((1280, 720), np.linalg.inv(FLOOR_TO_IMAGE), np.eye(3), np.zeros(5))
+        value = json.dumps(calibration.serialize())
+        self.assertLess(len(value), 2048)
+        restored = CameraCalibration.from_dict(Config._convert_to_type(value, "json"))
+        np.testing.assert_allclose(restored.homography, calibration.homography)
+        self.assertEqual(restored.resolution, (1280, 720))
+
+    def test_projection_is_rescaled(self):
+        Camera.set_calibration(CameraCalibration((1280, 720), np.linalg.inv(FLOOR_TO_IMAGE)))
+        projection = Camera.get_floor_projection(640, 360)
+        self.assertIsInstance(projection, HomographyProjection)
+        floor_x, floor_y = projection.project(590, 350)
+        self.assertAlmostEqual(float(floor_x), 0.3, places=6)
+        self.assertAlmostEqual(float(floor_y), 0.2, places=6)
+        # Percent positions
+        np.testing.assert_allclose(Camera.get_target_position(50, 300 * 100 / 720), (0.0, 1.0), atol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
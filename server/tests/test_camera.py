@@ -1,11 +1,15 @@
 import asyncio
 import inspect
+import math
 import sys
 import unittest
 from unittest.mock import patch
 
+import numpy as np
+
 sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
 
+import camera
 from camera import Camera
 
 
@@ -91,5 +95,37 @@ class TestCameraAsyncCapture(unittest.IsolatedAsyncioTestCase):
         self.assertNotIn("test_cb", Camera.new_streaming_frame_callbacks)
 
 
+def _reference_target_position(x, y, lense_coeff_x_pos):
+    """Scalar implementation of the ground plane model"""
+    a = 0
+    for n, p in enumerate(reversed(camera.poly_coefficients)):
+        a += p * math.pow(min(camera.max_y_pos, (100 - y)), n)
+    y_pos = camera.H * math.tan(a)
+    x_pos = (camera.MAX_DISTANCE / (camera.MAX_DISTANCE - min(y_pos, camera.MAX_DISTANCE - 0.1))) * ((x - 50) / 50) * camera.ROBOT_WIDTH / 2
+    return x_pos * lense_coeff_x_pos, y_pos
+
+
+class TestFloorProjection(unittest.TestCase):
+
+    def setUp(self):
+        Camera.lense_coeff_x_pos = 0.8
+        Camera.floor_projections = {}
+
+    def test_target_position_matches_model(self):
+        for x, y in [(50, 90), (10, 75), (85, 62.5), (30, 58.3)]:
+            expected = _reference_target_position(x, y, 0.8)
+            np.testing.assert_allclose(Camera.get_target_position(x, y), expected, atol=1e-9)
+
+    def test_projection_of_pixel_arrays(self):
+        projection = Camera.get_floor_projection(1280, 720)
+        self.assertIs(Camera.get_floor_projection(1280, 720), projection)
+        xs, ys = np.array([100, 640, 1200]), np.array([700, 500, 450])
+        floor_x, floor_y = projection.project(xs, ys)
+        for i in range(3):
+            expected = _reference_target_position(xs[i] * 100 / 1280, ys[i] * 100 / 720, 0.8)
+            self.assertAlmostEqual(floor_x[i], expected[0])
+            self.assertAlmostEqual(floor_y[i], expected[1])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,44 @@
+import sys
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+import handlers.drive  # registers the handler
+from handlers.base import BaseHandler
+from motor.motor import Motor
+from motor.motor_pico import PicoMotor, TELEMETRY_FIELDS
+from telemetry import TelemetryBuffer
+
+
+class TestDriveTelemetry(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.telemetry = TelemetryBuffer(TELEMETRY_FIELDS, capacity=10)
+        for i in range(4):
+            self.telemetry.append([i] * len(TELEMETRY_FIELDS), ts=float(i))
+        self.patches = [
+            patch.object(Motor, "_controller", PicoMotor),
+            patch.object(PicoMotor, "telemetry", self.telemetry),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    async def test_telemetry_is_sent_to_client(self):
+        protocol = MagicMock()
+        protocol.send_message = AsyncMock()
+        await BaseHandler.get_handler("drive").process(
+            dict(action="get_telemetry", args=dict(duration=2, step=2)), protocol
+        )
+        topic, telemetry = protocol.send_message.call_args.args
+        self.assertEqual(topic, "motor_telemetry")
+        self.assertEqual(telemetry["ts"], [1.0, 3.0])
+        self.assertEqual(telemetry["left_speed"], [1.0, 3.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+import handlers.face_detection  # registers the handler
+from handlers.base import BaseHandler
+from vision.face import HaarFaceDetector, create_face_detector
+from vision.tracker import OpticalFlowTracker
+
+
+def _textured_frame(x, y, width=320, height=240):
+    frame = np.zeros((height, width), dtype=np.uint8)
+    patch = np.random.default_rng(0).integers(0, 255, (60, 60), dtype=np.uint8)
+    frame[y:y + 60, x:x + 60] = cv2.GaussianBlur(patch, (5, 5), 0)
+    return frame
+
+
+class TestOpticalFlowTracker(unittest.TestCase):
+
+    def test_box_follows_motion(self):
+        tracker = OpticalFlowTracker()
+        self.assertTrue(tracker.init(_textured_frame(100, 80), (100, 80, 60, 60)))
+        for step in range(1, 6):
+            box = tracker.update(_textured_frame(100 + 3 * step, 80 + 2 * step))
+        self.assertIsNotNone(box)
+        x, y, w, h = box
+        self.assertAlmostEqual(x, 115, delta=2)
+        self.assertAlmostEqual(y, 90, delta=2)
+        self.assertAlmostEqual(w, 60, delta=3)
+
+    def test_no_corners_is_not_tracked(self):
+        tracker = OpticalFlowTracker()
+        self.assertFalse(tracker.init(np.zeros((240, 320), dtype=np.uint8), (100, 80, 60, 60)))
+        self.assertIsNone(tracker.update(np.zeros((240, 320), dtype=np.uint8)))
+
+
+class TestCreateFaceDetector(unittest.TestCase):
+
+    @unittest.skipUnless(hasattr(cv2, "CascadeClassifier"), "Haar cascades not available in this OpenCV build")
+    def test_missing_model_falls_back_to_haar(self):
+        with patch("vision.face.MODELS_DIR", "/nonexistent"):
+            self.assertIsInstance(create_face_detector("yunet"), HaarFaceDetector)
+
+    @unittest.skipUnless(hasattr(cv2, "CascadeClassifier"), "Haar cascades not available in this OpenCV build")
+    def test_haar_finds_nothing_in_blank_frame(self):
+        self.assertEqual(HaarFaceDetector().detect(np.zeros((240, 320, 3), dtype=np.uint8)), [])
+
+
+class SlowDetector(object):
+    name = "slow"
+
+    def __init__(self, faces):
+        self.faces = faces
+        self.release = threading.Event()
+
+    def detect(self, image):
+        self.release.wait(1)
+        return self.faces
+
+
+class TestFaceDetectionHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = BaseHandler.get_handler("face_detection")
+        self.handler.running = True
+        self.handler.tracker.reset()
+        self.handler._detection = None
+        self.handler._last_detection_frame = None
+        self.handler.frame_counter = 0
+
+    def tearDown(self):
+        self.handler.detector.release.set()
+        self.handler.running = False
+        self.handler._detection = None
+
+    @patch("handlers.face_detection.Motor.move_to_target")
+    @patch("handlers.face_detection.Camera.get_floor_projection")
+    @patch("handlers.face_detection.Camera.set_position")
+    def test_detection_does_not_block_frames(self, set_position, get_floor_projection, move_to_target):
+        get_floor_projection.return_value.project.return_value = (0, 0.5)
+        # Face found at (100, 80) on the 320 px wide detection image
+        self.handler.detector = SlowDetector([(100, 80, 60, 60, 0.9)])
+        frame = cv2.cvtColor(cv2.resize(_textured_frame(100, 80), (640, 480)), cv2.COLOR_GRAY2BGR)
+
+        start = time.monotonic()
+        self.handler.receive_event("camera", "new_front_camera_frame", dict(frame=frame.copy()))
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertIsNone(self.handler.face_position)
+        move_to_target.assert_not_called()
+
+        self.handler.detector.release.set()
+        self.handler._detection.result()
+        self.handler.receive_event("camera", "new_front_camera_frame", dict(frame=frame.copy()))
+        x, y, w, h = self.handler.face_position
+        self.assertAlmostEqual(x, 200, delta=2)
+        self.assertAlmostEqual(y, 160, delta=2)
+        move_to_target.assert_called_once()
+
+        # Tracked on the next frames, no new detection before a second has passed
+        self.handler.receive_event("camera", "new_front_camera_frame", dict(frame=frame.copy()))
+        self.assertEqual(move_to_target.call_count, 2)
+        self.assertIsNone(self.handler._detection)
+
+
+if __name__ == "__main__":
+    unittest.main()
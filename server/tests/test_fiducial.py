@@ -0,0 +1,106 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+import handlers.fiducial  # registers the handler
+from handlers.base import BaseHandler
+from vision.fiducial import FiducialDetector
+from vision.frame import FrameCache
+
+
+def _frame_with_marker(marker_id, x, y, size=160):
+    dictionary = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_50)
+    frame = np.full((720, 1280, 3), 255, dtype=np.uint8)
+    frame[y:y + size, x:x + size] = cv2.aruco.generateImageMarker(dictionary, marker_id, size)[..., np.newaxis]
+    return frame
+
+
+class TestFiducialDetector(unittest.TestCase):
+
+    def test_aruco_marker(self):
+        cache = FrameCache(_frame_with_marker(7, 400, 300))
+        scale = cache.scale_for_width(FiducialDetector.DETECTION_WIDTH)
+        markers = FiducialDetector().detect(cache.gray(), cache.gray(scale), scale, qr_codes=False)
+        self.assertEqual([name for name, _ in markers], ["aruco:7"])
+        np.testing.assert_allclose(markers[0][1].min(axis=0), (400, 300), atol=3)
+        np.testing.assert_allclose(markers[0][1].max(axis=0), (560, 460), atol=3)
+
+
+@patch("handlers.fiducial.Motor")
+@patch("handlers.fiducial.Camera")
+class TestFiducialHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.handler = BaseHandler.get_handler("fiducial")
+        self.handler.detector = FiducialDetector()
+
+    def tearDown(self):
+        with patch("handlers.fiducial.Motor"), patch("handlers.fiducial.BaseHandler.emit_event"):
+            self.handler.stop()
+
+    def _start(self, camera, target, mode="approach"):
+        with patch("handlers.fiducial.Config.get", side_effect=lambda key: {
+            "fiducial_navigation_speed": 40, "fiducial_dictionary": "DICT_4X4_50"
+        }[key]):
+            self.handler.start(target=target, mode=mode)
+
+    def _run(self, frame, nb_of_frames=2):
+        for _ in range(nb_of_frames):
+            self.handler.receive_event("camera", "new_front_camera_frame", dict(frame=frame.copy()))
+            if self.handler._detection is not None:
+                self.handler._detection.result()
+
+    def test_drives_toward_marker_bottom_edge(self, camera, motor):
+        camera.get_floor_projection.return_value.project.return_value = (0.1, 0.8)
+        self._start(camera, "aruco:7")
+        self._run(_frame_with_marker(7, 400, 300))
+        camera.get_floor_projection.assert_called_with(1280, 720)
+        x, y = camera.get_floor_projection.return_value.project.call_args[0]
+        self.assertAlmostEqual(x, 480, delta=4)
+        self.assertAlmostEqual(y, 460, delta=4)
+        x, distance, speed, timeout = motor.move_to_target.call_args[0]
+        self.assertEqual((x, speed), (0.1, 40))
+        self.assertAlmostEqual(distance, 0.8 - self.handler.APPROACH_DISTANCE)
+
+    def test_other_markers_are_ignored(self, camera, motor):
+        self._start(camera, "aruco:3")
+        self._run(_frame_with_marker(7, 400, 300))
+        motor.move_to_target.assert_not_called()
+
+    def test_stops_when_docked(self, camera, motor):
+        camera.get_floor_projection.return_value.project.return_value = (0.0, 0.05)
+        self._start(camera, None, mode="dock")
+        with patch("handlers.fiducial.BaseHandler.emit_event") as emit_event:
+            self._run(_frame_with_marker(7, 400, 300))
+        motor.stop.assert_called()
+        motor.move_to_target.assert_not_called()
+        self.assertFalse(self.handler.running)
+        self.assertEqual(emit_event.call_args.kwargs["data"]["target"], "aruco:7")
+        self.assertEqual(emit_event.call_args.kwargs["event_type"], "reached")
+
+    def test_locks_on_first_marker_seen(self, camera, motor):
+        self._start(camera, None)
+        corners = np.zeros((4, 2), dtype=np.float32)
+        self.assertEqual(self.handler._select_marker([("aruco:7", corners), ("aruco:3", corners)])[0], "aruco:7")
+        self.assertEqual(self.handler.target, "aruco:7")
+        self.assertIsNone(self.handler._select_marker([("aruco:3", corners)]))
+
+    def test_stops_once_when_marker_is_lost(self, camera, motor):
+        self._start(camera, "aruco:7")
+        self.handler._last_seen -= self.handler.LOST_TIMEOUT * 2
+        with patch("handlers.fiducial.BaseHandler.emit_event") as emit_event:
+            self._run(np.full((720, 1280, 3), 255, dtype=np.uint8), nb_of_frames=3)
+        motor.stop.assert_called_once()
+        emit_event.assert_called_once()
+        self.assertEqual(emit_event.call_args.kwargs["event_type"], "lost")
+        # Still waiting for the marker to show up again
+        self.assertTrue(self.handler.running)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+from vision.frame import FrameCache
+
+
+class TestFrameCache(unittest.TestCase):
+
+    def setUp(self):
+        self.frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+        self.cache = FrameCache(self.frame)
+
+    def test_derived_images_are_computed_once(self):
+        with patch("vision.frame.cv2.cvtColor", wraps=cv2.cvtColor) as cvt_color:
+            gray = self.cache.gray(0.5)
+            self.assertIs(self.cache.gray(0.5), gray)
+        self.assertEqual(cvt_color.call_count, 1)
+        self.assertEqual(gray.shape, (240, 320))
+
+    def test_scales(self):
+        self.assertIs(self.cache.resized(1.0), self.cache.frame)
+        self.assertEqual(self.cache.half().shape, (240, 320, 3))
+        self.assertEqual(self.cache.quarter().shape, (120, 160, 3))
+        self.assertEqual(self.cache.scale_for_width(320), 0.5)
+        self.assertEqual(self.cache.scale_for_width(1280), 1.0)
+
+    def test_frame_is_copied_on_first_use(self):
+        self.assertEqual((self.cache.width, self.cache.height), (640, 480))
+        self.assertIsNone(self.cache._frame)
+        gray = self.cache.gray(0.5)
+        # Boxes drawn by a detector are not seen by the next ones
+        cv2.rectangle(self.frame, (10, 10), (100, 100), (0, 255, 0), 2)
+        np.testing.assert_array_equal(self.cache.gray(), cv2.cvtColor(self.cache.frame, cv2.COLOR_BGR2GRAY))
+        self.assertFalse(np.array_equal(self.cache.frame, self.frame))
+        self.assertIs(self.cache.gray(0.5), gray)
+
+    def test_roi_in_full_resolution_coordinates(self):
+        roi = self.cache.roi(100, 40, 200, 80, scale=0.5, gray=True)
+        self.assertEqual(roi.shape, (40, 100))
+        np.testing.assert_array_equal(roi, self.cache.gray(0.5)[20:60, 50:150])
+
+
+if __name__ == "__main__":
+    unittest.main()
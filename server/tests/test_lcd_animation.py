@@ -0,0 +1,100 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+from PIL import Image
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+from lcd.animation import Animation, AnimationPlayer
+from lcd.compositor import LcdCompositor
+
+COLORS = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 255)]
+
+
+class FakeLCD(object):
+    width = 240
+    height = 320
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.buffers = []
+
+    def ShowBuffer(self, buffer):
+        time.sleep(self.delay)
+        self.buffers.append(buffer)
+
+
+class TestAnimation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        frames = [Image.new("RGB", (32, 24), color) for color in COLORS]
+        frames[0].save(os.path.join(self.tmp_dir.name, "blink.gif"), save_all=True, append_images=frames[1:],
+                       duration=[20, 20, 20, 40], loop=0)
+        sheet = Image.new("RGB", (64, 48))
+        for i, color in enumerate(COLORS[:3]):
+            sheet.paste(Image.new("RGB", (32, 24), color), ((i % 2) * 32, (i // 2) * 24))
+        sheet.save(os.path.join(self.tmp_dir.name, "sheet.png"))
+        with open(os.path.join(self.tmp_dir.name, "sheet.json"), "w") as f:
+            json.dump(dict(frame_width=32, frame_height=24, nb_of_frames=3, duration=10, loop=1), f)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_gif(self):
+        animation = Animation.load(os.path.join(self.tmp_dir.name, "blink.gif"), 320, 240)
+        self.assertEqual(len(animation.frames), 4)
+        self.assertEqual(animation.frames[0].shape, (240, 320))
+        self.assertAlmostEqual(animation.duration, 0.1)
+        self.assertEqual(animation.frame_at(0.0), 0)
+        self.assertEqual(animation.frame_at(0.05), 2)
+        self.assertEqual(animation.frame_at(0.17), 3)
+        self.assertAlmostEqual(animation.time_to_next_frame(0.05), 0.01)
+
+    def test_load_sprite_sheet(self):
+        animation = Animation.load(os.path.join(self.tmp_dir.name, "sheet.png"), 320, 240)
+        self.assertEqual(len(animation.frames), 3)
+        self.assertEqual(animation.frame_at(0.025), 2)
+        self.assertIsNone(animation.frame_at(0.03))
+
+    def make_compositor(self, lcd):
+        compositor = LcdCompositor(lcd)
+        compositor.start()
+        self.addCleanup(compositor.stop)
+        return compositor
+
+    def test_player(self):
+        lcd = FakeLCD()
+        player = AnimationPlayer(self.make_compositor(lcd), self.tmp_dir.name)
+        self.assertEqual(player.get_names(), ["blink", "sheet"])
+        self.assertFalse(player.play("unknown")[0])
+
+        self.assertTrue(player.play("sheet")[0])
+        player._thread.join(1)
+        self.assertFalse(player.is_playing())
+        self.assertEqual(player.nb_of_frames + player.nb_of_skipped_frames, 3)
+
+        player.play("blink")
+        time.sleep(0.05)
+        self.assertTrue(player.is_playing())
+        player.stop()
+        self.assertFalse(player.is_playing())
+        self.assertGreater(len(lcd.buffers), 0)
+
+    def test_frames_are_skipped_when_lcd_is_slow(self):
+        lcd = FakeLCD(delay=0.035)
+        player = AnimationPlayer(self.make_compositor(lcd), self.tmp_dir.name)
+        # 10 ms frames, the LCD shows one every 35 ms
+        self.assertTrue(player.play("sheet")[0])
+        player._thread.join(1)
+        self.assertEqual(player.nb_of_frames, len(lcd.buffers))
+        self.assertLess(player.nb_of_frames, 3)
+        self.assertEqual(player.nb_of_frames + player.nb_of_skipped_frames, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
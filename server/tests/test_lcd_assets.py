@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+from lcd import rgb565
+from lcd.assets import PictureCache
+
+
+class TestPictureCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pics_path = os.path.join(self.tmp_dir.name, "Pics")
+        self.cache_dir = os.path.join(self.tmp_dir.name, "cache")
+        os.makedirs(self.pics_path)
+        self.save_picture("smile", (255, 0, 0))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def save_picture(self, name, color):
+        Image.new("RGB", (64, 48), color).save(os.path.join(self.pics_path, f"{name}.png"))
+
+    def test_picture_is_converted_to_panel_layout(self):
+        cache = PictureCache(self.pics_path, 320, 240)
+        buffer = cache.get("smile")
+        self.assertEqual(buffer.shape, (240, 320))
+        self.assertEqual(buffer.dtype, rgb565.RGB565)
+        self.assertTrue(np.all(buffer == 0xF800))
+        self.assertIs(cache.get("smile"), buffer)
+        self.assertIsNone(cache.get("unknown"))
+
+    def test_disk_cache_is_reused(self):
+        PictureCache(self.pics_path, 320, 240, self.cache_dir).get("smile")
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        cache = PictureCache(self.pics_path, 320, 240, self.cache_dir)
+        with patch.object(cache, "_decode") as decode:
+            buffer = cache.get("smile")
+        decode.assert_not_called()
+        self.assertTrue(np.all(buffer == 0xF800))
+
+    def test_modified_picture_is_converted_again(self):
+        cache = PictureCache(self.pics_path, 320, 240, self.cache_dir)
+        cache.get("smile")
+        self.save_picture("smile", (0, 0, 255))
+        stat = os.stat(os.path.join(self.pics_path, "smile.png"))
+        os.utime(os.path.join(self.pics_path, "smile.png"), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertTrue(np.all(cache.get("smile") == 0x001F))
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+    def test_pictures_sharing_a_prefix_keep_their_cache(self):
+        self.save_picture("smile-face", (0, 255, 0))
+        cache = PictureCache(self.pics_path, 320, 240, self.cache_dir)
+        cache.get("smile-face")
+        cache.get("smile")
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+    def test_preload(self):
+        self.save_picture("sad", (0, 255, 0))
+        cache = PictureCache(self.pics_path, 320, 240)
+        cache.preload()
+        self.assertEqual(set(cache._pictures.keys()), {"smile", "sad"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+from lcd.compositor import LcdCompositor
+
+
+class SlowLCD(object):
+    width = 240
+    height = 320
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = []
+        self.busy = threading.Lock()
+        self.interleaved = False
+
+    def Init(self):
+        pass
+
+    def _transaction(self, name, value=None):
+        if not self.busy.acquire(blocking=False):
+            self.interleaved = True
+            return
+        try:
+            time.sleep(self.delay)
+            self.calls.append((name, value))
+        finally:
+            self.busy.release()
+
+    def ShowImage(self, image):
+        self._transaction("show", image)
+
+    def clear(self):
+        self._transaction("clear")
+
+
+class TestLcdCompositor(unittest.TestCase):
+
+    def setUp(self):
+        self.lcd = SlowLCD()
+        self.compositor = LcdCompositor(self.lcd)
+        self.compositor.Init()
+
+    def tearDown(self):
+        self.compositor.stop()
+
+    def wait_until_idle(self):
+        for _ in range(100):
+            time.sleep(0.02)
+            if self.compositor._frame is None and not self.lcd.busy.locked() and len(self.compositor._commands) == 0:
+                return
+
+    def test_show_image_does_not_block(self):
+        t0 = time.monotonic()
+        self.compositor.ShowImage("frame")
+        self.assertLess(time.monotonic() - t0, self.lcd.delay)
+        self.wait_until_idle()
+        self.assertEqual(self.lcd.calls, [("show", "frame")])
+
+    def test_latest_frame_wins(self):
+        for i in range(10):
+            self.compositor.ShowImage(i)
+        self.wait_until_idle()
+        shown = [value for name, value in self.lcd.calls]
+        self.assertEqual(shown[-1], 9)
+        self.assertLess(len(shown), 10)
+        self.assertEqual(self.compositor.nb_of_frames + self.compositor.nb_of_dropped_frames, 10)
+
+    def test_concurrent_writers_do_not_interleave(self):
+        threads = [threading.Thread(target=lambda i=i: (self.compositor.ShowImage(i), self.compositor.clear()))
+                   for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.wait_until_idle()
+        self.assertFalse(self.lcd.interleaved)
+        self.assertEqual(len([name for name, _ in self.lcd.calls if name == "clear"]), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,6 @@
 import sys
 import unittest
-from unittest.mock import MagicMock, patch
-import numpy as np
+from unittest.mock import AsyncMock, MagicMock, patch
 
 sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
 
@@ -21,21 +20,7 @@ def _make_handler():
     return handler, mock_lcd
 
 
-class TestLcdDisplayFrame(unittest.TestCase):
-
-    def test_display_frame_calls_show_image(self):
-        handler, mock_lcd = _make_handler()
-        frame = np.zeros((480, 640, 3), dtype=np.uint8)
-        handler.display_frame(frame)
-        mock_lcd.ShowImage.assert_called_once()
-
-    def test_display_frame_resizes_to_lcd_dimensions(self):
-        handler, mock_lcd = _make_handler()
-        frame = np.zeros((480, 640, 3), dtype=np.uint8)
-        handler.display_frame(frame)
-        call_args = mock_lcd.ShowImage.call_args[0][0]
-        # PIL Image size is (width, height)
-        self.assertEqual(call_args.size, (mock_lcd.height, mock_lcd.width))
+class TestLcdStopVideo(unittest.TestCase):
 
     def test_stop_video_calls_show_image(self):
         handler, mock_lcd = _make_handler()
@@ -43,5 +28,19 @@ class TestLcdDisplayFrame(unittest.TestCase):
         mock_lcd.ShowImage.assert_called_once()
 
 
+
+class TestLcdAnimation(unittest.IsolatedAsyncioTestCase):
+
+    async def test_unknown_animation_is_reported(self):
+        handler, _ = _make_handler()
+        protocol = MagicMock()
+        protocol.send_message = AsyncMock()
+        with patch.object(handler, "animations_path", "/nonexistent"), patch.object(handler, "animations", None):
+            await handler.process(dict(action="play_animation", args=dict(name="unknown")), protocol)
+        topic, status = protocol.send_message.call_args.args
+        self.assertEqual(topic, "lcd")
+        self.assertFalse(status["success"])
+        self.assertIn("unknown", status["message"])
+
 if __name__ == "__main__":
     unittest.main()
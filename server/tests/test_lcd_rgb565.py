@@ -0,0 +1,36 @@
+import sys
+import unittest
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+from lcd import rgb565
+
+
+def legacy_rgb565(image):
+    img = np.asarray(image.rotate(180))
+    pix = np.zeros((img.shape[0], img.shape[1], 2), dtype=np.uint8)
+    pix[..., [0]] = np.add(np.bitwise_and(img[..., [0]], 0xF8), np.right_shift(img[..., [1]], 5))
+    pix[..., [1]] = np.add(np.bitwise_and(np.left_shift(img[..., [1]], 3), 0xE0), np.right_shift(img[..., [2]], 3))
+    return pix.flatten().tobytes()
+
+
+class TestRGB565(unittest.TestCase):
+
+    def test_matches_legacy_conversion(self):
+        rng = np.random.default_rng(0)
+        image = Image.fromarray(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8))
+        out = rgb565.new_buffer(320, 240)
+        result = rgb565.to_rgb565(image, out=out, rotate=True)
+        self.assertIs(result, out)
+        self.assertEqual(bytes(rgb565.as_bytes(out)), legacy_rgb565(image))
+
+    def test_big_endian_layout(self):
+        pixel = np.array([[[0xFF, 0x00, 0x00], [0x00, 0x00, 0xFF]]], dtype=np.uint8)
+        self.assertEqual(bytes(rgb565.as_bytes(rgb565.to_rgb565(pixel))), b"\xf8\x00\x00\x1f")
+
+
+if __name__ == "__main__":
+    unittest.main()
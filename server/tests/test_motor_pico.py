@@ -0,0 +1,44 @@
+import asyncio
+import sys
+import unittest
+from unittest.mock import AsyncMock, patch
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+from motor.motor_pico import PicoMotor
+
+
+class TestPicoMotorInitialization(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        PicoMotor.status = "UK"
+        PicoMotor.init_task = None
+        PicoMotor.init_commands = ["U:C:N:Y:N", "M:C:660:0.1:90:0.5:1.0:0.003:15", "T:M:50"]
+
+    async def test_initialization_does_not_block(self):
+        with patch("motor.motor_pico.UART.request", AsyncMock(return_value=(True, "OK", 0.001))) as request:
+            PicoMotor.start_initialization()
+            self.assertEqual(PicoMotor.status, "INIT")
+            await PicoMotor.init_task
+        self.assertEqual(PicoMotor.status, "OK")
+        self.assertEqual([c.args[0] for c in request.call_args_list], PicoMotor.init_commands)
+
+    async def test_initialization_is_retried_with_backoff(self):
+        responses = [(False, "Timeout", None), (False, "Timeout", None)] + [(True, "OK", 0.001)] * 3
+        with patch("motor.motor_pico.UART.request", AsyncMock(side_effect=responses)), \
+                patch("motor.motor_pico.asyncio.sleep", AsyncMock()) as sleep:
+            await PicoMotor.initialize()
+        self.assertEqual(PicoMotor.status, "OK")
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.1, 0.2])
+
+    async def test_initialization_is_not_started_twice(self):
+        with patch("motor.motor_pico.UART.request", AsyncMock(return_value=(True, "OK", 0.001))):
+            PicoMotor.start_initialization()
+            first_task = PicoMotor.init_task
+            PicoMotor.start_initialization()
+            self.assertIs(PicoMotor.init_task, first_task)
+            await first_task
+
+
+if __name__ == "__main__":
+    unittest.main()
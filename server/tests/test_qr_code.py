@@ -0,0 +1,74 @@
+import asyncio
+import sys
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+import handlers.qr_code  # registers the handler
+from handlers.base import BaseHandler
+from vision.frame import FrameCache
+from vision.qr import QRScanner
+
+
+def _frame_with_codes(codes):
+    encoder = cv2.QRCodeEncoder.create()
+    frame = np.full((720, 1280, 3), 255, dtype=np.uint8)
+    for data, (x, y) in codes.items():
+        code = cv2.resize(encoder.encode(data), (150, 150), interpolation=cv2.INTER_NEAREST)
+        frame[y:y + 150, x:x + 150] = code[..., np.newaxis]
+    return frame
+
+
+class TestQRScanner(unittest.TestCase):
+
+    def test_multiple_codes(self):
+        cache = FrameCache(_frame_with_codes({"dock-1": (200, 100), "hello": (800, 300)}))
+        scale = cache.scale_for_width(QRScanner.DETECTION_WIDTH)
+        codes = dict(QRScanner().scan(cache.gray(), cache.gray(scale), scale))
+        self.assertEqual(set(codes.keys()), {"dock-1", "hello"})
+        # Corners in full resolution pixels, the encoded image has a 2 modules quiet zone
+        np.testing.assert_allclose(codes["hello"].min(axis=0), (812, 312), atol=4)
+
+    def test_no_code(self):
+        cache = FrameCache(np.zeros((720, 1280, 3), dtype=np.uint8))
+        self.assertEqual(QRScanner().scan(cache.gray(), cache.gray(0.5), 0.5), [])
+
+
+class TestQRCodeHandler(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.handler = BaseHandler.get_handler("qr_code")
+        self.protocol = MagicMock()
+        self.protocol.send_message = AsyncMock()
+        self.handler.start(self.protocol)
+
+    def tearDown(self):
+        self.handler.stop()
+
+    async def test_codes_are_reported_once(self):
+        points = np.zeros((4, 2), dtype=np.float32)
+        with patch("handlers.qr_code.BaseHandler.emit_event") as emit_event:
+            for _ in range(3):
+                self.handler.report([("dock-1", points)])
+            self.handler.report([("dock-1", points), ("dock-2", points)])
+            await asyncio.sleep(0)
+        self.assertEqual([c.kwargs["data"]["data"] for c in emit_event.call_args_list], ["dock-1", "dock-2"])
+        self.assertEqual(self.protocol.send_message.await_count, 2)
+        self.protocol.send_message.assert_any_await("qr_code", dict(data="dock-2", points=points.tolist()))
+
+    async def test_scan_runs_in_worker(self):
+        frame = _frame_with_codes({"dock-1": (200, 100)})
+        with patch("handlers.qr_code.BaseHandler.emit_event") as emit_event:
+            self.handler.receive_event("camera", "new_front_camera_frame", dict(frame=frame, cache=FrameCache(frame)))
+            self.handler._scan.result()
+            self.handler.receive_event("camera", "new_front_camera_frame", dict(frame=frame, cache=FrameCache(frame)))
+        emit_event.assert_called_once()
+        self.assertEqual(emit_event.call_args.kwargs["data"]["data"], "dock-1")
+
+
+if __name__ == "__main__":
+    unittest.main()
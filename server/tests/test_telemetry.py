@@ -0,0 +1,47 @@
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+from telemetry import TelemetryBuffer
+
+
+class TestTelemetryBuffer(unittest.TestCase):
+
+    def test_latest_returns_last_sample(self):
+        buffer = TelemetryBuffer(["a", "b"], capacity=4)
+        self.assertIsNone(buffer.latest())
+        buffer.append([1, 2], ts=0.0)
+        buffer.append([3, np.nan], ts=0.1)
+        self.assertEqual(buffer.latest("a"), 3)
+        self.assertIsNone(buffer.latest("b"))
+
+    def test_oldest_samples_are_overwritten(self):
+        buffer = TelemetryBuffer(["a"], capacity=3)
+        for i in range(5):
+            buffer.append([i], ts=float(i))
+        timestamps, samples = buffer.window()
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(timestamps.tolist(), [2.0, 3.0, 4.0])
+        self.assertEqual(samples[:, 0].tolist(), [2.0, 3.0, 4.0])
+
+    def test_mean_over_window(self):
+        buffer = TelemetryBuffer(["a"], capacity=10)
+        for i in range(10):
+            buffer.append([i], ts=i * 0.02)
+        # Last 50 ms: samples 7, 8 & 9
+        self.assertAlmostEqual(buffer.mean("a", 0.05), 8.0)
+
+    def test_serialize_decimates(self):
+        buffer = TelemetryBuffer(["a"], capacity=10)
+        for i in range(6):
+            buffer.append([i], ts=float(i))
+        data = buffer.serialize(step=2)
+        self.assertEqual(data["ts"], [0.0, 2.0, 4.0])
+        self.assertEqual(data["a"], [0.0, 2.0, 4.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
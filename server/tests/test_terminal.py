@@ -0,0 +1,77 @@
+import sys
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+from lcd import rgb565
+from terminal import Terminal
+
+
+class FakeLCD(object):
+    width = 240
+    height = 320
+
+    def __init__(self):
+        self.frames = []
+
+    def ShowBuffer(self, buffer):
+        self.frames.append(buffer)
+
+
+class TestTerminal(unittest.TestCase):
+
+    def setUp(self):
+        self.lcd = FakeLCD()
+        self.terminal = Terminal("Courier", self.lcd)
+        self.terminal.header("PiRobot v1.0")
+
+    def test_new_line_only_changes_its_row(self):
+        self.terminal.text("Starting...")
+        self.terminal.text("Motor setup... OK")
+        regions = rgb565.dirty_regions(self.lcd.frames[-2], self.lcd.frames[-1])
+        self.assertEqual(len(regions), 1)
+        x_start, y_start, x_end, y_end = regions[0]
+        self.assertLessEqual(y_end - y_start, self.terminal._line_h)
+
+    def test_unchanged_rows_are_not_rendered(self):
+        self.terminal.text("Starting...")
+        with patch.object(self.terminal._glyphs, "render", wraps=self.terminal._glyphs.render) as render:
+            self.terminal.text("Ready!")
+        self.assertEqual(render.call_count, 1)
+
+    def test_scrolling(self):
+        for i in range(self.terminal._nb_line + 3):
+            self.terminal.text(f"line {i}")
+        self.assertEqual(self.terminal._buffer[-1], f"line {self.terminal._nb_line + 2}")
+        self.assertEqual(len(self.terminal._buffer), self.terminal._nb_line)
+
+    def test_long_lines_are_wrapped(self):
+        self.terminal.text("x" * 40)
+        self.assertEqual([len(line) for line in self.terminal._buffer],
+                         [self.terminal._columns] * (40 // self.terminal._columns) + [40 % self.terminal._columns])
+
+    def test_frame_matches_font_rendering(self):
+        self.terminal.text("Hi!")
+        frame = self.lcd.frames[-1][::-1, ::-1]
+        row = self.terminal._glyphs.cells[ord("H") - 32]
+        y = Terminal.MARGIN + self.terminal._line_h
+        np.testing.assert_array_equal(frame[y:y + row.shape[0], Terminal.MARGIN:Terminal.MARGIN + row.shape[1]], row)
+
+
+class TestDirtyRegions(unittest.TestCase):
+
+    def test_regions(self):
+        previous = np.zeros((240, 320), dtype=rgb565.RGB565)
+        current = previous.copy()
+        self.assertEqual(rgb565.dirty_regions(previous, current), [])
+        current[10:20, 30:40] = 1
+        current[12, 100] = 1
+        current[200, 5] = 1
+        self.assertEqual(rgb565.dirty_regions(previous, current), [(30, 10, 101, 20), (5, 200, 6, 201)])
+
+
+if __name__ == "__main__":
+    unittest.main()
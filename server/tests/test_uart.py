@@ -0,0 +1,261 @@
+import asyncio
+import os
+import sys
+import threading
+import unittest
+from collections import deque
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, "/Users/imarchand/git/pirobot/server")
+
+from servo.servo_handler import ServoHandler
+from uart import LineReader, MessageOriginator, MessagePriority, MessageType, SerialTransport, UART
+
+
+class TestLineReader(unittest.TestCase):
+
+    def test_complete_lines_are_returned(self):
+        reader = LineReader()
+        self.assertEqual(reader.feed(b"K:OK\nB:S:12.4\n"), ["K:OK", "B:S:12.4"])
+        self.assertEqual(len(reader), 0)
+
+    def test_partial_line_is_kept_until_terminated(self):
+        reader = LineReader()
+        self.assertEqual(reader.feed(b"M:S:1:"), [])
+        self.assertEqual(reader.feed(b"2\nK:"), ["M:S:1:2"])
+        self.assertEqual(reader.feed(b"OK\n"), ["K:OK"])
+
+    def test_binary_mode_returns_bytes(self):
+        reader = LineReader(encoding=None)
+        self.assertEqual(reader.feed(b"\x01\x02\n"), [b"\x01\x02"])
+
+    def test_unterminated_garbage_is_dropped(self):
+        reader = LineReader()
+        reader.feed(b"x" * (LineReader.MAX_LINE_LENGTH + 1))
+        self.assertEqual(len(reader), 0)
+        self.assertEqual(reader.feed(b"K:OK\n"), ["K:OK"])
+
+
+class _PipeSerial(object):
+    """Stands in for a pyserial port, bytes written end up in a pipe"""
+    baudrate = 115200
+    out_waiting = 0
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+
+    def fileno(self):
+        return self.write_fd
+
+    def written(self):
+        try:
+            return os.read(self.read_fd, 65536)
+        except BlockingIOError:
+            return b""
+
+    def close(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+class TestSerialTransport(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.serial = _PipeSerial()
+        self.protocol = MagicMock()
+        self.transport = SerialTransport(asyncio.get_running_loop(), self.serial, self.protocol)
+        # Writing to a pipe never makes the write end readable, drop the reader
+        asyncio.get_running_loop().remove_reader(self.serial.fileno())
+        await asyncio.sleep(0)
+
+    async def asyncTearDown(self):
+        self.transport.abort()
+
+    async def test_writes_are_coalesced(self):
+        self.transport.write(b"M:M:F:50\n")
+        self.transport.write(b"S:M:1:20\n")
+        self.assertEqual(self.serial.written(), b"")
+        await asyncio.sleep(0)
+        self.assertEqual(self.serial.written(), b"M:M:F:50\nS:M:1:20\n")
+        self.assertEqual(self.transport.get_write_buffer_size(), 0)
+
+    async def test_urgent_messages_jump_ahead(self):
+        self.transport.write(b"B:S\n", priority=MessagePriority.low)
+        self.transport.write(b"M:M:F:50\n")
+        self.transport.write(b"M:S\n", priority=MessagePriority.urgent)
+        await asyncio.sleep(0)
+        self.assertEqual(self.serial.written(), b"M:S\nM:M:F:50\nB:S\n")
+
+    async def test_urgent_stop_drops_queued_commands_for_same_target(self):
+        # Kernel queue full, the move waits in the transport queue
+        self.serial.out_waiting = SerialTransport.MAX_IN_FLIGHT + 10
+        self.transport.write(b"M:M:F:50:F:50:1\n", key=("motor",))
+        self.transport.write(b"S:M:1:20\n", key=("servo", 1))
+        await asyncio.sleep(0)
+        self.assertEqual(self.serial.written(), b"")
+        self.transport.write(b"M:S\n", priority=MessagePriority.urgent, key=("motor",))
+        self.serial.out_waiting = 0
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.serial.written(), b"M:S\nS:M:1:20\n")
+        self.assertEqual(self.transport.get_write_buffer_size(), 0)
+
+    async def test_protocol_is_paused_above_high_water_mark(self):
+        self.transport.set_write_buffer_limits(high=16, low=4)
+        self.transport.write(b"x" * 20)
+        self.protocol.pause_writing.assert_called_once()
+        await asyncio.sleep(0)
+        self.protocol.resume_writing.assert_called_once()
+
+
+class TestCommandCoalescing(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        # Bypass the serial port opening done in __init__
+        self.uart = UART.__new__(UART)
+        self.uart.loop = asyncio.get_running_loop()
+        self.uart.thread_id = threading.get_ident()
+        self.uart.transport = MagicMock()
+        self.uart.write_paused = False
+        self.uart.coalesced_commands = {}
+        self.uart.coalesce_handles = {}
+        self.uart.last_sent_ts = {}
+
+    def sent(self):
+        return [c.args[0].decode().strip() for c in self.uart.transport.write.call_args_list]
+
+    async def test_latest_command_wins(self):
+        for position in range(10):
+            self.uart._write(f"S:M:3:{position}", MessagePriority.normal, ("servo", 3))
+        self.uart._write("S:M:4:50", MessagePriority.normal, ("servo", 4))
+        # First command of each key is sent right away, the others are held
+        self.assertEqual(self.sent(), ["S:M:3:0", "S:M:4:50"])
+        await asyncio.sleep(UART.COALESCE_WINDOW * 1.5)
+        self.assertEqual(self.sent(), ["S:M:3:0", "S:M:4:50", "S:M:3:9"])
+
+    async def test_urgent_command_discards_pending_commands(self):
+        self.uart._write("M:M:F:50", MessagePriority.normal, ("motor",))
+        self.uart._write("M:M:F:60", MessagePriority.normal, ("motor",))
+        self.uart._write("M:S", MessagePriority.urgent, ("motor",))
+        await asyncio.sleep(UART.COALESCE_WINDOW * 1.5)
+        self.assertEqual(self.sent(), ["M:M:F:50", "M:S"])
+
+    async def test_urgent_command_key_is_given_to_transport(self):
+        self.uart._write("S:SS:3", MessagePriority.urgent, ("servo", 3))
+        self.uart.transport.write.assert_called_once_with(b"S:SS:3\n", MessagePriority.urgent, ("servo", 3))
+
+    async def test_servo_stop_discards_pending_trajectory(self):
+        self.uart._write("S:T:2,3:0:10,10:500:20,20", MessagePriority.normal, ("servo", "trajectory"))
+        self.uart._write("S:T:2,3:0:20,20:500:30,30", MessagePriority.normal, ("servo", "trajectory"))
+        with patch.object(UART, "uart_handler", self.uart):
+            ServoHandler.stop_servo(2)
+        await asyncio.sleep(UART.COALESCE_WINDOW * 1.5)
+        self.assertEqual(self.sent(), ["S:T:2,3:0:10,10:500:20,20", "S:SS:2"])
+        self.uart.transport.discard.assert_called_with(("servo", "trajectory"))
+
+    async def test_stop_all_servos_discards_every_servo(self):
+        for servo_id in (3, 4):
+            self.uart._write(f"S:M:{servo_id}:10", MessagePriority.normal, ("servo", servo_id))
+            self.uart._write(f"S:M:{servo_id}:20", MessagePriority.normal, ("servo", servo_id))
+        self.uart._write("S:T:3,4:0:10,10:500:20,20", MessagePriority.normal, ("servo", "trajectory"))
+        self.uart._write("S:T:3,4:0:20,20:500:30,30", MessagePriority.normal, ("servo", "trajectory"))
+        self.uart._write("S:S", MessagePriority.urgent, ("servo",))
+        self.assertEqual(self.uart.coalesced_commands, {})
+
+
+class TestDispatch(unittest.TestCase):
+
+    def setUp(self):
+        self.consumers = UART.consumers
+        UART.consumers = {}
+        self.uart = UART.__new__(UART)
+
+    def tearDown(self):
+        UART.consumers = self.consumers
+        UART.build_dispatch_index()
+
+    def test_message_is_decoded_once_for_matching_consumers(self):
+        motor, servo, any_status = MagicMock(), MagicMock(), MagicMock()
+        UART.register_consumer("motor", motor, MessageOriginator.motor, MessageType.status)
+        UART.register_consumer("servo", servo, MessageOriginator.servo, MessageType.status)
+        UART.register_consumer("any", any_status, None, MessageType.status)
+
+        self.uart.dispatch_uart_message("M:S:10:20:-10:-20:1.5:2.5:0.25:null:0.8:null:True:False")
+
+        servo.receive_uart_message.assert_not_called()
+        message, originator, message_type = motor.receive_uart_message.call_args.args
+        self.assertEqual(message, [10, 20, -10, -20, 1.5, 2.5, 0.25, None, 0.8, None, True])
+        self.assertEqual((originator, message_type), ("M", "S"))
+        self.assertIs(any_status.receive_uart_message.call_args.args[0], message)
+
+    def test_servo_status_is_decoded_per_servo(self):
+        servo = MagicMock()
+        UART.register_consumer("servo", servo, MessageOriginator.servo, MessageType.status)
+        self.uart.dispatch_uart_message("S:S:1:Y:75.0:2:N:null")
+        self.assertEqual(servo.receive_uart_message.call_args.args[0], [(1, True, 75.0), (2, False, None)])
+
+    def test_unregistered_consumer_is_removed_from_index(self):
+        battery = MagicMock()
+        UART.register_consumer("battery", battery, MessageOriginator.battery, MessageType.status)
+        UART.unregister_consumer("battery")
+        self.uart.dispatch_uart_message("B:S:12.4")
+        battery.receive_uart_message.assert_not_called()
+
+
+class TestRequest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.uart = UART.__new__(UART)
+        self.uart.loop = asyncio.get_running_loop()
+        self.uart.transport = MagicMock()
+        self.uart.write_paused = False
+        self.uart.pending_requests = {}
+        self.uart.next_sequence_number = 0
+        self.uart.round_trip_times = deque(maxlen=10)
+        self.sent = []
+
+    def reply_with(self, build_reply):
+        def write(data, priority, key=None):
+            message = data.decode().strip()
+            self.sent.append(message)
+            reply = build_reply(message)
+            if reply is not None:
+                self.uart.loop.call_soon(self.uart.dispatch_uart_message, reply)
+        self.uart.transport.write.side_effect = write
+
+    async def test_acknowledged_request(self):
+        self.reply_with(lambda m: f"A:{m.split(':')[1]}:OK")
+        success, data, round_trip_time = await self.uart._request("M:C:660", MessagePriority.normal, 0.1, 0)
+        self.assertEqual(self.sent, ["Q:0:M:C:660"])
+        self.assertTrue(success)
+        self.assertEqual(data, "OK")
+        self.assertGreaterEqual(round_trip_time, 0)
+        self.assertEqual(self.uart.pending_requests, {})
+
+    async def test_rejected_request(self):
+        self.reply_with(lambda m: f"N:{m.split(':')[1]}:[Motor] Unable to decode arguments")
+        success, data, _ = await self.uart._request("M:C:abc", MessagePriority.normal, 0.1, 0)
+        self.assertFalse(success)
+        self.assertEqual(data, "[Motor] Unable to decode arguments")
+
+    async def test_request_is_retried_on_timeout(self):
+        # First attempt is lost, the retry is acknowledged
+        attempts = []
+
+        def reply(message):
+            attempts.append(message)
+            return None if len(attempts) == 1 else f"A:{message.split(':')[1]}:OK"
+        self.reply_with(reply)
+        success, _, _ = await self.uart._request("M:S", MessagePriority.urgent, 0.05, 1)
+        self.assertTrue(success)
+        # Same sequence number, so the Pico can tell a retry from a new command
+        self.assertEqual(self.sent, ["Q:0:M:S", "Q:0:M:S"])
+        self.assertEqual(self.uart.next_sequence_number, 1)
+
+    async def test_request_times_out(self):
+        self.reply_with(lambda m: None)
+        self.assertEqual(await self.uart._request("M:S", MessagePriority.normal, 0.01, 1), (False, "Timeout", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
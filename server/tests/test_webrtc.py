@@ -216,6 +216,49 @@ class TestBrowserVideoReceiver(unittest.IsolatedAsyncioTestCase):
             receiver.stop()
             self.assertIsNone(receiver._task)
 
+    async def test_frames_are_sent_to_lcd_as_rgb565(self):
+        import av
+        from webrtc import BrowserVideoReceiver
+        frame = av.VideoFrame.from_ndarray(np.full((480, 640, 3), 255, dtype=np.uint8), format="rgb24")
+        frames = [frame]
+
+        async def recv_impl():
+            if frames:
+                return frames.pop()
+            await asyncio.sleep(10)
+
+        mock_track = MagicMock()
+        mock_track.recv = recv_impl
+        mock_lcd = MagicMock()
+        mock_lcd.server.lcd.height = 320
+        mock_lcd.server.lcd.width = 240
+
+        with patch('webrtc.BaseHandler') as mock_bh:
+            mock_bh.get_handler.return_value = mock_lcd
+            receiver = BrowserVideoReceiver()
+            receiver.start(mock_track)
+            await asyncio.sleep(0.05)
+            receiver.stop()
+            await asyncio.sleep(0)
+
+        buffer = mock_lcd.display_buffer.call_args[0][0]
+        self.assertEqual(buffer.shape, (240, 320))
+        self.assertEqual(buffer.dtype, np.dtype(">u2"))
+        self.assertTrue((buffer == 0xFFFF).all())
+
+
+class TestFrameToLcdBuffer(unittest.TestCase):
+
+    def test_buffer_is_rotated(self):
+        import av
+        from webrtc import _frame_to_lcd_buffer
+        image = np.zeros((480, 640, 3), dtype=np.uint8)
+        image[:240, :320] = (255, 0, 0)  # Red top left quarter
+        buffer = _frame_to_lcd_buffer(av.VideoFrame.from_ndarray(image, format="rgb24"), 320, 240)
+        self.assertTrue(buffer.flags["C_CONTIGUOUS"])
+        self.assertEqual(buffer[-1, -1], 0xF800)
+        self.assertEqual(buffer[0, 0], 0)
+
 
 class TestWebRTCSessionManagerTalkingMode(unittest.IsolatedAsyncioTestCase):
 
@@ -1,6 +1,9 @@
+from collections import deque
 from enum import Enum
 import asyncio
 import logging
+import os
+import random
 import serial
 import threading
 
@@ -20,8 +23,289 @@ class MessageType(Enum):
     status = "S"
 
 
-class UART(object):
+class MessagePriority(Enum):
+    urgent = 0  # Stop commands, jump ahead of everything else
+    normal = 1
+    low = 2  # Status & telemetry requests, dropped when the link is saturated
+
+
+def _optional_float(value):
+    return None if value == "null" else float(value)
+
+
+def _bool(value):
+    return value.lower() in ("y", "true")
+
+
+def decode_motor_status(fields):
+    return [
+        int(fields[0]),  # left duty
+        int(fields[1]),  # left speed (rpm)
+        int(fields[2]),  # right duty
+        int(fields[3]),  # right speed (rpm)
+        float(fields[4]),  # nb of revolutions
+        float(fields[5]),  # absolute nb of revolutions
+        float(fields[6]),  # differential nb of revolutions
+        _optional_float(fields[7]),  # left ultrasonic distance
+        _optional_float(fields[8]),  # front ultrasonic distance
+        _optional_float(fields[9]),  # right ultrasonic distance
+        _bool(fields[10]),  # controller initialized
+    ]
+
+
+def decode_servo_status(fields):
+    # List of (servo id, initialized, position in percent)
+    return [
+        (int(fields[i]), _bool(fields[i + 1]), _optional_float(fields[i + 2]))
+        for i in range(0, len(fields) - 2, 3)
+    ]
+
+
+def decode_battery_status(fields):
+    return [float(fields[0])]
+
+
+MESSAGE_DECODERS = {
+    (MessageOriginator.motor, MessageType.status): decode_motor_status,
+    (MessageOriginator.servo, MessageType.status): decode_servo_status,
+    (MessageOriginator.battery, MessageType.status): decode_battery_status,
+}
+
+
+class LineReader(object):
+    """Splits the UART byte stream into lines.
+
+    The complete lines of a chunk are decoded and split in one go, only the
+    unterminated tail is kept in a bytearray until the next chunk.
+    """
+    MAX_LINE_LENGTH = 4096  # Drop garbage that never gets terminated
+
+    def __init__(self, encoding="ascii"):
+        self.encoding = encoding
+        self.buffer = bytearray()
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def _split(self, data):
+        if self.encoding is None:
+            return bytes(data).split(b"\n")
+        return data.decode(self.encoding, "replace").split("\n")
+
+    def feed(self, data):
+        buffer = self.buffer
+        end = data.rfind(b"\n")
+        if end < 0:
+            buffer += data
+            lines = []
+        else:
+            if len(buffer) > 0:
+                # Line started in a previous chunk
+                buffer += data[:end]
+                lines = self._split(buffer)
+                buffer.clear()
+            else:
+                lines = self._split(data[:end])
+            buffer += data[end + 1:]
+        if len(buffer) > LineReader.MAX_LINE_LENGTH:
+            logger.warning(f"Dropping {len(buffer)} bytes of unterminated serial data")
+            buffer.clear()
+        return lines
+
+
+class SerialTransport(asyncio.Transport):
+    """Non-blocking asyncio transport over an open pyserial port.
+
+    Outgoing messages are queued as bytes chunks, one deque per priority, and
+    coalesced into a single write per loop iteration. Only a few bytes are
+    handed to the kernel at a time so an urgent message never waits behind a
+    long kernel queue, the next write being scheduled from the baudrate.
+
+    An urgent message jumping ahead must not be followed by an older command
+    for the same target, so it drops the queued chunks whose key starts with
+    its own key.
+    """
+    READ_SIZE = 1024
+    MAX_WRITE_SIZE = 256  # Bytes coalesced into a single write
+    MAX_IN_FLIGHT = 64  # Bytes allowed in the kernel output queue
+    HIGH_WATER_MARK = 4096
+    LOW_WATER_MARK = 1024
+
+    def __init__(self, loop, serial_port, protocol):
+        super().__init__()
+        self._loop = loop
+        self._serial = serial_port
+        self._fd = serial_port.fileno()
+        self._protocol = protocol
+        self._queues = {priority: deque() for priority in MessagePriority}
+        self._buffer_size = 0
+        self._pending = memoryview(b"")
+        self._flush_handle = None
+        self._protocol_paused = False
+        self._closing = False
+        self._high_water = SerialTransport.HIGH_WATER_MARK
+        self._low_water = SerialTransport.LOW_WATER_MARK
+        self._loop.add_reader(self._fd, self._read_ready)
+        self._loop.call_soon(self._protocol.connection_made, self)
+
+    def get_protocol(self):
+        return self._protocol
+
+    def is_closing(self):
+        return self._closing
+
+    def get_write_buffer_size(self):
+        return self._buffer_size
+
+    def get_write_buffer_limits(self):
+        return self._low_water, self._high_water
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        self._high_water = SerialTransport.HIGH_WATER_MARK if high is None else high
+        self._low_water = self._high_water // 4 if low is None else low
+        self._maybe_pause_protocol()
+
+    def write(self, data, priority=MessagePriority.normal, key=None):
+        if self._closing or len(data) == 0:
+            return
+        if priority == MessagePriority.urgent and key is not None:
+            self.discard(key)
+        self._queues[priority].append((bytes(data), key))
+        self._buffer_size += len(data)
+        self._schedule_flush()
+        self._maybe_pause_protocol()
+
+    def discard(self, key):
+        """Drop the queued (non urgent) chunks whose key starts with `key`"""
+        for priority, queue in self._queues.items():
+            if priority == MessagePriority.urgent:
+                continue
+            kept = deque()
+            for chunk, chunk_key in queue:
+                if chunk_key is not None and chunk_key[:len(key)] == key:
+                    self._buffer_size -= len(chunk)
+                else:
+                    kept.append((chunk, chunk_key))
+            self._queues[priority] = kept
+        self._maybe_resume_protocol()
+
+    def close(self):
+        if not self._closing:
+            self._closing = True
+            self._loop.remove_reader(self._fd)
+            if self._buffer_size == 0:
+                self._loop.call_soon(self._call_connection_lost, None)
+
+    def abort(self):
+        self._closing = True
+        self._loop.remove_reader(self._fd)
+        self._call_connection_lost(None)
+
+    def _schedule_flush(self, delay=0):
+        if self._flush_handle is None:
+            if delay > 0:
+                self._flush_handle = self._loop.call_later(delay, self._write_ready)
+            else:
+                self._flush_handle = self._loop.call_soon(self._write_ready)
+
+    def _out_waiting(self):
+        try:
+            return self._serial.out_waiting
+        except Exception:
+            return 0
+
+    def _coalesce(self):
+        chunks = []
+        size = 0
+        for queue in self._queues.values():
+            while len(queue) > 0 and (size == 0 or size + len(queue[0][0]) <= SerialTransport.MAX_WRITE_SIZE):
+                chunk, _ = queue.popleft()
+                chunks.append(chunk)
+                size += len(chunk)
+        return b"".join(chunks)
+
+    def _write_ready(self):
+        self._flush_handle = None
+        if self._serial is None:
+            return
+        in_flight = self._out_waiting()
+        if in_flight > SerialTransport.MAX_IN_FLIGHT:
+            # Wait for the kernel queue to drain (10 bits per byte on the wire)
+            self._schedule_flush((in_flight - SerialTransport.MAX_IN_FLIGHT) * 10 / self._serial.baudrate)
+            return
+        if len(self._pending) == 0:
+            self._pending = memoryview(self._coalesce())
+            if len(self._pending) == 0:
+                return
+        try:
+            n = os.write(self._fd, self._pending)
+        except (BlockingIOError, InterruptedError):
+            n = 0
+        except OSError as exc:
+            self._fatal_error(exc)
+            return
+        self._pending = self._pending[n:]
+        self._buffer_size -= n
+        self._maybe_resume_protocol()
+        if self._buffer_size > 0:
+            self._schedule_flush(len(self._pending) * 10 / self._serial.baudrate)
+        elif self._closing:
+            self._call_connection_lost(None)
+
+    def _read_ready(self):
+        try:
+            data = os.read(self._fd, SerialTransport.READ_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as exc:
+            self._fatal_error(exc)
+            return
+        if len(data) == 0:
+            self._fatal_error(ConnectionResetError("Serial port closed"))
+        else:
+            self._protocol.data_received(data)
+
+    def _fatal_error(self, exc):
+        logger.error("Fatal error on serial transport", exc_info=exc)
+        self._closing = True
+        self._loop.remove_reader(self._fd)
+        self._call_connection_lost(exc)
+
+    def _call_connection_lost(self, exc):
+        if self._serial is None:
+            return
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for queue in self._queues.values():
+            queue.clear()
+        self._buffer_size = 0
+        self._pending = memoryview(b"")
+        try:
+            self._serial.close()
+        finally:
+            self._serial = None
+            self._protocol.connection_lost(exc)
+
+    def _maybe_pause_protocol(self):
+        if not self._protocol_paused and self._buffer_size > self._high_water:
+            self._protocol_paused = True
+            self._protocol.pause_writing()
+
+    def _maybe_resume_protocol(self):
+        if self._protocol_paused and self._buffer_size <= self._low_water:
+            self._protocol_paused = False
+            self._protocol.resume_writing()
+
+
+class UART(asyncio.Protocol):
+    COALESCE_WINDOW = 0.02  # Minimum interval between two commands with the same key, in seconds
+    REQUEST_TIMEOUT = 0.5  # Seconds to wait for the Pico acknowledgement
+    REQUEST_RETRIES = 2
+    MAX_SEQUENCE_NUMBER = 10000
+
     consumers = {}
+    dispatch_index = {}
     uart_handler = None
     refresh_interval = 1
 
@@ -33,20 +317,28 @@ class UART(object):
             self.message_type = message_type
 
     def __init__(self, port, baudrate):
-        self.read_buffer = ""
-        self.write_buffer = ""
+        self.read_buffer = LineReader()
         self.port = port
         self.baudrate = baudrate
-        self.write_buffer_lock = threading.Lock()
-        self.has_writer = threading.Event()
         self.loop = asyncio.get_event_loop()
+        self.thread_id = threading.get_ident()
         self.serial = None
+        self.transport = None
+        self.write_paused = False
+        self.drain_waiters = []
+        self.coalesced_commands = {}
+        self.coalesce_handles = {}
+        self.last_sent_ts = {}
+        self.pending_requests = {}
+        # Random start, so requests sent after a restart are not mistaken for duplicates by the Pico
+        self.next_sequence_number = random.randrange(UART.MAX_SEQUENCE_NUMBER)
+        self.round_trip_times = deque(maxlen=100)
         self.connect()
         if Config.get("auto_uart_reconnect"):
             self.loop.call_soon(self.monitor_connection)
 
     def monitor_connection(self):
-        if self.serial is None or not self.serial.is_open:
+        if self.transport is None or self.transport.is_closing():
             logger.info("Connection lost, reconnecting...")
             self.connect()
         self.loop.call_later(UART.refresh_interval, self.monitor_connection)
@@ -60,6 +352,7 @@ class UART(object):
                     parity=serial.PARITY_NONE,
                     stopbits=serial.STOPBITS_ONE,
                     timeout=0,
+                    write_timeout=0,
             )
         except:
             logger.error("Unable to open serial port", exc_info=True)
@@ -67,86 +360,165 @@ class UART(object):
                 self.serial.close()
                 self.serial = None
         else:
-            self.loop.add_reader(self.serial.fileno(), self.data_received)
+            self.transport = SerialTransport(self.loop, self.serial, self)
 
-    def data_received(self):
-        try:
-            if not self.serial.is_open:
-                self.loop.remove_reader(self.serial.fileno())
-            else:
-                self.read_buffer += self.serial.read(1024).decode()
-                while len(self.read_buffer) > 0:
-                    i = self.read_buffer.find("\n")
-                    if i >= 0:
-                        line = self.read_buffer[:i + 1]
-                        self.read_buffer = self.read_buffer[i + 1:]
-                        message = line[:-1]
-                        self.dispatch_uart_message(message)
-                        RobotLogger.log_message("UART", "R", message)
-                    elif self.serial.in_waiting == 0:
-                        break
-                    else:
-                        self.read_buffer += self.serial.read(1024).decode()
-        except:
-            logger.error("Unable to read data sent on serial port", exc_info=True)
-            self.loop.remove_reader(self.serial.fileno())
-            self.serial.close()
-
-    def write_data(self):
-        self.write_buffer_lock.acquire()
-        self.has_writer.set()
-        data = self.write_buffer
-        self.write_buffer = ""
-        self.write_buffer_lock.release()
-
-        # Write data to serial port
-        bytes_writen = self.serial.write(data.encode())
-
-        # All data writen?
-        if bytes_writen < len(data):
-            data = data[:bytes_writen]
+    def connection_made(self, transport):
+        logger.info(f"Serial port {self.port} opened at {self.baudrate} bauds")
+
+    def connection_lost(self, exc):
+        self.serial = None
+        self.transport = None
+        self.read_buffer = LineReader()
+        self.resume_writing()
+        for future in self.pending_requests.values():
+            if not future.done():
+                future.set_result((False, "Connection lost"))
+        self.pending_requests = {}
+
+    def pause_writing(self):
+        logger.warning("Serial link saturated, dropping low priority messages")
+        self.write_paused = True
+
+    def resume_writing(self):
+        self.write_paused = False
+        for waiter in self.drain_waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self.drain_waiters = []
+
+    def data_received(self, data):
+        for message in self.read_buffer.feed(data):
+            try:
+                self.dispatch_uart_message(message)
+            except:
+                logger.error(f"Unable to process serial message {message!r}", exc_info=True)
+            RobotLogger.log_message("UART", "R", message)
+
+    def _send(self, data, priority, key=None):
+        if self.transport is not None:
+            if self.write_paused and priority == MessagePriority.low:
+                return
+            self.transport.write(f"{data}\n".encode(), priority, key)
+            RobotLogger.log_message("UART", "S", data)
+
+    def _write(self, data, priority, key):
+        if threading.get_ident() != self.thread_id:
+            self.loop.call_soon_threadsafe(self._write, data, priority, key)
+        elif key is None:
+            self._send(data, priority)
+        elif priority == MessagePriority.urgent:
+            # Urgent commands (i.e. stop) supersede any pending command for the same target,
+            # held here or already queued in the transport
+            self._discard_coalesced(key)
+            self._send(data, priority, key)
+        else:
+            self._write_coalesced(data, priority, key)
+
+    def _write_coalesced(self, data, priority, key):
+        now = self.loop.time()
+        if key in self.coalesced_commands:
+            # Latest wins
+            self.coalesced_commands[key] = (data, priority)
+        elif now - self.last_sent_ts.get(key, -UART.COALESCE_WINDOW) >= UART.COALESCE_WINDOW:
+            self.last_sent_ts[key] = now
+            self._send(data, priority, key)
         else:
-            data = ""
+            self.coalesced_commands[key] = (data, priority)
+            self.coalesce_handles[key] = self.loop.call_at(
+                self.last_sent_ts[key] + UART.COALESCE_WINDOW, self._flush_coalesced, key
+            )
 
-        self.write_buffer_lock.acquire()
-        self.write_buffer = data + self.write_buffer
-        # Any data left to write?
-        if len(self.write_buffer) == 0:
-            self.loop.remove_writer(self.serial.fileno())
-            self.has_writer.clear()
-        self.write_buffer_lock.release()
+    def _flush_coalesced(self, key):
+        self.coalesce_handles.pop(key, None)
+        command = self.coalesced_commands.pop(key, None)
+        if command is not None:
+            self.last_sent_ts[key] = self.loop.time()
+            self._send(*command, key)
 
-    def _write(self, data):
-        self.write_buffer_lock.acquire()
-        self.write_buffer += data
+    def _discard(self, key):
+        if threading.get_ident() != self.thread_id:
+            self.loop.call_soon_threadsafe(self._discard, key)
+            return
+        self._discard_coalesced(key)
+        if self.transport is not None:
+            self.transport.discard(key)
 
-        if not self.has_writer.is_set():
-            self.loop.add_writer(self.serial.fileno(), self.write_data)
-        self.write_buffer_lock.release()
+    def _discard_coalesced(self, key):
+        for pending_key in [k for k in self.coalesced_commands if k[:len(key)] == key]:
+            del self.coalesced_commands[pending_key]
+            self.coalesce_handles.pop(pending_key).cancel()
 
     def dispatch_uart_message(self, message):
         message_parts = message.split(':')
         originator = message_parts[0]
-        message_type = message_parts[1]
         # Received keepalive message?
         if originator == "K":
             UART.write("K:OK")
-        for consumer_config in UART.consumers.values():
-            if consumer_config.originator is not None and consumer_config.originator.value != originator:
-                continue
-            if consumer_config.message_type is not None and consumer_config.message_type.value != message_type:
+            return
+        # Acknowledgement of a request?
+        if originator in ("A", "N"):
+            self.receive_response(int(message_parts[1]), originator == "A", ":".join(message_parts[2:]))
+            return
+        entry = UART.dispatch_index.get((originator, message_parts[1]))
+        if entry is not None:
+            decoder, consumers = entry
+            decoded_message = decoder(message_parts[2:])
+            for consumer in consumers:
+                consumer.receive_uart_message(decoded_message, originator, message_parts[1])
+
+    def receive_response(self, sequence_number, success, data):
+        future = self.pending_requests.pop(sequence_number, None)
+        if future is not None and not future.done():
+            future.set_result((success, data))
+
+    async def _request(self, data, priority, timeout, retries):
+        # Retries keep the sequence number, the Pico acknowledges a duplicate again without running it
+        sequence_number = self.next_sequence_number
+        self.next_sequence_number = (sequence_number + 1) % UART.MAX_SEQUENCE_NUMBER
+        for attempt in range(retries + 1):
+            future = self.loop.create_future()
+            self.pending_requests[sequence_number] = future
+            t0 = self.loop.time()
+            self._send(f"Q:{sequence_number}:{data}", priority)
+            try:
+                success, response = await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"No acknowledgement for {data!r} (attempt {attempt + 1}/{retries + 1})")
                 continue
-            consumer_config.consumer.receive_uart_message(message_parts[2:], originator, message_type)
+            finally:
+                self.pending_requests.pop(sequence_number, None)
+            round_trip_time = self.loop.time() - t0
+            self.round_trip_times.append(round_trip_time)
+            return success, response, round_trip_time
+        return False, "Timeout", None
+
+    @staticmethod
+    def build_dispatch_index():
+        """Map each (originator, message type) to its decoder and consumers, so a line costs a single lookup"""
+        dispatch_index = {}
+        for originator in MessageOriginator:
+            for message_type in MessageType:
+                consumers = [
+                    consumer_config.consumer for consumer_config in UART.consumers.values()
+                    if consumer_config.originator in (None, originator)
+                    and consumer_config.message_type in (None, message_type)
+                ]
+                if len(consumers) > 0:
+                    decoder = MESSAGE_DECODERS.get((originator, message_type), list)
+                    dispatch_index[(originator.value, message_type.value)] = (decoder, consumers)
+        UART.dispatch_index = dispatch_index
 
     @staticmethod
     def register_consumer(name, consumer, originator=None, message_type=None):
         UART.consumers[name] = UART.ConsumerConfig(
             name=name, consumer=consumer, originator=originator, message_type=message_type
         )
+        UART.build_dispatch_index()
 
     @staticmethod
     def unregister_consumer(name):
         del UART.consumers[name]
+        UART.build_dispatch_index()
 
     @staticmethod
     def ready():
@@ -161,13 +533,54 @@ class UART(object):
                 logger.error("Unable to open serial port", exc_info=True)
 
     @staticmethod
-    def write(data):
+    def write(data, priority=MessagePriority.normal, key=None):
+        """Send a command to the Pico.
+
+        Commands sharing a key, a tuple identifying their target such as
+        ("servo", 3), are coalesced: at most one is sent per COALESCE_WINDOW,
+        the latest one winning. An urgent command discards the pending
+        commands whose key starts with its own key.
+        """
         try:
-            message = data + "\n"
-            if UART.uart_handler is not None and UART.uart_handler.serial is not None:
-                UART.uart_handler._write(data=message)
-                RobotLogger.log_message("UART", "S", data)
+            if UART.uart_handler is not None and UART.uart_handler.transport is not None:
+                UART.uart_handler._write(data=data, priority=priority, key=key)
             else:
                 logger.warning("Unable to send serial message, the port is not opened")
         except:
             logger.error("Unable to send serial message", exc_info=True)
+
+    @staticmethod
+    def discard(key):
+        """Drop the commands not sent yet whose key starts with `key`"""
+        if UART.uart_handler is not None:
+            UART.uart_handler._discard(key)
+
+    @staticmethod
+    async def request(data, priority=MessagePriority.normal, timeout=REQUEST_TIMEOUT, retries=REQUEST_RETRIES):
+        """Send a command wrapped as Q:<seq>:<command> and wait for the Pico to acknowledge it.
+
+        The Pico answers A:<seq>:<data> on success or N:<seq>:<error> on failure,
+        the command being re-sent with the same sequence number on timeout.
+        Returns (success, data, round trip time in seconds).
+        """
+        uart_handler = UART.uart_handler
+        if uart_handler is None or uart_handler.transport is None:
+            return False, "The port is not opened", None
+        return await uart_handler._request(data, priority, timeout, retries)
+
+    @staticmethod
+    def get_round_trip_time():
+        """Average round trip time of the last acknowledged requests, in seconds"""
+        if UART.uart_handler is None or len(UART.uart_handler.round_trip_times) == 0:
+            return None
+        round_trip_times = UART.uart_handler.round_trip_times
+        return sum(round_trip_times) / len(round_trip_times)
+
+    @staticmethod
+    async def drain():
+        """Wait until the write buffer is back under its low-water mark"""
+        uart_handler = UART.uart_handler
+        if uart_handler is not None and uart_handler.write_paused:
+            waiter = uart_handler.loop.create_future()
+            uart_handler.drain_waiters.append(waiter)
+            await waiter
@@ -0,0 +1,117 @@
+import cv2
+import numpy as np
+
+
+class CameraCalibration(object):
+    """Camera intrinsics and ground plane homography, fitted on frames of `resolution`.
+
+    The homography maps undistorted pixels (distorted ones when the
+    intrinsics are not calibrated) to floor coordinates: x to the right, y
+    forward, in m.
+    """
+
+    def __init__(self, resolution, homography, camera_matrix=None, dist_coeffs=None):
+        self.resolution = tuple(resolution)
+        self.homography = np.asarray(homography, dtype=np.float64)
+        self.camera_matrix = None if camera_matrix is None else np.asarray(camera_matrix, dtype=np.float64)
+        self.dist_coeffs = None if dist_coeffs is None else np.asarray(dist_coeffs, dtype=np.float64)
+
+    def serialize(self):
+        return {
+            "resolution": list(self.resolution),
+            "homography": self.homography.tolist(),
+            "camera_matrix": None if self.camera_matrix is None else self.camera_matrix.tolist(),
+            "dist_coeffs": None if self.dist_coeffs is None else self.dist_coeffs.reshape(-1).tolist(),
+        }
+
+    @staticmethod
+    def from_dict(data):
+        return CameraCalibration(
+            resolution=data["resolution"],
+            homography=data["homography"],
+            camera_matrix=data.get("camera_matrix"),
+            dist_coeffs=data.get("dist_coeffs"),
+        )
+
+
+class Calibrator(object):
+    """Fits the camera model from views of a checkerboard.
+
+    Views of the board held at various angles and positions give the
+    intrinsics (at least MIN_VIEWS), the board then lying flat on the floor,
+    centered in front of the robot, gives the ground homography.
+    """
+    MIN_VIEWS = 5
+    SUBPIX_CRITERIA = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+
+    def __init__(self, pattern_size=(9, 6), square_size=0.025):
+        self.pattern_size = pattern_size  # Inner corners (columns, rows)
+        self.square_size = square_size  # m
+        self.image_size = None
+        self.views = []
+        self.camera_matrix = None
+        self.dist_coeffs = None
+
+    def find_corners(self, gray):
+        """Inner corners as a (rows, columns, 2) array, the first row being the nearest one (bottom
+        of the frame) and columns going left to right, None if the board is not found"""
+        found, corners = cv2.findChessboardCorners(
+            gray, self.pattern_size, flags=cv2.CALIB_CB_ADAPTIVE_THRESH | cv2.CALIB_CB_NORMALIZE_IMAGE
+        )
+        if not found:
+            return None
+        corners = cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), self.SUBPIX_CRITERIA)
+        columns, rows = self.pattern_size
+        corners = corners.reshape(rows, columns, 2)
+        if corners[0, :, 1].mean() < corners[-1, :, 1].mean():
+            corners = corners[::-1]
+        if corners[:, 0, 0].mean() > corners[:, -1, 0].mean():
+            corners = corners[:, ::-1]
+        return np.ascontiguousarray(corners)
+
+    def _board_points(self):
+        columns, rows = self.pattern_size
+        points = np.zeros((rows, columns, 3), dtype=np.float32)
+        points[..., 0] = np.arange(columns)[np.newaxis, :] * self.square_size
+        points[..., 1] = np.arange(rows)[:, np.newaxis] * self.square_size
+        return points.reshape(-1, 3)
+
+    def add_view(self, gray):
+        """Keep a view of the board for the intrinsics, False if the board is not found"""
+        corners = self.find_corners(gray)
+        if corners is None:
+            return False
+        self.image_size = (gray.shape[1], gray.shape[0])
+        self.views.append(corners.reshape(-1, 1, 2))
+        return True
+
+    def calibrate_intrinsics(self):
+        """Solve the camera matrix and distortion from the views, returns the RMS reprojection error (px)"""
+        if len(self.views) < self.MIN_VIEWS:
+            raise ValueError(f"At least {self.MIN_VIEWS} views needed, got {len(self.views)}")
+        board_points = self._board_points()
+        rms, self.camera_matrix, self.dist_coeffs, _, _ = cv2.calibrateCamera(
+            [board_points] * len(self.views), self.views, self.image_size, None, None
+        )
+        return rms
+
+    def fit_ground(self, gray, distance, offset=0.0):
+        """Ground homography from the board lying on the floor, its nearest row of inner corners being
+        `distance` m ahead and its center `offset` m to the right. None if the board is not found"""
+        corners = self.find_corners(gray)
+        if corners is None:
+            return None
+        columns, rows = self.pattern_size
+        floor = np.zeros((rows, columns, 2), dtype=np.float32)
+        floor[..., 0] = offset + (np.arange(columns)[np.newaxis, :] - (columns - 1) / 2) * self.square_size
+        floor[..., 1] = distance + np.arange(rows)[:, np.newaxis] * self.square_size
+        pixels = corners.reshape(-1, 1, 2)
+        if self.camera_matrix is not None:
+            pixels = cv2.undistortPoints(pixels, self.camera_matrix, self.dist_coeffs, P=self.camera_matrix)
+        homography, _ = cv2.findHomography(pixels.reshape(-1, 2), floor.reshape(-1, 2))
+        return CameraCalibration(
+            resolution=(gray.shape[1], gray.shape[0]),
+            homography=homography,
+            camera_matrix=self.camera_matrix,
+            dist_coeffs=self.dist_coeffs,
+        )
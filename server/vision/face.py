@@ -0,0 +1,71 @@
+import logging
+import os
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../assets/Models"))
+if not os.path.isdir(MODELS_DIR):
+    MODELS_DIR = "/etc/pirobot/assets/Models"
+
+YUNET_MODEL = "face_detection_yunet_2023mar.onnx"
+
+
+class HaarFaceDetector(object):
+    """Haar cascades, faces with two eyes detected are preferred"""
+    name = "haar"
+
+    def __init__(self):
+        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+
+    def detect(self, image):
+        """Faces as (x, y, w, h, score), best first, in `image` (BGR) coordinates"""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        faces = []
+        for (x, y, w, h) in self.face_cascade.detectMultiScale(gray, 1.1, 4):
+            eyes = self.eye_cascade.detectMultiScale(gray[y:y + h, x:x + w])
+            # At least 2 eyes :-) Third one could be the mouth
+            faces.append((int(x), int(y), int(w), int(h), 1.0 if len(eyes) >= 2 else 0.5))
+        return sorted(faces, key=lambda face: face[4], reverse=True)
+
+
+class YuNetFaceDetector(object):
+    """OpenCV DNN face detector (YuNet), much faster and more robust than the Haar cascades on CPU"""
+    name = "yunet"
+    SCORE_THRESHOLD = 0.7
+
+    def __init__(self, model_path):
+        self.detector = cv2.FaceDetectorYN.create(model_path, "", (320, 240), self.SCORE_THRESHOLD)
+        self.input_size = None
+
+    def detect(self, image):
+        """Faces as (x, y, w, h, score), best first, in `image` (BGR) coordinates"""
+        h, w = image.shape[:2]
+        if self.input_size != (w, h):
+            self.detector.setInputSize((w, h))
+            self.input_size = (w, h)
+        _, faces = self.detector.detect(image)
+        if faces is None:
+            return []
+        return [
+            (int(x), int(y), int(fw), int(fh), float(score))
+            for x, y, fw, fh, score in sorted(faces[:, [0, 1, 2, 3, 14]].tolist(), key=lambda f: f[4], reverse=True)
+        ]
+
+
+def create_face_detector(backend):
+    """Detector for the given backend, falling back to the Haar cascades when YuNet isn't usable"""
+    if backend == "yunet":
+        model_path = os.path.join(MODELS_DIR, YUNET_MODEL)
+        if not os.path.isfile(model_path):
+            logger.warning(f"Face detection model not found {model_path}, using Haar cascades")
+        elif not hasattr(cv2, "FaceDetectorYN"):
+            logger.warning("OpenCV has no FaceDetectorYN (4.5.4+ required), using Haar cascades")
+        else:
+            try:
+                return YuNetFaceDetector(model_path)
+            except cv2.error:
+                logger.warning("Unable to load the YuNet face detector, using Haar cascades", exc_info=True)
+    return HaarFaceDetector()
@@ -0,0 +1,30 @@
+import cv2
+
+from vision.qr import QRScanner
+
+
+class FiducialDetector(object):
+    """ArUco markers and QR codes used as landmarks.
+
+    Markers are named `aruco:<id>` and `qr:<data>`, their corners being
+    given in full resolution pixels.
+    """
+    DETECTION_WIDTH = 640  # px
+
+    def __init__(self, dictionary="DICT_4X4_50"):
+        self.aruco = cv2.aruco.ArucoDetector(
+            cv2.aruco.getPredefinedDictionary(getattr(cv2.aruco, dictionary)), cv2.aruco.DetectorParameters()
+        )
+        self.dictionary = dictionary
+        self.qr_scanner = QRScanner()
+
+    def detect(self, gray, small, scale, qr_codes=True):
+        """Markers found as (name, corners), `small` being `gray` downscaled by `scale`"""
+        markers = []
+        corners, ids, _ = self.aruco.detectMarkers(small)
+        if ids is not None:
+            for marker_id, marker_corners in zip(ids.reshape(-1), corners):
+                markers.append((f"aruco:{marker_id}", marker_corners.reshape(4, 2) / scale))
+        if qr_codes:
+            markers += [(f"qr:{data}", points) for data, points in self.qr_scanner.scan(gray, small, scale)]
+        return markers
@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+
+
+class FloorProjection(object):
+    """Maps pixels of a frame to floor coordinates (x to the right, y forward, in m).
+
+    The ground plane model only depends on the pixel row: the distance and
+    the lateral scale (floor width covered by half of the frame) are computed
+    once per row, projecting points is then a table lookup and a multiply,
+    for whole arrays of points at once.
+    """
+
+    def __init__(self, width, height, distance, lateral_scale):
+        """`distance(y)` and `lateral_scale(distance)` being the vectorized model, y in % from the top"""
+        self.width = width
+        self.height = height
+        self.distance = distance(np.arange(height) * 100 / height)
+        self.lateral_scale = lateral_scale(self.distance)
+
+    def project(self, x, y):
+        """Floor coordinates of the pixels (x, y), scalars or arrays"""
+        rows = np.clip(np.rint(y).astype(np.intp), 0, self.height - 1)
+        return (np.asarray(x, dtype=np.float64) * 2 / self.width - 1) * self.lateral_scale[rows], self.distance[rows]
+
+
+class HomographyProjection(object):
+    """Maps pixels to floor coordinates with the calibrated ground plane homography.
+
+    The homography is rescaled once to the frame resolution, projecting
+    points is then a single matrix multiply, after undistorting them when the
+    lens distortion has been calibrated.
+    """
+
+    def __init__(self, calibration, width, height):
+        self.width = width
+        self.height = height
+        calibration_width, calibration_height = calibration.resolution
+        self.to_calibration = np.diag([calibration_width / width, calibration_height / height, 1.0])
+        self.calibration = calibration
+        self.undistort = calibration.camera_matrix is not None and bool(np.any(calibration.dist_coeffs))
+        # Pixels of this resolution to floor, straight from the distorted pixels when undistortion isn't needed
+        self.homography = calibration.homography @ self.to_calibration
+
+    def project(self, x, y):
+        """Floor coordinates of the pixels (x, y), scalars or arrays"""
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+        points = np.stack([x.reshape(-1), y.reshape(-1), np.ones(x.size)])
+        if self.undistort:
+            # Homography was fitted on undistorted pixels of the calibration resolution
+            pixels = (self.to_calibration @ points)[:2].T.reshape(-1, 1, 2)
+            pixels = cv2.undistortPoints(pixels, self.calibration.camera_matrix, self.calibration.dist_coeffs,
+                                         P=self.calibration.camera_matrix)
+            floor = self.calibration.homography @ np.vstack([pixels.reshape(-1, 2).T, np.ones(x.size)])
+        else:
+            floor = self.homography @ points
+        floor_x, floor_y = floor[:2] / floor[2]
+        return floor_x.reshape(x.shape), floor_y.reshape(x.shape)
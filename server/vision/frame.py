@@ -0,0 +1,73 @@
+import cv2
+
+
+class FrameCache(object):
+    """Images derived from a camera frame (downscaled, grayscale, crops), computed on first use.
+
+    One cache is built per captured frame and shared by all the vision
+    handlers receiving it, so each conversion is done at most once per frame
+    whatever the number of detectors. Derived images are shared too and must
+    not be modified. Detection handlers draw their boxes on the camera frame
+    in place, so the frame is copied when the first image is requested and
+    later images are derived from that copy. Nothing is copied for frames no
+    detector looks at.
+    """
+
+    def __init__(self, frame):
+        self._source = frame
+        self._frame = None
+        self._images = {}
+
+    @property
+    def frame(self):
+        """Snapshot of the camera frame, taken on first use"""
+        if self._frame is None:
+            self._frame = self._source.copy()
+            self._source = None
+        return self._frame
+
+    @property
+    def width(self):
+        return (self._source if self._frame is None else self._frame).shape[1]
+
+    @property
+    def height(self):
+        return (self._source if self._frame is None else self._frame).shape[0]
+
+    def _get(self, key, compute):
+        image = self._images.get(key)
+        if image is None:
+            image = compute()
+            self._images[key] = image
+        return image
+
+    def scale_for_width(self, width):
+        """Scale factor to downscale the frame to `width`, never upscaling"""
+        return min(1.0, width / self.width)
+
+    def resized(self, scale=1.0):
+        """BGR frame downscaled by `scale`"""
+        if scale >= 1.0:
+            return self.frame
+        return self._get(
+            ("bgr", scale),
+            lambda: cv2.resize(self.frame, (round(self.width * scale), round(self.height * scale)),
+                               interpolation=cv2.INTER_AREA)
+        )
+
+    def half(self):
+        return self.resized(0.5)
+
+    def quarter(self):
+        return self.resized(0.25)
+
+    def gray(self, scale=1.0):
+        """Grayscale frame downscaled by `scale`"""
+        return self._get(("gray", scale), lambda: cv2.cvtColor(self.resized(scale), cv2.COLOR_BGR2GRAY))
+
+    def roi(self, x, y, w, h, scale=1.0, gray=False):
+        """Crop of the (downscaled / grayscale) frame, the box being in full resolution pixels"""
+        image = self.gray(scale) if gray else self.resized(scale)
+        x0, y0 = max(0, int(x * scale)), max(0, int(y * scale))
+        x1, y1 = int((x + w) * scale), int((y + h) * scale)
+        return image[y0:y1, x0:x1]
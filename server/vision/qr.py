@@ -0,0 +1,37 @@
+import cv2
+import numpy as np
+
+
+class QRScanner(object):
+    """QR codes are located on a downscaled grayscale frame, then decoded on their region only at full resolution"""
+    DETECTION_WIDTH = 640  # px
+    MARGIN = 0.2  # Decoding region margin around a code, relative to its size
+
+    def __init__(self):
+        self.decoder = cv2.QRCodeDetector()
+        # ArUco based finder (OpenCV 4.8+) is faster and finds smaller codes on downscaled frames
+        self.detector = cv2.QRCodeDetectorAruco() if hasattr(cv2, "QRCodeDetectorAruco") else self.decoder
+
+    def scan(self, gray, small, scale):
+        """Codes found as (data, points), points being the (4, 2) corners in `gray` pixels.
+
+        `small` is `gray` downscaled by `scale`.
+        """
+        found, points = self.detector.detectMulti(small)
+        if not found or points is None:
+            return []
+        height, width = gray.shape[:2]
+        codes = {}
+        for corners in points.reshape(-1, 4, 2) / scale:
+            (x0, y0), (x1, y1) = corners.min(axis=0), corners.max(axis=0)
+            margin = self.MARGIN * max(x1 - x0, y1 - y0)
+            x0, y0 = max(0, int(x0 - margin)), max(0, int(y0 - margin))
+            x1, y1 = min(width, int(x1 + margin) + 1), min(height, int(y1 + margin) + 1)
+            found, decoded_info, roi_points, _ = self.decoder.detectAndDecodeMulti(gray[y0:y1, x0:x1])
+            if not found:
+                continue
+            for data, code_points in zip(decoded_info, roi_points):
+                # Regions of codes close to each other overlap, a code may be decoded twice
+                if data and data not in codes:
+                    codes[data] = code_points.reshape(4, 2) + np.array([x0, y0], dtype=np.float32)
+        return list(codes.items())
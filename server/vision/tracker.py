@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+
+
+class OpticalFlowTracker(object):
+    """Propagates a box (face, marker...) from frame to frame with sparse optical flow (Lucas-Kanade).
+
+    Corners found in the box are followed to the next frame, the box is then
+    moved by their median displacement and scaled by the median change of
+    their spread. Tracking is lost when too few corners are followed.
+    """
+    MAX_CORNERS = 30
+    MIN_POINTS = 5
+    LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                     criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+    def __init__(self):
+        self.box = None
+        self._gray = None
+        self._points = None
+
+    def init(self, gray, box):
+        x, y, w, h = box
+        mask = np.zeros_like(gray)
+        mask[max(0, y):y + h, max(0, x):x + w] = 255
+        points = cv2.goodFeaturesToTrack(gray, self.MAX_CORNERS, 0.01, 3, mask=mask)
+        if points is None or len(points) < self.MIN_POINTS:
+            self.reset()
+            return False
+        self.box = (float(x), float(y), float(w), float(h))
+        self._gray = gray
+        self._points = points
+        return True
+
+    def reset(self):
+        self.box = None
+        self._gray = None
+        self._points = None
+
+    def update(self, gray):
+        """Box (x, y, w, h) in the new frame, None when tracking is lost"""
+        if self.box is None:
+            return None
+        points, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, self._points, None, **self.LK_PARAMS)
+        found = status.reshape(-1) == 1
+        if found.sum() < self.MIN_POINTS:
+            self.reset()
+            return None
+        old, new = self._points[found].reshape(-1, 2), points[found].reshape(-1, 2)
+        dx, dy = np.median(new - old, axis=0)
+        old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1)
+        new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1)
+        valid = old_spread > 1
+        scale = float(np.median(new_spread[valid] / old_spread[valid])) if valid.any() else 1.0
+        x, y, w, h = self.box
+        cx, cy = x + w / 2 + dx, y + h / 2 + dy
+        w, h = w * scale, h * scale
+        self.box = (cx - w / 2, cy - h / 2, w, h)
+        self._gray = gray
+        self._points = new.reshape(-1, 1, 2)
+        return tuple(int(round(v)) for v in self.box)
@@ -14,6 +14,7 @@ from aiortc.mediastreams import AudioStreamTrack, MediaStreamError, VideoStreamT
 
 from camera import Camera
 from handlers.base import BaseHandler
+from lcd import rgb565
 from models import Config
 
 logger = logging.getLogger(__name__)
@@ -271,12 +272,25 @@ class BrowserAudioPlayer:
             self._task = None
 
 
+def _frame_to_lcd_buffer(frame: av.VideoFrame, width: int, height: int) -> np.ndarray:
+    """Scale a decoded frame to the LCD size and convert it to the panel layout (rotated, big-endian RGB565).
+
+    Scaling and pixel format conversion are both done by swscale in a single pass.
+    """
+    frame = frame.reformat(width=width, height=height, format="rgb565be")
+    plane = frame.planes[0]
+    # Rows may be padded, line_size is in bytes
+    buffer = np.frombuffer(plane, dtype=rgb565.RGB565).reshape(height, plane.line_size // 2)[:, :width]
+    return buffer[::-1, ::-1].copy()
+
+
 class BrowserVideoReceiver:
     """Forwards incoming browser webcam frames to the LCD handler.
 
-    LCD updates are rate-limited and offloaded to a thread — SPI writes are
-    blocking and take ~50-100ms; running them on the event loop would stall
-    everything else.
+    LCD updates are rate-limited, and only the frames that are actually
+    displayed are scaled and converted to RGB565 by PyAV, in a worker thread.
+    The buffer is then handed to the LCD compositor, which returns right away
+    and does the SPI write on its own thread.
     """
 
     _LCD_FPS = 5  # SPI bus can't sustain more than ~5-10 FPS at 240x320
@@ -300,8 +314,7 @@ class BrowserVideoReceiver:
                         continue
                     lcd = BaseHandler.get_handler("lcd")
                     if lcd is not None and lcd.eligible:
-                        img = frame.to_ndarray(format="rgb24")
-                        await asyncio.to_thread(lcd.display_frame, img)
+                        await asyncio.to_thread(self._display, lcd, frame)
                         last_lcd_update = loop.time()
                 except asyncio.CancelledError:
                     raise
@@ -316,6 +329,11 @@ class BrowserVideoReceiver:
             if lcd is not None and lcd.eligible:
                 lcd.stop_video()
 
+    @staticmethod
+    def _display(lcd, frame: av.VideoFrame) -> None:
+        # Landscape: the LCD height is the image width
+        lcd.display_buffer(_frame_to_lcd_buffer(frame, lcd.server.lcd.height, lcd.server.lcd.width))
+
     def stop(self) -> None:
         if self._task is not None:
             self._task.cancel()